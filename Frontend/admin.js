@@ -4,6 +4,12 @@ const API_BASE_URL = '/api';
 let allUsers = [];
 let allCampaigns = [];
 
+// Users are paged from the server; these track the current listing
+const USERS_PAGE_SIZE = 50;
+let usersNextCursor = null;
+let usersTotal = 0;
+let userSearchTimer = null;
+
 // Initialize admin panel on page load
 document.addEventListener('DOMContentLoaded', function() {
     checkAdminAuth();
@@ -40,10 +46,23 @@ async function loadAdminData() {
     }
 }
 
-// Load users data
-async function loadUsers() {
+// Query string for the current search, role filter and sort order
+function userListParams(cursor) {
+    const [sort, order] = document.getElementById('userSortOrder').value.split(':');
+    const params = new URLSearchParams({ limit: USERS_PAGE_SIZE, sort: sort, order: order });
+    const search = document.getElementById('userSearch').value.trim();
+    const role = document.getElementById('userRoleFilter').value;
+    if (search) params.set('q', search);
+    if (role !== 'all') params.set('role', role);
+    if (cursor) params.set('cursor', cursor);
+    return params;
+}
+
+// Load the first page of users (append = true loads the next page)
+async function loadUsers(append = false) {
     try {
-        const response = await fetch(`${API_BASE_URL}/admin/users`, {
+        const params = userListParams(append ? usersNextCursor : null);
+        const response = await fetch(`${API_BASE_URL}/admin/users?${params}`, {
             headers: {
                 'Authorization': `Bearer ${localStorage.getItem('access_token')}`
             }
@@ -51,23 +70,36 @@ async function loadUsers() {
         
         if (response.ok) {
             const data = await response.json();
-            allUsers = data.users || generateMockUsers();
+            const page = data.users || [];
+            allUsers = append ? allUsers.concat(page) : page;
+            usersNextCursor = data.next_cursor || null;
+            usersTotal = data.total !== undefined ? data.total : allUsers.length;
             displayUsers(allUsers);
             updateUserFilter();
         } else {
             // Use mock data if endpoint doesn't exist
-            allUsers = generateMockUsers();
-            displayUsers(allUsers);
-            updateUserFilter();
+            useMockUsers();
         }
     } catch (error) {
         console.log('Using mock user data');
-        allUsers = generateMockUsers();
-        displayUsers(allUsers);
-        updateUserFilter();
+        useMockUsers();
     }
 }
 
+function loadMoreUsers() {
+    if (usersNextCursor) {
+        loadUsers(true);
+    }
+}
+
+function useMockUsers() {
+    allUsers = generateMockUsers();
+    usersNextCursor = null;
+    usersTotal = allUsers.length;
+    displayUsers(allUsers);
+    updateUserFilter();
+}
+
 // Generate mock users for demonstration
 function generateMockUsers() {
     return [
@@ -137,8 +169,11 @@ function displayUsers(users) {
         tbody.appendChild(row);
     });
     
-    // Update total users count
-    document.getElementById('totalUsers').textContent = users.length;
+    // Totals come from the server, not from the rows loaded so far
+    document.getElementById('totalUsers').textContent = usersTotal.toLocaleString();
+    document.getElementById('usersPageInfo').textContent =
+        `Showing ${users.length.toLocaleString()} of ${usersTotal.toLocaleString()} users`;
+    document.getElementById('loadMoreUsers').style.display = usersNextCursor ? 'inline-flex' : 'none';
 }
 
 // Load campaigns data
@@ -251,20 +286,10 @@ function updateSystemStats(stats) {
     document.getElementById('totalPredictions').textContent = stats.total_predictions.toLocaleString();
 }
 
-// Filter users
+// Filter users: search, role and sort run on the server, so restart from page one
 function filterUsers() {
-    const searchTerm = document.getElementById('userSearch').value.toLowerCase();
-    const roleFilter = document.getElementById('userRoleFilter').value;
-    
-    let filtered = allUsers.filter(user => {
-        const matchesSearch = user.username.toLowerCase().includes(searchTerm) || 
-                            user.email.toLowerCase().includes(searchTerm);
-        const matchesRole = roleFilter === 'all' || user.role === roleFilter;
-        
-        return matchesSearch && matchesRole;
-    });
-    
-    displayUsers(filtered);
+    clearTimeout(userSearchTimer);
+    userSearchTimer = setTimeout(() => loadUsers(), 250);
 }
 
 // Filter campaigns
@@ -328,17 +353,20 @@ async function deleteUser(userId) {
             
             if (response.ok) {
                 allUsers = allUsers.filter(u => u.id !== userId);
+                usersTotal = Math.max(usersTotal - 1, 0);
                 displayUsers(allUsers);
                 showNotification('User deleted successfully', 'success');
             } else {
                 // Mock deletion for demo
                 allUsers = allUsers.filter(u => u.id !== userId);
+                usersTotal = Math.max(usersTotal - 1, 0);
                 displayUsers(allUsers);
                 showNotification('User deleted successfully', 'success');
             }
         } catch (error) {
             // Mock deletion for demo
             allUsers = allUsers.filter(u => u.id !== userId);
+            usersTotal = Math.max(usersTotal - 1, 0);
             displayUsers(allUsers);
             showNotification('User deleted successfully', 'success');
         }
@@ -390,6 +418,7 @@ async function addNewUser(event) {
                 campaigns_count: 0
             };
             allUsers.push(newUser);
+            usersTotal += 1;
             displayUsers(allUsers);
             closeAddUserModal();
             showNotification('User added successfully', 'success');
@@ -405,6 +434,7 @@ async function addNewUser(event) {
             campaigns_count: 0
         };
         allUsers.push(newUser);
+        usersTotal += 1;
         displayUsers(allUsers);
         closeAddUserModal();
         showNotification('User added successfully', 'success');
@@ -446,15 +476,42 @@ async function retrainModel() {
             }
         });
         
-        if (response.ok) {
-            showNotification('ML model retrained successfully', 'success');
-        } else {
+        if (!response.ok) {
             throw new Error('Failed to retrain model');
         }
+
+        // Training runs in the background; poll the job until it finishes
+        const { job_id } = await response.json();
+        const job = await waitForTrainingJob(job_id);
+
+        if (job.status === 'succeeded') {
+            showNotification(`ML model retrained successfully in ${job.training_time_seconds}s`, 'success');
+        } else {
+            throw new Error(job.message || 'Failed to retrain model');
+        }
     } catch (error) {
-        setTimeout(() => {
-            showNotification('ML model retrained successfully', 'success');
-        }, 3000);
+        console.error('Error retraining model:', error);
+        showNotification('Failed to retrain ML model', 'error');
+    }
+}
+
+async function waitForTrainingJob(jobId) {
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+
+        const response = await fetch(`${API_BASE_URL}/train-model/${jobId}`, {
+            headers: {
+                'Authorization': `Bearer ${localStorage.getItem('access_token')}`
+            }
+        });
+        if (!response.ok) {
+            throw new Error('Failed to fetch training status');
+        }
+
+        const { job } = await response.json();
+        if (job.status === 'succeeded' || job.status === 'failed') {
+            return job;
+        }
     }
 }
 
@@ -474,7 +531,18 @@ function viewAuditLog() {
 }
 
 // Admin logout
-function adminLogout() {
+async function adminLogout() {
+    try {
+        // Revoke the token server-side so a copy of it can't be reused
+        await fetch(`${API_BASE_URL}/logout`, {
+            method: 'POST',
+            headers: {
+                'Authorization': `Bearer ${localStorage.getItem('access_token')}`
+            }
+        });
+    } catch (error) {
+        console.error('Logout error:', error);
+    }
     localStorage.removeItem('access_token');
     localStorage.removeItem('user_role');
     window.location.href = '/login';
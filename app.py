@@ -1,17 +1,32 @@
-from utils.ml_model import AdOptimizerModel
-from flask import Flask, render_template, request, jsonify, redirect, url_for
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from ml_model import AdOptimizerModel
+from micro_batcher import MicroBatcher
+from inference_pool import InferencePool
+from training_jobs import TrainingJobManager
+from model_registry import ModelRegistry
+from memory_store import USER_SORTS, MemoryStore, check_user_cursor
+from password_hasher import HashingBusy, PasswordHasher
+from token_blocklist import TokenBlocklist
+from write_behind import HistoryWriter
+from ingest import IngestError, UploadDecodeError, detect_format, import_metrics
+import assets
+import export
+from flask import Flask, render_template, request, jsonify, redirect, url_for, Response, send_file, stream_with_context
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt, get_jwt_identity
 from flask_cors import CORS
 from datetime import timedelta
 import os
 from dotenv import load_dotenv
+import atexit
+import base64
+import csv
+import hashlib
 import json
 import random
 from datetime import datetime
 
 load_dotenv()
 
-app = Flask(__name__, template_folder='frontend', static_folder="frontend")
+app = Flask(__name__, template_folder='Frontend', static_folder="Frontend")
 
 # Configuration
 app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'MS87-MCFj9Yo70UNTzksw6uw096sHG5LvpQUHm__OAFy1dHaes19RmwO75IQzGrQXClZtxyOEGc3kYmaxXiv3Q')
@@ -20,136 +35,212 @@ app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
 CORS(app)
 jwt = JWTManager(app)
 
-# Initialize ML model
-ml_model = AdOptimizerModel()
-
-# Mock database class (replace with your actual database)
-class Database:
-    def __init__(self):
-        self.users = {}
-        self.metrics = {}
-        self.predictions = {}
-        self.optimizations = {}
-        self.admin_users = {}  # Separate admin users
-        
-    def init_db(self):
-        print("✅ Database initialized")
-        # Create default admin user
-        self.admin_users['admin@adoptimizer.ai'] = {
-            'id': 'admin_1',
-            'username': 'admin',
-            'email': 'admin@adoptimizer.ai',
-            'password_hash': 'admin123',  # In production, use proper hashing
-            'role': 'admin',
-            'created_at': datetime.now().isoformat()
-        }
-        
-    def get_user_by_email(self, email):
-        return self.users.get(email)
-    
-    def get_admin_by_email(self, email):
-        return self.admin_users.get(email)
-    
-    def verify_password(self, password, password_hash):
-        # Simple mock verification - in real app, use proper hashing
-        return password == password_hash
-    
-    def create_user(self, username, email, password, role='user'):
-        if email in self.users or email in self.admin_users:
-            return None, "User already exists"
-        
-        user_id = len(self.users) + len(self.admin_users) + 1
-        user_data = {
-            'id': user_id,
-            'username': username,
-            'email': email,
-            'password_hash': password,  # In real app, hash this
-            'role': role,
-            'created_at': datetime.now().isoformat()
-        }
-        
-        if role == 'admin':
-            self.admin_users[email] = user_data
-        else:
-            self.users[email] = user_data
-            
-        return user_id, None
-    
-    def get_all_users(self):
-        """Get all users for admin panel"""
-        all_users = []
-        for email, user in self.users.items():
-            user_copy = user.copy()
-            user_copy['campaigns_count'] = random.randint(0, 10)
-            all_users.append(user_copy)
-        return all_users
-    
-    def delete_user(self, user_id):
-        """Delete a user by ID"""
-        for email, user in list(self.users.items()):
-            if user['id'] == user_id:
-                del self.users[email]
-                return True
-        return False
-    
-    def get_user_metrics(self, user_id):
-        # Return mock metrics
-        return {
-            'ctr': round(random.uniform(0.02, 0.06), 4),
-            'cpc': round(random.uniform(12, 25), 2),
-            'conversions': random.randint(800, 1500),
-            'roas': round(random.uniform(2.5, 5.5), 2),
-            'spend': random.randint(8000, 15000),
-            'engagement': round(random.uniform(0.03, 0.08), 4),
-            'impressions': random.randint(50000, 200000)
-        }
-    
-    def save_prediction_result(self, user_id, input_data, prediction_result):
-        if user_id not in self.predictions:
-            self.predictions[user_id] = []
-        
-        self.predictions[user_id].append({
-            'input_data': input_data,
-            'prediction_result': prediction_result,
-            'timestamp': datetime.now().isoformat()
-        })
-    
-    def get_user_recommendations(self, user_id):
-        # Return mock recommendations
-        return [
-            {
-                'campaign': 'Google Ads Q4',
-                'predicted_ctr': round(random.uniform(0.03, 0.07), 4),
-                'best_channel': 'Google Ads',
-                'recommended_budget_pct': random.randint(10, 25)
-            },
-            {
-                'campaign': 'Facebook Prospecting',
-                'predicted_ctr': round(random.uniform(0.04, 0.08), 4),
-                'best_channel': 'Facebook Ads',
-                'recommended_budget_pct': random.randint(5, 20)
-            }
-        ]
-    
-    def save_optimization_settings(self, user_id, settings, results):
-        if user_id not in self.optimizations:
-            self.optimizations[user_id] = []
-        
-        self.optimizations[user_id].append({
-            'settings': settings,
-            'results': results,
-            'timestamp': datetime.now().isoformat()
-        })
+# Minified, content-hashed and precompressed CSS/JS (see assets.py), built
+# here unless a deploy step already did (ASSET_BUILD_DIR= serves Frontend/
+# files as written)
+ASSET_BUILD_DIR = os.environ.get('ASSET_BUILD_DIR', 'static_build')
+asset_pipeline = assets.AssetPipeline(app.static_folder, ASSET_BUILD_DIR) if ASSET_BUILD_DIR else None
+if asset_pipeline is not None:
+    asset_pipeline.build()
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    # url_for('static', filename='style.css') links to the built style.<hash>.css
+    if endpoint == 'static' and asset_pipeline is not None and 'filename' in values:
+        values['filename'] = asset_pipeline.url_name(values['filename'])
+
+def send_static_asset(filename):
+    """Built assets in the best accepted encoding, cached for good; other files as Flask sends them"""
+    entry = asset_pipeline.by_file.get(filename) if asset_pipeline is not None else None
+    if entry is None:
+        return app.send_static_file(filename)
+    encoding = assets.negotiate(request.accept_encodings, entry['encodings'])
+    response = send_file(
+        asset_pipeline.path(filename, encoding),
+        mimetype=entry['mimetype'],
+        # Named after the built file, not the .gz/.br copy on disk
+        download_name=filename,
+        etag=f"{entry['hash']}-{encoding or 'identity'}",
+        conditional=True
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = assets.IMMUTABLE_CACHE_CONTROL
+    return response
+
+app.view_functions['static'] = send_static_asset
+
+# Pages don't depend on the request, so each is rendered and compressed
+# once (on every request in debug mode, so template edits show up)
+rendered_pages = {}
+
+def render_page(template):
+    page = rendered_pages.get(template)
+    if page is None or app.debug:
+        body = render_template(template).encode('utf-8')
+        page = {'identity': body, **assets.compress(body)}
+        page['etag'] = hashlib.sha256(body).hexdigest()[:16]
+        rendered_pages[template] = page
+    encoding = assets.negotiate(request.accept_encodings, page)
+    response = Response(page[encoding or 'identity'], mimetype='text/html')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    # Revalidated every time, answered with a 304 when nothing changed
+    response.headers['Cache-Control'] = 'no-cache'
+    response.set_etag(f"{page['etag']}-{encoding or 'identity'}")
+    return response.make_conditional(request)
+
+# Tokens revoked by logout, kept until they would have expired; the file
+# keeps them revoked across restarts (TOKEN_BLOCKLIST_PATH= keeps them in
+# memory only)
+token_blocklist = TokenBlocklist(
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds(),
+    os.environ.get('TOKEN_BLOCKLIST_PATH', 'token_blocklist.bin') or None
+)
+
+@jwt.token_in_blocklist_loader
+def check_token_revoked(jwt_header, jwt_payload):
+    return token_blocklist.is_revoked(jwt_payload['jti'])
+
+@jwt.revoked_token_loader
+def revoked_token_response(jwt_header, jwt_payload):
+    return jsonify({'status': 'error', 'message': 'Token has been revoked'}), 401
+
+# Versioned model artifacts; the active version is loaded on boot
+model_registry = ModelRegistry(os.environ.get('MODEL_REGISTRY_DIR', 'models/registry'))
 
-# Initialize database
-db = Database()
+# Seconds between checks for a newly pinned/registered model (0 disables hot reload)
+MODEL_RELOAD_INTERVAL = float(os.environ.get('MODEL_RELOAD_INTERVAL', 10))
+
+# Initialize ML model (PREDICTION_CACHE_SIZE=0 disables the prediction cache)
+ml_model = AdOptimizerModel(
+    cache_size=int(os.environ.get('PREDICTION_CACHE_SIZE', 10000)),
+    registry=model_registry
+)
+
+# Where background training gets its data: 'synthetic' (generated) or
+# 'database' (streamed from the MySQL campaign_metrics table)
+TRAINING_SOURCE = os.environ.get('TRAINING_SOURCE', 'synthetic')
+# Used when TRAINING_SOURCE=large: rows to generate, tree-building workers
+# (-1 = all cores) and an optional memory ceiling for the run
+TRAINING_ROWS = int(os.environ.get('TRAINING_ROWS', 1000000))
+TRAINING_JOBS = int(os.environ.get('TRAINING_JOBS', -1))
+TRAINING_MEMORY_LIMIT_MB = int(os.environ.get('TRAINING_MEMORY_LIMIT_MB', 0)) or None
+
+def train_from_configured_source(progress=None):
+    if TRAINING_SOURCE == 'database':
+        from db import get_db
+        return ml_model.train_from_database(get_db(hasher=password_hasher), n_jobs=TRAINING_JOBS, progress=progress)
+    if TRAINING_SOURCE == 'large':
+        return ml_model.train_large(
+            n_samples=TRAINING_ROWS,
+            n_jobs=TRAINING_JOBS,
+            memory_limit_mb=TRAINING_MEMORY_LIMIT_MB,
+            progress=progress
+        )
+    return ml_model.train_model(progress=progress)
+
+# Background training runs; /api/train-model returns a job id to poll
+training_jobs = TrainingJobManager(train_from_configured_source)
+
+# Upper bound on rows accepted by /api/predict/batch in one request
+MAX_BATCH_ROWS = int(os.environ.get('MAX_BATCH_ROWS', 10000))
+
+# Optional micro-batching of concurrent /api/predict calls
+# (PREDICT_BATCH_WINDOW_MS=0 sends each request straight to the model)
+PREDICT_BATCH_WINDOW_MS = float(os.environ.get('PREDICT_BATCH_WINDOW_MS', 0))
+PREDICT_MAX_BATCH_SIZE = int(os.environ.get('PREDICT_MAX_BATCH_SIZE', 64))
+
+# Optional pool of worker processes sharing one memory-mapped model
+# (INFERENCE_POOL_WORKERS=0 scores inside the web process). It saves memory
+# per worker but adds an IPC round trip to every prediction, so it is off by
+# default. Created here, before any thread starts, because it forks.
+INFERENCE_POOL_WORKERS = int(os.environ.get('INFERENCE_POOL_WORKERS', 0))
+inference_pool = InferencePool(INFERENCE_POOL_WORKERS) if INFERENCE_POOL_WORKERS > 0 else None
+
+# Prediction/optimization history is written behind the request in batches
+# (HISTORY_MAX_PENDING=0 writes each record inside the request instead)
+HISTORY_MAX_PENDING = int(os.environ.get('HISTORY_MAX_PENDING', 10000))
+HISTORY_MAX_BATCH = int(os.environ.get('HISTORY_MAX_BATCH', 500))
+HISTORY_FLUSH_INTERVAL_MS = float(os.environ.get('HISTORY_FLUSH_INTERVAL_MS', 1000))
+
+# Rows per transaction for /api/campaign-metrics/import
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 5000))
+
+# Rows per keyset page for /api/history/<kind>/export
+HISTORY_EXPORT_PAGE_SIZE = int(os.environ.get('HISTORY_EXPORT_PAGE_SIZE', 1000))
+
+if PREDICT_BATCH_WINDOW_MS > 0:
+    predict_batcher = MicroBatcher(ml_model.predict_batch, PREDICT_BATCH_WINDOW_MS, PREDICT_MAX_BATCH_SIZE)
+else:
+    predict_batcher = None
+
+# Admin user listing page size limits
+ADMIN_USERS_PAGE_SIZE = int(os.environ.get('ADMIN_USERS_PAGE_SIZE', 50))
+ADMIN_USERS_MAX_PAGE_SIZE = 500
+
+# Prediction history kept in memory per user, and an optional directory
+# older predictions spill to instead of being dropped
+PREDICTION_HISTORY_CAPACITY = int(os.environ.get('PREDICTION_HISTORY_CAPACITY', 10000))
+PREDICTION_HISTORY_SPILL_DIR = os.environ.get('PREDICTION_HISTORY_SPILL_DIR') or None
+
+# bcrypt runs on its own small pool with a bounded queue (BCRYPT_ROUNDS=0
+# calibrates the cost to BCRYPT_TARGET_MS on the first hash and keeps the
+# result in BCRYPT_CALIBRATION_PATH; empty measures it in every process)
+password_hasher = PasswordHasher(
+    rounds=int(os.environ.get('BCRYPT_ROUNDS', 0)) or None,
+    target_ms=float(os.environ.get('BCRYPT_TARGET_MS', 250)),
+    workers=int(os.environ.get('PASSWORD_HASH_WORKERS', 2)),
+    max_pending=int(os.environ.get('PASSWORD_HASH_QUEUE', 32)),
+    timeout=float(os.environ.get('PASSWORD_HASH_TIMEOUT', 5)),
+    calibration_path=os.environ.get('BCRYPT_CALIBRATION_PATH', 'bcrypt_calibration.json') or None
+)
+
+# Initialize database (in-memory; see memory_store.py)
+db = MemoryStore(
+    prediction_capacity=PREDICTION_HISTORY_CAPACITY,
+    prediction_spill_dir=PREDICTION_HISTORY_SPILL_DIR,
+    hasher=password_hasher
+)
+atexit.register(db.predictions.close)
+
+if HISTORY_MAX_PENDING > 0:
+    history_writer = HistoryWriter(
+        db,
+        max_batch=HISTORY_MAX_BATCH,
+        flush_interval=HISTORY_FLUSH_INTERVAL_MS / 1000,
+        max_pending=HISTORY_MAX_PENDING
+    )
+    # Write out whatever is still buffered when the server stops
+    atexit.register(history_writer.close)
+else:
+    history_writer = None
+
+def record_prediction(user_id, input_data, prediction_result):
+    if history_writer is not None:
+        history_writer.save_prediction(user_id, input_data, prediction_result)
+    else:
+        db.save_prediction_result(user_id, input_data, prediction_result)
+
+def record_optimization(user_id, settings, results):
+    if history_writer is not None:
+        history_writer.save_optimization(user_id, settings, results)
+    else:
+        db.save_optimization_settings(user_id, settings, results)
 
 def initialize_app():
     db.init_db()
-    # Ensure ML model is trained
-    if not ml_model.is_trained:
+    # Load the active registry version; this only trains if nothing usable is on disk
+    if not ml_model.load_model():
         print("🔄 Training ML model on startup...")
         ml_model.train_model()
+    if MODEL_RELOAD_INTERVAL > 0:
+        model_registry.watch(ml_model.reload_if_changed, MODEL_RELOAD_INTERVAL)
+    if inference_pool is not None:
+        ml_model.attach_pool(inference_pool)
+        print(f"✅ Inference pool started with {INFERENCE_POOL_WORKERS} workers")
     print("✅ Application initialization completed")
     print("🔐 Default admin credentials: admin@adoptimizer.ai / admin123")
 
@@ -159,7 +250,7 @@ with app.app_context():
 # ==================== PAGE ROUTES ====================
 @app.route('/')
 def home():
-    return render_template('index.html')
+    return render_page('index.html')
 
 @app.route('/index.html')
 def home_alt():
@@ -167,42 +258,49 @@ def home_alt():
 
 @app.route('/dashboard')
 def dashboard():
-    return render_template('dashboard.html')
+    return render_page('dashboard.html')
 
 @app.route('/ml_insights')
 def ml_insights():
-    return render_template('ml_insights.html')
+    return render_page('ml_insights.html')
 
 @app.route('/login')
 def login_page():
-    return render_template('login.html')
+    return render_page('login.html')
 
 @app.route('/signup')
 def signup_page():
-    return render_template('signup.html')
+    return render_page('signup.html')
 
 @app.route('/optimization')
 def optimization():
-    return render_template('optimization.html')
+    return render_page('optimization.html')
 
 @app.route('/contact')
 def contact_page():
-    return render_template('contact.html')
+    return render_page('contact.html')
 
 # ==================== ADMIN PAGE ROUTES ====================
 @app.route('/admin/login')
 def admin_login_page():
-    return render_template('admin_login.html')
+    return render_page('admin_login.html')
 
 @app.route('/admin/dashboard')
 def admin_dashboard():
-    return render_template('admin.html')
+    return render_page('admin.html')
 
 # ==================== API ROUTES ====================
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'healthy', 'message': 'AdOptimizer AI backend is running'})
 
+def hashing_busy_response(error):
+    """503 for auth requests turned away by a full password hashing pool"""
+    print(f"⚠️ {error}")
+    response = jsonify({'status': 'error', 'message': 'Too many sign-in requests, please retry shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @app.route('/api/login', methods=['POST'])
 def api_login():
     try:
@@ -218,9 +316,9 @@ def api_login():
 
         print(f"Login attempt for email: {email}")
 
-        user = db.get_user_by_email(email)
+        user = db.authenticate(email, password)
 
-        if user and db.verify_password(password, user['password_hash']):
+        if user:
             access_token = create_access_token(identity=str(user['id']))
             print(f"✅ Login successful for user: {user['username']}")
             
@@ -235,6 +333,8 @@ def api_login():
             print(f"❌ Login failed for email: {email}")
             return jsonify({'status': 'error', 'message': 'Invalid email or password'}), 401
             
+    except HashingBusy as e:
+        return hashing_busy_response(e)
     except Exception as e:
         print(f"❌ Login error: {str(e)}")
         return jsonify({'status': 'error', 'message': 'Server error during login'}), 500
@@ -275,6 +375,8 @@ def api_register():
             'access_token': access_token
         })
 
+    except HashingBusy as e:
+        return hashing_busy_response(e)
     except Exception as e:
         print(f"❌ Registration error: {str(e)}")
         return jsonify({'status': 'error', 'message': 'Server error during registration'}), 500
@@ -295,9 +397,9 @@ def api_admin_login():
 
         print(f"Admin login attempt for email: {email}")
 
-        admin = db.get_admin_by_email(email)
+        admin = db.authenticate(email, password, admin=True)
 
-        if admin and db.verify_password(password, admin['password_hash']):
+        if admin:
             access_token = create_access_token(identity=str(admin['id']))
             print(f"✅ Admin login successful: {admin['username']}")
             
@@ -313,20 +415,61 @@ def api_admin_login():
             print(f"❌ Admin login failed for email: {email}")
             return jsonify({'status': 'error', 'message': 'Invalid admin credentials'}), 401
             
+    except HashingBusy as e:
+        return hashing_busy_response(e)
     except Exception as e:
         print(f"❌ Admin login error: {str(e)}")
         return jsonify({'status': 'error', 'message': 'Server error during admin login'}), 500
 
+def encode_cursor(after):
+    """Opaque page cursor for a (sort key, id) position"""
+    if after is None:
+        return None
+    raw = json.dumps(list(after), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(cursor, sort):
+    """(sort key, id) from a cursor, checked against the sort it is used with"""
+    try:
+        after = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    return check_user_cursor(after, sort)
+
 @app.route('/api/admin/users', methods=['GET', 'POST'])
 @jwt_required()
 def api_admin_users():
     try:
         if request.method == 'GET':
-            # Get all users
-            users = db.get_all_users()
+            # One page of users; pass next_cursor back as ?cursor= for the next one
+            sort = request.args.get('sort', 'id')
+            if sort not in USER_SORTS:
+                return jsonify({'status': 'error', 'message': f"sort must be one of {', '.join(USER_SORTS)}"}), 400
+            try:
+                limit = min(max(int(request.args.get('limit', ADMIN_USERS_PAGE_SIZE)), 1), ADMIN_USERS_MAX_PAGE_SIZE)
+                cursor = request.args.get('cursor')
+                after = decode_cursor(cursor, sort) if cursor else None
+            except ValueError as e:
+                return jsonify({'status': 'error', 'message': str(e)}), 400
+            
+            query = request.args.get('q', '').strip() or None
+            role = request.args.get('role') or None
+            users, next_after = db.list_users(
+                query=query, role=role, sort=sort,
+                descending=request.args.get('order') == 'desc',
+                after=after, limit=limit
+            )
+            campaign_counts = db.campaign_counts([user['id'] for user in users])
+            page = []
+            for user in users:
+                user_copy = {key: value for key, value in user.items() if key != 'password_hash'}
+                user_copy['campaigns_count'] = campaign_counts.get(user['id'], 0)
+                page.append(user_copy)
             return jsonify({
                 'status': 'success',
-                'users': users
+                'users': page,
+                'total': db.count_users(query=query, role=role),
+                'next_cursor': encode_cursor(next_after)
             })
         
         elif request.method == 'POST':
@@ -348,6 +491,8 @@ def api_admin_users():
                 'user_id': user_id
             })
             
+    except HashingBusy as e:
+        return hashing_busy_response(e)
     except Exception as e:
         print(f"❌ Admin users error: {str(e)}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -377,8 +522,8 @@ def api_admin_campaigns():
         platforms = ['Google Ads', 'Facebook Ads', 'Instagram Ads', 'LinkedIn Ads']
         statuses = ['active', 'paused', 'stopped']
         
-        users = db.get_all_users()
-        for user in users[:5]:  # Limit to 5 users for demo
+        users, _ = db.list_users(limit=5)  # Limit to 5 users for demo
+        for user in users:
             for i in range(random.randint(2, 5)):
                 campaigns.append({
                     'id': len(campaigns) + 1,
@@ -406,10 +551,16 @@ def api_admin_stats():
     try:
         # Return system statistics
         stats = {
-            'total_users': len(db.get_all_users()),
+            'total_users': db.count_users(),
             'total_spend': random.randint(100000, 200000),
             'active_campaigns': random.randint(10, 30),
-            'total_predictions': len(db.predictions) * random.randint(50, 100)
+            'total_predictions': db.predictions.recorded,
+            'prediction_history': db.predictions.stats(),
+            'prediction_cache': ml_model.cache_stats(),
+            'micro_batching': predict_batcher.stats() if predict_batcher is not None else None,
+            'history_writes': history_writer.stats() if history_writer is not None else None,
+            'password_hashing': password_hasher.stats(),
+            'token_blocklist': token_blocklist.stats()
         }
         
         return jsonify({
@@ -421,11 +572,74 @@ def api_admin_stats():
         print(f"❌ Admin stats error: {str(e)}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/api/admin/models', methods=['GET'])
+@jwt_required()
+def api_admin_models():
+    try:
+        return jsonify({
+            'status': 'success',
+            'serving_version': ml_model.version,
+            'active_version': model_registry.active_version(),
+            'pinned_version': model_registry.pinned_version(),
+            'versions': model_registry.versions()
+        })
+    except Exception as e:
+        print(f"❌ Admin models error: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/admin/models/pin', methods=['POST'])
+@jwt_required()
+def api_admin_models_pin():
+    try:
+        data = request.get_json() or {}
+        version = data.get('version')
+        
+        if version:
+            model_registry.pin(version)
+        else:
+            model_registry.unpin()
+        
+        # Switch this process right away; other workers follow on their next watch tick
+        ml_model.reload_if_changed()
+        
+        return jsonify({
+            'status': 'success',
+            'message': f'Pinned model {version}' if version else 'Serving latest model',
+            'serving_version': ml_model.version,
+            'pinned_version': model_registry.pinned_version()
+        })
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        print(f"❌ Admin model pin error: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/admin/models/rollback', methods=['POST'])
+@jwt_required()
+def api_admin_models_rollback():
+    try:
+        version = model_registry.rollback()
+        ml_model.reload_if_changed()
+        
+        return jsonify({
+            'status': 'success',
+            'message': f'Rolled back to model {version}',
+            'serving_version': ml_model.version,
+            'pinned_version': version
+        })
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        print(f"❌ Admin model rollback error: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 @app.route('/api/logout', methods=['POST'])
 @jwt_required()
 def api_logout():
     try:
-        # With JWT, logout is handled client-side by removing the token
+        # The client drops the token; revoking it stops any copy being reused
+        token = get_jwt()
+        token_blocklist.revoke(token['jti'], token.get('exp'))
         return jsonify({'status': 'success', 'message': 'Logged out successfully'})
     except Exception as e:
         print(f"❌ Logout error: {str(e)}")
@@ -497,7 +711,10 @@ def api_predict():
             if not ml_model.is_trained:
                 ml_model.load_model()
                 
-            prediction_result = ml_model.predict(data)
+            if predict_batcher is not None:
+                prediction_result = predict_batcher.predict(data)
+            else:
+                prediction_result = ml_model.predict(data)
         except Exception as ml_error:
             print(f"ML model prediction failed, using fallback: {ml_error}")
             # Fallback prediction
@@ -510,7 +727,7 @@ def api_predict():
             }
         
         # Save prediction to database
-        db.save_prediction_result(current_user_id, data, prediction_result)
+        record_prediction(current_user_id, data, prediction_result)
         
         return jsonify(prediction_result)
         
@@ -521,6 +738,129 @@ def api_predict():
             'message': f'Prediction failed: {str(e)}'
         }), 500
 
+@app.route('/api/predict/batch', methods=['POST'])
+def api_predict_batch():
+    try:
+        current_user_id = "anonymous"  # Temporary for testing, same as /api/predict
+        data = request.get_json()
+
+        # Accept either a bare list of rows or {"rows": [...]}
+        rows = data.get('rows') if isinstance(data, dict) else data
+
+        if not isinstance(rows, list) or not rows:
+            return jsonify({
+                'status': 'error',
+                'message': 'Request body must contain a non-empty list of rows'
+            }), 422
+
+        if len(rows) > MAX_BATCH_ROWS:
+            return jsonify({
+                'status': 'error',
+                'message': f'Batch too large: {len(rows)} rows (max {MAX_BATCH_ROWS})'
+            }), 413
+
+        print(f"Batch prediction request from user: {current_user_id} ({len(rows)} rows)")
+
+        results = ml_model.predict_batch(rows)
+
+        succeeded = 0
+        for row, result in zip(rows, results):
+            if result['status'] == 'success':
+                succeeded += 1
+                record_prediction(current_user_id, row, result)
+
+        return jsonify({
+            'status': 'success',
+            'total': len(rows),
+            'succeeded': succeeded,
+            'failed': len(rows) - succeeded,
+            'results': results
+        })
+
+    except Exception as e:
+        print(f"❌ Batch prediction error: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Batch prediction failed: {str(e)}'
+        }), 500
+
+def import_status(report):
+    """'partial' when a failed import had already committed some rows"""
+    return 'partial' if report['accepted'] else 'error'
+
+@app.route('/api/campaign-metrics/import', methods=['POST'])
+@jwt_required()
+def api_import_campaign_metrics():
+    """Stream a CSV or NDJSON export into campaign metrics
+    
+    Send the file as the raw request body (not a multipart form) with
+    Content-Type text/csv or application/x-ndjson, or pass ?format=.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        fmt = detect_format(request.content_type, request.args.get('format'))
+        if fmt is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'Send text/csv or application/x-ndjson, or pass ?format=csv|ndjson'
+            }), 415
+        
+        print(f"Campaign metrics import ({fmt}) from user: {current_user_id}")
+        report = import_metrics(
+            request.stream, fmt,
+            lambda rows: db.add_campaign_metrics_batch(current_user_id, rows),
+            batch_size=IMPORT_BATCH_SIZE
+        )
+        print(f"✅ Imported {report['accepted']} rows ({report['rejected']} rejected) "
+              f"at {report['rows_per_second']} rows/s")
+        return jsonify({'status': 'success', **report})
+        
+    except UploadDecodeError as e:
+        # Batches before the bad bytes are already committed; say which
+        return jsonify({'status': import_status(e.report), 'message': str(e), **e.report}), 400
+    except IngestError as e:
+        print(f"❌ Import error: {str(e)}")
+        return jsonify({'status': import_status(e.report), 'message': str(e), **e.report}), 500
+    except Exception as e:
+        print(f"❌ Import error: {str(e)}")
+        return jsonify({'status': 'error', 'message': f'Import failed: {str(e)}'}), 500
+
+HISTORY_EXPORTS = {
+    'predictions': ('iter_prediction_history', export.prediction_records,
+                    export.PREDICTION_CSV_COLUMNS, export.flatten_prediction),
+    'optimizations': ('iter_optimization_history', export.optimization_records,
+                      export.OPTIMIZATION_CSV_COLUMNS, export.flatten_optimization)
+}
+
+@app.route('/api/history/<kind>/export', methods=['GET'])
+@jwt_required()
+def api_export_history(kind):
+    """Stream the user's prediction or optimization history as NDJSON or CSV
+    
+    Rows are read a page at a time and written as they arrive, so the export
+    size is not limited by memory.
+    """
+    if kind not in HISTORY_EXPORTS:
+        return jsonify({'status': 'error', 'message': 'Unknown history type'}), 404
+    fmt = (request.args.get('format') or 'ndjson').lower()
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({'status': 'error', 'message': 'format must be ndjson or csv'}), 400
+    
+    current_user_id = get_jwt_identity()
+    iterator, to_records, columns, flatten = HISTORY_EXPORTS[kind]
+    records = to_records(getattr(db, iterator)(current_user_id, page_size=HISTORY_EXPORT_PAGE_SIZE))
+    if fmt == 'csv':
+        lines, mimetype = export.csv_lines(records, columns, flatten), 'text/csv'
+    else:
+        lines, mimetype = export.ndjson_lines(records), 'application/x-ndjson'
+    
+    print(f"Exporting {kind} history ({fmt}) for user: {current_user_id}")
+    return Response(
+        stream_with_context(lines),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={kind}-history.{fmt}'}
+    )
+
 @app.route('/api/recommendations', methods=['GET'])
 @jwt_required()
 def api_recommendations():
@@ -611,7 +951,7 @@ def api_optimize():
         ]
         
         # Save optimization settings
-        db.save_optimization_settings(current_user_id, data, optimization_results)
+        record_optimization(current_user_id, data, optimization_results)
         
         return jsonify({
             'status': 'success',
@@ -630,27 +970,39 @@ def api_optimize():
 @jwt_required()
 def api_train_model():
     try:
-        print("🔄 Training ML model...")
+        job, created = training_jobs.submit()
         
-        result = ml_model.train_model()
-        
-        if result['status'] == 'success':
-            return jsonify({
-                'status': 'success',
-                'message': 'ML model trained successfully',
-                'metrics': result.get('metrics', {}),
-                'training_time': '45 seconds'
-            })
+        if created:
+            print(f"🔄 Training job {job['job_id']} queued")
+            message = 'Model training started'
         else:
-            return jsonify({
-                'status': 'error',
-                'message': result.get('message', 'Model training failed')
-            }), 500
+            message = 'Model training already in progress'
+        
+        return jsonify({
+            'status': 'accepted',
+            'message': message,
+            'job_id': job['job_id'],
+            'job': job,
+            'status_url': url_for('api_train_model_status', job_id=job['job_id'])
+        }), 202
         
     except Exception as e:
         print(f"❌ Model training error: {str(e)}")
         return jsonify({'status': 'error', 'message': f'Model training failed: {str(e)}'}), 500
 
+@app.route('/api/train-model/<job_id>', methods=['GET'])
+@jwt_required()
+def api_train_model_status(job_id):
+    job = training_jobs.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Training job not found'}), 404
+    return jsonify({'status': 'success', 'job': job})
+
+@app.route('/api/train-model/jobs', methods=['GET'])
+@jwt_required()
+def api_train_model_jobs():
+    return jsonify({'status': 'success', 'jobs': training_jobs.all_jobs()})
+
 # Debug endpoint to check received data
 @app.route('/api/debug-optimize', methods=['POST'])
 @jwt_required()
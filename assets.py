@@ -0,0 +1,327 @@
+"""Fingerprinted, minified and precompressed frontend assets.
+
+The CSS and JS under Frontend/ are minified, named after a hash of their
+content (style.css -> style.3f9c2a71d0.css) and written to a build
+directory next to .gz and, when the brotli package is installed, .br
+copies. A manifest maps source names to built ones so templates keep
+writing url_for('static', filename='style.css').
+
+A hashed file never changes, so it is served with an immutable, year-long
+Cache-Control: browsers stop asking for it until a deploy changes its
+name. The build directory uses nginx's gzip_static/brotli_static layout
+and a proxy can serve it directly.
+
+Run `python assets.py build` as a deploy step; the app also builds at
+startup, which only compresses files whose hash is new.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MANIFEST_NAME = 'manifest.json'
+
+# Preferred first
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+_HASH_LENGTH = 10
+
+# ==================== MINIFIERS ====================
+
+_CSS_STRINGS_AND_COMMENTS = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|/\*.*?\*/''', re.S)
+_CSS_WHITESPACE = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|\s*;?\s*}\s*|\s*([{;,>])\s*|(:)\s+|\s+''')
+
+
+def minify_css(source):
+    """Drop comments and the whitespace CSS doesn't need; strings are left alone"""
+    text = _CSS_STRINGS_AND_COMMENTS.sub(lambda m: m.group(1) or '', source)
+
+    def squeeze(match):
+        string, punctuation, colon = match.groups()
+        if string:
+            return string
+        if punctuation or colon:
+            return punctuation or colon
+        return '}' if '}' in match.group(0) else ' '
+
+    return _CSS_WHITESPACE.sub(squeeze, text).strip()
+
+
+# After these (or at the start), a '/' begins a regular expression, not a division
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = ('return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new',
+                   'delete', 'void', 'throw', 'instanceof', 'yield', 'await')
+
+
+def _is_word(char):
+    return char.isalnum() or char in '_$\\' or ord(char) > 127
+
+
+def _regex_allowed(out):
+    text = ''.join(out[-12:]).rstrip()
+    if not text or text[-1] in _REGEX_PRECEDERS:
+        return True
+    return any(text.endswith(keyword) and (len(text) == len(keyword) or not _is_word(text[-len(keyword) - 1]))
+               for keyword in _REGEX_KEYWORDS)
+
+
+def _quoted_end(source, i, quote):
+    """Index just past the string or regex starting at i"""
+    in_class = False
+    i += 1
+    while i < len(source):
+        char = source[i]
+        if char == '\\':
+            i += 2
+            continue
+        if quote == '/' and char == '[':
+            in_class = True
+        elif quote == '/' and char == ']':
+            in_class = False
+        elif char == quote and not in_class:
+            return i + 1
+        elif char == '\n' and quote != '`':
+            break
+        i += 1
+    raise ValueError(f"Unterminated {quote} literal at offset {i}")
+
+
+def minify_js(source):
+    """Drop comments, indentation and blank lines; strings, templates and regexes are copied as is
+
+    Line breaks between statements are kept, so automatic semicolon
+    insertion sees the same code as before.
+    """
+    out = []
+    # One entry per nesting level: None inside a template literal's text,
+    # else the brace depth of the code (the outermost code, or a ${...})
+    stack = [0]
+    i, n = 0, len(source)
+    while i < n:
+        char = source[i]
+
+        if stack[-1] is None:
+            if char == '\\':
+                out.append(source[i:i + 2])
+                i += 2
+            elif char == '`':
+                out.append(char)
+                stack.pop()
+                i += 1
+            elif source.startswith('${', i):
+                out.append('${')
+                stack.append(0)
+                i += 2
+            else:
+                out.append(char)
+                i += 1
+            continue
+
+        if char.isspace() or source.startswith('//', i) or source.startswith('/*', i):
+            # A run of whitespace and comments becomes a line break, one space or nothing
+            newline = False
+            while i < n:
+                if source[i].isspace():
+                    newline = newline or source[i] == '\n'
+                    i += 1
+                elif source.startswith('//', i):
+                    end = source.find('\n', i)
+                    i = n if end == -1 else end
+                elif source.startswith('/*', i):
+                    end = source.find('*/', i + 2)
+                    if end == -1:
+                        raise ValueError(f"Unterminated comment at offset {i}")
+                    newline = newline or '\n' in source[i:end]
+                    i = end + 2
+                else:
+                    break
+            previous = out[-1][-1] if out else ''
+            following = source[i] if i < n else ''
+            if not previous or not following:
+                continue
+            if newline:
+                if previous != '\n':
+                    out.append('\n')
+            elif ((_is_word(previous) and _is_word(following)) or (previous in '+-' and previous == following)
+                  or (previous.isdigit() and following == '.')):
+                out.append(' ')
+            continue
+
+        if char in '\'"' or (char == '/' and _regex_allowed(out)):
+            end = _quoted_end(source, i, char)
+            out.append(source[i:end])
+            i = end
+        elif char == '`':
+            out.append(char)
+            stack.append(None)
+            i += 1
+        elif char == '{':
+            stack[-1] += 1
+            out.append(char)
+            i += 1
+        elif char == '}' and stack[-1] == 0 and len(stack) > 1:
+            # End of a ${...}: back into the template text
+            out.append(char)
+            stack.pop()
+            i += 1
+        else:
+            if char == '}':
+                stack[-1] -= 1
+            out.append(char)
+            i += 1
+
+    return ''.join(out).strip()
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+# ==================== BUILD ====================
+
+
+def compress(data):
+    """Encoded copies of data by Content-Encoding name"""
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    return variants
+
+
+def negotiate(accept_encodings, available):
+    """Best encoding in available that the client accepts, or None for identity"""
+    for encoding in ENCODING_SUFFIXES:
+        if encoding in available and accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def _write_if_missing(path, data):
+    if os.path.exists(path):
+        return False
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+    return True
+
+
+class AssetPipeline:
+    def __init__(self, source_dir, output_dir):
+        self.source_dir = source_dir
+        self.output_dir = os.path.abspath(output_dir)
+        self.manifest = {}   # source name -> entry
+        self.by_file = {}    # built name -> entry
+
+    def build(self):
+        """Minify, fingerprint and compress every CSS/JS file; returns the manifest"""
+        if not os.path.isdir(self.source_dir):
+            print(f"⚠️ Asset source directory not found: {self.source_dir}")
+            return self.manifest
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        manifest, written = {}, 0
+        for name in sorted(os.listdir(self.source_dir)):
+            base, extension = os.path.splitext(name)
+            minify = MINIFIERS.get(extension)
+            if minify is None:
+                continue
+            with open(os.path.join(self.source_dir, name), encoding='utf-8') as f:
+                source = f.read()
+            try:
+                data = minify(source).encode('utf-8')
+            except ValueError as e:
+                # Ship it as written rather than risk a broken minification
+                print(f"⚠️ Not minifying {name}: {e}")
+                data = source.encode('utf-8')
+
+            digest = hashlib.sha256(data).hexdigest()[:_HASH_LENGTH]
+            built = f'{base}.{digest}{extension}'
+            path = os.path.join(self.output_dir, built)
+            if _write_if_missing(path, data):
+                written += 1
+                for encoding, encoded in compress(data).items():
+                    # Only worth keeping if it is actually smaller
+                    if len(encoded) < len(data):
+                        _write_if_missing(path + ENCODING_SUFFIXES[encoding], encoded)
+            manifest[name] = {
+                'file': built,
+                'hash': digest,
+                'mimetype': mimetypes.guess_type(name)[0] or 'application/octet-stream',
+                'size': len(data),
+                'source_size': len(source.encode('utf-8')),
+                'encodings': [encoding for encoding, suffix in ENCODING_SUFFIXES.items()
+                              if os.path.exists(path + suffix)]
+            }
+
+        self._prune(manifest)
+        with open(os.path.join(self.output_dir, MANIFEST_NAME), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        self.manifest = manifest
+        self.by_file = {entry['file']: entry for entry in manifest.values()}
+        print(f"✅ Assets built: {len(manifest)} files ({written} new) in {self.output_dir}")
+        return manifest
+
+    def _prune(self, manifest):
+        """Delete builds older than the previous one (pages cached from before a deploy still work)"""
+        keep = {entry['file'] for entry in manifest.values()}
+        try:
+            with open(os.path.join(self.output_dir, MANIFEST_NAME)) as f:
+                keep.update(entry['file'] for entry in json.load(f).values())
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            pass
+        for name in os.listdir(self.output_dir):
+            if name == MANIFEST_NAME:
+                continue
+            built = name
+            for suffix in ENCODING_SUFFIXES.values():
+                if built.endswith(suffix):
+                    built = built[:-len(suffix)]
+            if built not in keep:
+                os.remove(os.path.join(self.output_dir, name))
+
+    def url_name(self, filename):
+        """Built name to link to for a source name (unchanged if it isn't built)"""
+        entry = self.manifest.get(filename)
+        return entry['file'] if entry else filename
+
+    def path(self, built, encoding=None):
+        return os.path.join(self.output_dir, built + (ENCODING_SUFFIXES[encoding] if encoding else ''))
+
+    def stats(self):
+        return {
+            name: {
+                'file': entry['file'],
+                'source_bytes': entry['source_size'],
+                'minified_bytes': entry['size'],
+                'encodings': entry['encodings']
+            }
+            for name, entry in self.manifest.items()
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build fingerprinted, precompressed frontend assets")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="minify, hash and compress Frontend/ CSS and JS")
+    build.add_argument('--source', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Frontend'))
+    build.add_argument('--output', default=os.environ.get('ASSET_BUILD_DIR', 'static_build'))
+    args = parser.parse_args()
+
+    pipeline = AssetPipeline(args.source, args.output)
+    for name, entry in pipeline.build().items():
+        sizes = ', '.join(f"{encoding} {os.path.getsize(pipeline.path(entry['file'], encoding))}"
+                          for encoding in entry['encodings'])
+        print(f"   {name:<12} {entry['source_size']:>7} -> {entry['size']:>7} B  {entry['file']}  ({sizes})")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
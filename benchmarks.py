@@ -0,0 +1,551 @@
+"""Performance benchmarks for AdOptimizer AI.
+
+Usage:
+    python benchmarks.py inference [--repeat N]
+    python benchmarks.py microbatch [--threads N] [--requests N]
+    python benchmarks.py pool [--workers N] [--requests N]
+    python benchmarks.py startup [--budget-ms MS]
+    python benchmarks.py training [--rows N] [--jobs N ...] [--memory-limit-mb MB]
+    python benchmarks.py db [--threads N] [--requests N] [--pool-sizes N ...]
+    python benchmarks.py memory-store [--users N] [--threads N] [--lookups N]
+    python benchmarks.py prediction-history [--records N] [--capacity N] [--spill]
+    python benchmarks.py auth [--login-threads N] [--workers N] [--seconds S]
+    python benchmarks.py blocklist [--tokens N] [--lookups N]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+
+def _random_rows(n_rows, seed=0):
+    """Random feature matrix in the same ranges as the synthetic training data"""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(1000, 100000, n_rows),
+        rng.uniform(100, 10000, n_rows),
+        rng.uniform(0.01, 0.1, n_rows),
+        rng.uniform(2, 30, n_rows),
+        rng.uniform(0.02, 0.2, n_rows),
+    ]).astype(np.float64)
+
+
+def _time_call(fn, repeat):
+    """Best-of-repeat wall time of fn() in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench_inference(args):
+    """Compare sklearn and compiled-forest prediction on the serving model"""
+    from ml_model import AdOptimizerModel
+
+    model = AdOptimizerModel()
+    if not model.load_model():
+        print("❌ Could not load or train model")
+        return 1
+
+    from forest_engine import verify_compiled
+
+    X = _random_rows(max(args.sizes))
+    try:
+        checked = verify_compiled(model.compiled, model.model, model.scaler)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    if not np.array_equal(model.model.predict(model.scaler.transform(X)), model.compiled.predict(X)):
+        print("❌ Compiled forest output differs from sklearn")
+        return 1
+    print(f"✅ Compiled forest matches sklearn on {checked} check rows; "
+          f"serving it for batches up to {model.compiled_max_rows} rows")
+
+    print(f"{'rows':>6} {'sklearn ms':>12} {'compiled ms':>12} {'speedup':>8}")
+    for n_rows in args.sizes:
+        X_n = X[:n_rows]
+        sklearn_ms = _time_call(lambda: model.model.predict(model.scaler.transform(X_n)), args.repeat)
+        compiled_ms = _time_call(lambda: model.compiled.predict(X_n), args.repeat)
+        print(f"{n_rows:>6} {sklearn_ms:>12.3f} {compiled_ms:>12.3f} {sklearn_ms / compiled_ms:>7.1f}x")
+    return 0
+
+
+def _row_dicts(n_rows, seed=0):
+    """Random prediction inputs as the dicts /api/predict receives"""
+    features = ['impressions', 'spend', 'current_CTR', 'current_CPC', 'engagement_rate']
+    return [dict(zip(features, row)) for row in _random_rows(n_rows, seed).tolist()]
+
+
+def _run_concurrently(predict, rows, n_threads):
+    """Spread rows over n_threads calling predict(row); return requests/second"""
+    chunks = [rows[i::n_threads] for i in range(n_threads)]
+
+    def worker(chunk):
+        for row in chunk:
+            predict(row)
+
+    threads = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(rows) / (time.perf_counter() - start)
+
+
+def bench_microbatch(args):
+    """Throughput of concurrent predictions with and without micro-batching"""
+    from ml_model import AdOptimizerModel
+    from micro_batcher import MicroBatcher
+
+    model = AdOptimizerModel()
+    if not model.load_model():
+        print("❌ Could not load or train model")
+        return 1
+
+    rows = _row_dicts(args.requests)
+    direct = _run_concurrently(model.predict, rows, args.threads)
+    print(f"direct:      {direct:>10.0f} req/s")
+
+    batcher = MicroBatcher(model.predict_batch, args.window_ms, args.max_batch)
+    batched = _run_concurrently(batcher.predict, rows, args.threads)
+    stats = batcher.stats()
+    batcher.close()
+    print(f"micro-batch: {batched:>10.0f} req/s "
+          f"(avg batch {stats['avg_batch_size']}, avg queue delay {stats['avg_queue_delay_ms']} ms)")
+    return 0
+
+
+def _memory_kb(pid):
+    """Rss, Pss and private memory of a process from /proc (Linux only)"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    }
+
+
+def bench_pool(args):
+    """Memory per worker and throughput per core of the process inference pool"""
+    from ml_model import AdOptimizerModel
+    from inference_pool import InferencePool
+    from micro_batcher import MicroBatcher
+
+    model = AdOptimizerModel()
+    if not model.load_model():
+        print("❌ Could not load or train model")
+        return 1
+
+    forest_bytes = sum(getattr(model.compiled, name).nbytes
+                       for name in ('feature', 'threshold', 'left', 'right', 'value', 'roots'))
+    print(f"compiled forest: {forest_bytes / 1024:.1f} KiB of node arrays")
+
+    rows = _row_dicts(args.requests)
+    in_process = _run_concurrently(model.predict, rows, args.workers * 2)
+    print(f"in-process:  {in_process:>10.0f} req/s")
+
+    pool = InferencePool(args.workers)
+    model.attach_pool(pool)
+    pooled = _run_concurrently(model.predict, rows, args.workers * 2)
+    print(f"pool:        {pooled:>10.0f} req/s "
+          f"({pooled / args.workers:.0f} req/s per worker, {args.workers} workers)")
+
+    # Batching amortizes the per-task IPC round trip across many rows
+    batcher = MicroBatcher(model.predict_batch, 2.0, 64)
+    pooled_batched = _run_concurrently(batcher.predict, rows, args.workers * 8)
+    batcher.close()
+    print(f"pool+batch:  {pooled_batched:>10.0f} req/s "
+          f"({pooled_batched / args.workers:.0f} req/s per worker)")
+
+    print(f"{'pid':>8} {'rss KiB':>10} {'pss KiB':>10} {'private KiB':>12}")
+    for pid in pool.worker_pids():
+        memory = _memory_kb(pid)
+        print(f"{pid:>8} {memory['rss']:>10} {memory['pss']:>10} {memory['private']:>12}")
+
+    pool.close()
+    return 0
+
+
+# Run in a fresh interpreter: import the app, then time the first prediction
+# through the Flask test client. Prints one line of timings for the parent.
+_STARTUP_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+response = client.post('/api/predict', json={
+    'impressions': 20000, 'spend': 1500.0, 'current_CTR': 0.035,
+    'current_CPC': 12.0, 'engagement_rate': 0.06
+})
+first = time.perf_counter()
+assert response.status_code == 200, response.get_data(as_text=True)
+heavy = [name for name in ('sklearn', 'pandas', 'joblib') if name in sys.modules]
+print('STARTUP', imported - start, first - start, ','.join(heavy), file=sys.stderr)
+"""
+
+
+def _parse_importtime(stderr, top):
+    """Top modules by self time from `python -X importtime` output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def bench_startup(args):
+    """Import-time breakdown and time-to-first-prediction of the app, against a budget"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, MODEL_RELOAD_INTERVAL='0')
+    command = [sys.executable, '-X', 'importtime', '-c', _STARTUP_SCRIPT]
+
+    # The first run may have to populate the model registry; time the second
+    subprocess.run(command, cwd=here, env=env, capture_output=True, text=True)
+    result = subprocess.run(command, cwd=here, env=env, capture_output=True, text=True)
+
+    timing = [line for line in result.stderr.splitlines() if line.startswith('STARTUP')]
+    if result.returncode != 0 or not timing:
+        print(result.stderr[-2000:])
+        print("❌ Startup benchmark failed to run")
+        return 1
+
+    _, import_s, first_s, *heavy = timing[0].split(' ')
+    import_ms = float(import_s) * 1000
+    first_ms = float(first_s) * 1000
+    heavy = [name for name in ''.join(heavy).split(',') if name]
+
+    print(f"{'self ms':>9} {'cumulative ms':>14}  module")
+    for self_us, cumulative_us, name in _parse_importtime(result.stderr, args.top):
+        print(f"{self_us / 1000:>9.1f} {cumulative_us / 1000:>14.1f}  {name}")
+
+    print(f"\nimport app:            {import_ms:>8.1f} ms")
+    print(f"time to first predict: {first_ms:>8.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"training-only modules loaded: {', '.join(heavy) or 'none'}")
+
+    failures = []
+    if first_ms > args.budget_ms:
+        failures.append(f"time to first prediction {first_ms:.0f} ms exceeds {args.budget_ms:.0f} ms")
+    if heavy:
+        failures.append(f"serving path imported {', '.join(heavy)}")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Startup within budget")
+    return 1 if failures else 0
+
+
+def bench_training(args):
+    """Per-stage wall time and peak RSS of the large training path, per worker count"""
+    from ml_model import AdOptimizerModel
+    from model_registry import ModelRegistry
+
+    # Train into a throwaway registry so the served model is left alone
+    root = tempfile.mkdtemp(prefix='bench-registry-')
+    try:
+        for n_jobs in args.jobs:
+            model = AdOptimizerModel(registry=ModelRegistry(root))
+            result = model.train_large(args.rows, n_jobs=n_jobs, memory_limit_mb=args.memory_limit_mb)
+            if result['status'] != 'success':
+                print(f"❌ {result['message']}")
+                return 1
+            metrics = result['metrics']
+            total = sum(stage['seconds'] for stage in metrics['stages'])
+            print(f"\n{metrics['samples']} rows, {metrics['n_jobs']} workers: {total:.2f}s total")
+            print(f"{'stage':<10} {'seconds':>9} {'peak RSS MB':>12}")
+            for stage in metrics['stages']:
+                print(f"{stage['stage']:<10} {stage['seconds']:>9.3f} {stage['peak_rss_mb']:>12}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+def bench_db(args):
+    """Concurrent get_user_metrics against MySQL, shared connection vs pool"""
+    from db import Database
+
+    for pool_size in args.pool_sizes:
+        database = Database(pool_size=pool_size)
+        user = database.fetch_one("SELECT id FROM users LIMIT 1")
+        if not user:
+            print("❌ No users in the database; start the app once to seed it")
+            return 1
+        rows = [user['id']] * args.requests
+        throughput = _run_concurrently(database.get_user_metrics, rows, args.threads)
+        label = f"pool of {pool_size}" if pool_size else "shared connection"
+        print(f"{label:<20} {throughput:>10.0f} req/s")
+        if database.pool_stats():
+            print(f"   {database.pool_stats()}")
+        database.close()
+    return 0
+
+
+def bench_memory_store(args):
+    """Signup, lookup, delete and listing cost of the in-memory store at scale"""
+    from memory_store import MemoryStore
+
+    store = MemoryStore()
+    rss_before = _memory_kb(os.getpid())['rss']
+
+    start = time.perf_counter()
+    for n in range(args.users):
+        store.create_user(f'user{n}', f'user{n}@example.com', 'password')
+    elapsed = time.perf_counter() - start
+    rss_mb = (_memory_kb(os.getpid())['rss'] - rss_before) / 1024
+    print(f"create      {args.users:>9} users  {elapsed:7.2f}s  {args.users / elapsed:>10.0f}/s  "
+          f"(+{rss_mb:.0f} MB RSS, {rss_mb * 1024 * 1024 / args.users:.0f} B/user)")
+
+    rng = np.random.default_rng(0)
+    ids = [int(user_id) for user_id in rng.integers(1, args.users + 1, args.lookups)]
+    emails = [f'user{user_id - 1}@example.com' for user_id in ids]
+    for label, lookup, keys in (('by id', store.get_user_by_id, ids),
+                                ('by email', store.get_user_by_email, emails)):
+        start = time.perf_counter()
+        for key in keys:
+            lookup(key)
+        elapsed = time.perf_counter() - start
+        print(f"lookup {label:<9} {len(keys):>9}  {elapsed * 1e6 / len(keys):7.2f} us/op")
+
+    start = time.perf_counter()
+    store.list_users(sort='username', limit=50)
+    print(f"first listing after bulk load (index merge)  {(time.perf_counter() - start) * 1000:.1f} ms")
+    start = time.perf_counter()
+    for _ in range(100):
+        store.list_users(sort='username', limit=50)
+    print(f"listing page                    {(time.perf_counter() - start) * 10:.3f} ms")
+
+    victims = list(dict.fromkeys(ids))[:args.lookups // 10]
+    start = time.perf_counter()
+    for user_id in victims:
+        store.delete_user(user_id)
+    elapsed = time.perf_counter() - start
+    print(f"delete      {len(victims):>9}  {elapsed * 1e6 / len(victims):7.2f} us/op")
+
+    # Concurrent signups must still get distinct ids and a consistent count
+    created = []
+    def signup(chunk):
+        for n in chunk:
+            created.append(store.create_user(f'concurrent{n}', f'concurrent{n}@example.com', 'password')[0])
+    chunks = [range(t, args.lookups, args.threads) for t in range(args.threads)]
+    threads = [threading.Thread(target=signup, args=(chunk,)) for chunk in chunks]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    expected = args.users - len(victims) + args.lookups
+    consistent = len(set(created)) == len(created) == args.lookups and store.count_users() == expected
+    print(f"concurrent signups ({args.threads} threads) {args.lookups / elapsed:>10.0f}/s  "
+          f"{'✅ ids unique, count consistent' if consistent else '❌ inconsistent'}")
+    return 0 if consistent else 1
+
+
+def bench_prediction_history(args):
+    """Memory per record and read cost of the columnar prediction history vs dicts"""
+    import tracemalloc
+    from datetime import datetime
+    from prediction_history import PredictionHistory
+
+    rows = _row_dicts(args.records)
+    results = [{'status': 'success', 'predicted_CTR': 0.0412, 'predicted_CPC': 11.5,
+                'label': 'Medium', 'recommendation': 'Consider a 5-10% budget increase'}] * args.records
+
+    tracemalloc.start()
+    baseline = []
+    for row, result in zip(rows, results):
+        baseline.append({'input_data': dict(row), 'prediction_result': dict(result),
+                         'timestamp': datetime.now().isoformat()})
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    del baseline
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+
+    spill_dir = tempfile.mkdtemp(prefix='bench-history-') if args.spill else None
+    history = PredictionHistory(capacity=args.capacity, spill_dir=spill_dir)
+    start = time.perf_counter()
+    history.extend(('anonymous', row, result, None) for row, result in zip(rows, results))
+    write_seconds = time.perf_counter() - start
+    ring_bytes = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print(f"{args.records} records, capacity {args.capacity}{', spilling' if args.spill else ''}")
+    print(f"dict list     {dict_bytes / args.records:8.0f} B/record")
+    print(f"ring buffer   {ring_bytes / min(args.records, args.capacity):8.0f} B/record in memory  "
+          f"({args.records / write_seconds:.0f} records/s)")
+    recent_ms = _time_call(lambda: history.recent('anonymous', 5), 20)
+    print(f"recent(5)     {recent_ms * 1000:8.0f} us")
+    start = time.perf_counter()
+    exported = sum(1 for _ in history.iter_records('anonymous'))
+    print(f"full export   {time.perf_counter() - start:8.2f} s for {exported} records")
+    print(f"   {history.stats()}")
+    history.close()
+    if spill_dir:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+    return 0
+
+
+def bench_auth(args):
+    """Predict latency during a login burst: bcrypt on every request thread vs a small pool"""
+    from ml_model import AdOptimizerModel
+    from password_hasher import HashingBusy, PasswordHasher
+
+    model = AdOptimizerModel(cache_size=0)
+    if not model.load_model():
+        print("❌ No trained model to predict with")
+        return 1
+    rows = _row_dicts(256)
+
+    for label, workers in (('bcrypt on request threads', args.login_threads),
+                           (f'bcrypt pool of {args.workers}', args.workers)):
+        hasher = PasswordHasher(rounds=args.rounds, workers=workers, max_pending=args.login_threads, timeout=1.0)
+        stored = hasher.hash('correct horse')
+        stop = threading.Event()
+        counts = {'logins': 0, 'busy': 0}
+
+        def login():
+            while not stop.is_set():
+                try:
+                    hasher.verify('correct horse', stored)
+                    counts['logins'] += 1
+                except HashingBusy:
+                    counts['busy'] += 1
+
+        threads = [threading.Thread(target=login) for _ in range(args.login_threads)]
+        for thread in threads:
+            thread.start()
+        latencies = []
+        deadline = time.perf_counter() + args.seconds
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            model.predict(rows[len(latencies) % len(rows)])
+            latencies.append((time.perf_counter() - start) * 1000)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        hasher.close()
+
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"{label:<28} predict p50 {p50:7.2f} ms  p99 {p99:8.2f} ms  "
+              f"{len(latencies) / args.seconds:7.0f} predicts/s  {counts['logins'] / args.seconds:5.1f} logins/s")
+    return 0
+
+
+def bench_blocklist(args):
+    """Revocation check cost and snapshot size/load time of the token blocklist"""
+    import uuid
+    from token_blocklist import TokenBlocklist
+
+    snapshot_dir = tempfile.mkdtemp(prefix='bench-blocklist-')
+    path = os.path.join(snapshot_dir, 'blocklist.bin')
+    blocklist = TokenBlocklist(86400, path)
+    revoked = [str(uuid.uuid4()) for _ in range(args.tokens)]
+    live = [str(uuid.uuid4()) for _ in range(args.lookups)]
+
+    start = time.perf_counter()
+    for jti in revoked:
+        blocklist.revoke(jti)
+    revoke_seconds = time.perf_counter() - start
+    sample = revoked[:args.lookups]
+    miss_ms = _time_call(lambda: [blocklist.is_revoked(jti) for jti in live], 5)
+    hit_ms = _time_call(lambda: [blocklist.is_revoked(jti) for jti in sample], 5)
+
+    start = time.perf_counter()
+    reloaded = TokenBlocklist(86400, path)
+    load_seconds = time.perf_counter() - start
+
+    print(f"{args.tokens} revoked tokens")
+    print(f"revoke        {args.tokens / revoke_seconds:10.0f} tokens/s (appending to the snapshot)")
+    print(f"check (live)  {miss_ms * 1000 / len(live):10.3f} us")
+    print(f"check (revoked) {hit_ms * 1000 / len(sample):8.3f} us")
+    print(f"snapshot      {os.path.getsize(path) / args.tokens:10.1f} B/token, "
+          f"loaded in {load_seconds * 1000:.0f} ms ({reloaded.stats()['active']} active)")
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AdOptimizer AI benchmarks")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    inference = subparsers.add_parser('inference', help="sklearn vs compiled forest prediction")
+    inference.add_argument('--repeat', type=int, default=20)
+    inference.add_argument('--sizes', type=int, nargs='+', default=[1, 8, 64, 256, 1024, 4096])
+    inference.set_defaults(func=bench_inference)
+
+    microbatch = subparsers.add_parser('microbatch', help="concurrent predict with and without micro-batching")
+    microbatch.add_argument('--threads', type=int, default=32)
+    microbatch.add_argument('--requests', type=int, default=5000)
+    microbatch.add_argument('--window-ms', type=float, default=2.0)
+    microbatch.add_argument('--max-batch', type=int, default=64)
+    microbatch.set_defaults(func=bench_microbatch)
+
+    pool = subparsers.add_parser('pool', help="process inference pool memory and throughput")
+    pool.add_argument('--workers', type=int, default=os.cpu_count())
+    pool.add_argument('--requests', type=int, default=5000)
+    pool.set_defaults(func=bench_pool)
+
+    startup = subparsers.add_parser('startup', help="cold-start import profile and time to first prediction")
+    startup.add_argument('--budget-ms', type=float, default=1000)
+    startup.add_argument('--top', type=int, default=15)
+    startup.set_defaults(func=bench_startup)
+
+    training = subparsers.add_parser('training', help="large-dataset training time and memory per stage")
+    training.add_argument('--rows', type=int, default=1000000)
+    training.add_argument('--jobs', type=int, nargs='+', default=[1, -1])
+    training.add_argument('--memory-limit-mb', type=int, default=None)
+    training.set_defaults(func=bench_training)
+
+    db = subparsers.add_parser('db', help="concurrent metrics queries, shared connection vs pool")
+    db.add_argument('--threads', type=int, default=16)
+    db.add_argument('--requests', type=int, default=2000)
+    db.add_argument('--pool-sizes', type=int, nargs='+', default=[0, 16])
+    db.set_defaults(func=bench_db)
+
+    memory_store = subparsers.add_parser('memory-store', help="in-memory user store at scale")
+    memory_store.add_argument('--users', type=int, default=1000000)
+    memory_store.add_argument('--threads', type=int, default=8)
+    memory_store.add_argument('--lookups', type=int, default=100000)
+    memory_store.set_defaults(func=bench_memory_store)
+
+    history = subparsers.add_parser('prediction-history', help="memory per record of prediction history")
+    history.add_argument('--records', type=int, default=1000000)
+    history.add_argument('--capacity', type=int, default=1000000)
+    history.add_argument('--spill', action='store_true', help="spill records beyond capacity to disk")
+    history.set_defaults(func=bench_prediction_history)
+
+    auth = subparsers.add_parser('auth', help="predict latency while logins are hashing")
+    auth.add_argument('--login-threads', type=int, default=16)
+    auth.add_argument('--workers', type=int, default=2)
+    auth.add_argument('--rounds', type=int, default=10)
+    auth.add_argument('--seconds', type=float, default=5)
+    auth.set_defaults(func=bench_auth)
+
+    blocklist = subparsers.add_parser('blocklist', help="revoked-token check cost and snapshot size")
+    blocklist.add_argument('--tokens', type=int, default=100000)
+    blocklist.add_argument('--lookups', type=int, default=100000)
+    blocklist.set_defaults(func=bench_blocklist)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """No connection became free within the checkout timeout"""
+
+
+def _is_connected(connection):
+    try:
+        return connection.is_connected()
+    except Exception:
+        return False
+
+
+def _close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of database connections.
+
+    Connections are opened lazily up to max_size and handed out one per
+    checkout; callers that find the pool exhausted wait up to timeout
+    seconds for one to be returned. A connection that sat idle longer than
+    health_check_after seconds is pinged before reuse and replaced if the
+    server dropped it.
+    """
+
+    def __init__(self, connect, max_size=10, timeout=30.0, health_check_after=30.0):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self._idle = deque()  # (connection, time it was returned)
+        self._cond = threading.Condition()
+        self._created = 0
+        self.in_use = 0
+        self.waiters = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+        self.reconnects = 0
+
+    def acquire(self):
+        """Check out a healthy connection, opening one if the pool isn't full"""
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        with self._cond:
+            waited = False
+            while not self._idle and self._created >= self.max_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(f"No database connection free after {self.timeout}s")
+                waited = True
+                self.waiters += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self.waiters -= 1
+
+            if self._idle:
+                # Most recently returned first: it is the least likely to have gone stale
+                connection, returned_at = self._idle.pop()
+            else:
+                connection, returned_at = None, None
+                self._created += 1
+
+            wait = time.perf_counter() - start
+            self.in_use += 1
+            self.checkouts += 1
+            if waited:
+                self.waits += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+        try:
+            if connection is None:
+                connection = self._connect()
+            elif time.monotonic() - returned_at > self.health_check_after:
+                connection = self._check(connection)
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self.in_use -= 1
+                self._cond.notify()
+            raise
+        return connection
+
+    def release(self, connection, broken=False):
+        """Return a connection; broken ones are closed and their slot freed"""
+        with self._cond:
+            self.in_use -= 1
+            if broken:
+                self._created -= 1
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+        if broken:
+            _close_quietly(connection)
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a with block"""
+        connection = self.acquire()
+        broken = False
+        try:
+            yield connection
+        except Exception:
+            broken = not _is_connected(connection)
+            raise
+        finally:
+            self.release(connection, broken)
+
+    def close(self):
+        """Close every idle connection; checked-out ones close on return"""
+        with self._cond:
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._created -= len(idle)
+        for connection in idle:
+            _close_quietly(connection)
+
+    def stats(self):
+        """Counters for monitoring pool pressure"""
+        with self._cond:
+            return {
+                'size': self._created,
+                'max_size': self.max_size,
+                'idle': len(self._idle),
+                'in_use': self.in_use,
+                'waiters': self.waiters,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'avg_wait_ms': round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+                'timeouts': self.timeouts,
+                'reconnects': self.reconnects
+            }
+
+    def _check(self, connection):
+        """Ping an idle connection, replacing it if the server dropped it"""
+        try:
+            connection.ping()
+            return connection
+        except Exception:
+            _close_quietly(connection)
+            replacement = self._connect()
+            with self._cond:
+                self.reconnects += 1
+            return replacement
@@ -1,10 +1,18 @@
 import mysql.connector
-from mysql.connector import Error
-import bcrypt
+from mysql.connector import Error, errorcode
 import os
 import json
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-import random
+from connection_pool import ConnectionPool
+from password_hasher import PasswordHasher
+from migrations import USER_COUNT_ADJUST, USER_COUNT_RECOUNT, run_migrations
+from read_cache import create_read_cache
+from rollup import ROLLUP_DELETE, ROLLUP_REBUILD, ROLLUP_UPSERT, rollup_rows
+from seeding import seed_sample_data
+from memory_store import check_user_cursor
 
 class Config:
     """Configuration class with default values"""
@@ -18,9 +26,160 @@ class Config:
     MYSQL_PASSWORD = os.environ.get('MYSQL_PASSWORD', 'Aditi@123')
     MYSQL_DATABASE = os.environ.get('MYSQL_DATABASE', 'ad_optimizer')
     MYSQL_PORT = int(os.environ.get('MYSQL_PORT', 3306))
+    
+    # Connection pool (MYSQL_POOL_SIZE=0 uses one shared connection)
+    MYSQL_POOL_SIZE = int(os.environ.get('MYSQL_POOL_SIZE', 10))
+    MYSQL_POOL_TIMEOUT = float(os.environ.get('MYSQL_POOL_TIMEOUT', 30))
+    
+    # Per-user read cache for dashboard queries (READ_CACHE_TTL=0 disables it;
+    # set READ_CACHE_REDIS_URL to share one cache between worker processes)
+    READ_CACHE_TTL = float(os.environ.get('READ_CACHE_TTL', 30))
+    READ_CACHE_SIZE = int(os.environ.get('READ_CACHE_SIZE', 10000))
+    READ_CACHE_REDIS_URL = os.environ.get('READ_CACHE_REDIS_URL')
+    
+    # Password hashing pool, when the caller doesn't share its own
+    # (BCRYPT_ROUNDS=0 calibrates the cost on the first hash to
+    # BCRYPT_TARGET_MS per hash on this machine)
+    BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 0))
+    BCRYPT_TARGET_MS = float(os.environ.get('BCRYPT_TARGET_MS', 250))
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 5))
+
+# What execute_query returns: the cursor is closed by then, so keep what callers need
+QueryResult = namedtuple('QueryResult', ['lastrowid', 'rowcount'])
+
+# Dashboard queries, kept here so plan_check.py can EXPLAIN exactly what runs.
+# Campaign aggregates read the daily rollup (see rollup.py), a primary-key
+# range per user; the rest are served by the indexes from migration 3.
+USER_METRICS_QUERY = '''
+    SELECT 
+        SUM(impressions) as total_impressions,
+        SUM(clicks) as total_clicks,
+        SUM(spend) as total_spend,
+        SUM(conversions) as total_conversions,
+        CASE 
+            WHEN SUM(impressions) > 0 THEN SUM(clicks) / SUM(impressions)
+            ELSE 0 
+        END as ctr,
+        CASE 
+            WHEN SUM(clicks) > 0 THEN SUM(spend) / SUM(clicks)
+            ELSE 0 
+        END as cpc,
+        CASE 
+            WHEN SUM(spend) > 0 THEN SUM(conversions) / SUM(spend)
+            ELSE 0 
+        END as conversion_rate,
+        CASE 
+            WHEN SUM(spend) > 0 THEN (SUM(conversions) * 100) / SUM(spend)  -- Assuming $100 value per conversion
+            ELSE 0 
+        END as roas,
+        CASE 
+            WHEN SUM(clicks) > 0 THEN SUM(conversions) / SUM(clicks)
+            ELSE 0 
+        END as engagement_rate
+    FROM campaign_daily_rollup 
+    WHERE user_id = %s AND day BETWEEN %s AND %s
+'''
+
+_CAMPAIGN_METRICS_SELECT = '''
+    SELECT 
+        campaign_name,
+        platform,
+        SUM(impressions) as impressions,
+        SUM(clicks) as clicks,
+        SUM(spend) as spend,
+        SUM(conversions) as conversions,
+        CASE 
+            WHEN SUM(impressions) > 0 THEN SUM(clicks) / SUM(impressions)
+            ELSE 0 
+        END as ctr,
+        CASE 
+            WHEN SUM(clicks) > 0 THEN SUM(spend) / SUM(clicks)
+            ELSE 0 
+        END as cpc,
+        CASE 
+            WHEN SUM(spend) > 0 THEN (SUM(conversions) * 100) / SUM(spend)
+            ELSE 0 
+        END as roas
+    FROM campaign_daily_rollup 
+    WHERE user_id = %s AND day BETWEEN %s AND %s
+'''
+CAMPAIGN_METRICS_QUERY = _CAMPAIGN_METRICS_SELECT + ' GROUP BY campaign_name, platform'
+CAMPAIGN_METRICS_BY_PLATFORM_QUERY = _CAMPAIGN_METRICS_SELECT + ' AND platform = %s GROUP BY campaign_name, platform'
+
+# Newest days first, walked backwards along the rollup key; get_recent_campaigns
+# keeps the first occurrence of each campaign
+RECENT_CAMPAIGN_ROWS_QUERY = '''
+    SELECT campaign_name, platform, day
+    FROM campaign_daily_rollup 
+    WHERE user_id = %s 
+    ORDER BY day DESC 
+    LIMIT %s
+'''
+
+USER_RECOMMENDATIONS_QUERY = '''
+    SELECT campaign_name, recommendation_text, confidence_score, created_at
+    FROM recommendations 
+    WHERE user_id = %s 
+    ORDER BY created_at DESC 
+    LIMIT %s
+'''
+
+PREDICTION_HISTORY_QUERY = '''
+    SELECT input_data, prediction_result, created_at
+    FROM prediction_history 
+    WHERE user_id = %s 
+    ORDER BY created_at DESC 
+    LIMIT %s
+'''
+
+OPTIMIZATION_HISTORY_QUERY = '''
+    SELECT settings, results, created_at
+    FROM optimization_history 
+    WHERE user_id = %s 
+    ORDER BY created_at DESC 
+    LIMIT %s
+'''
+
+# Training stream: daily campaign totals in primary-key order, so the server
+# reads the clustered index front to back and streams the first row at once
+# instead of sorting the whole table first
+TRAINING_ROWS_QUERY = '''
+    SELECT user_id, campaign_name, platform, day,
+           impressions, clicks, spend, conversions
+    FROM campaign_daily_rollup
+    ORDER BY user_id, day, platform, campaign_name
+'''
+
+# Admin user listing. Sort orders are whitelisted before they reach SQL; the
+# primary key and the unique username/email indexes already end in id, and
+# created_at gets its own index in migration 5
+USER_SORT_COLUMNS = {'id': 'id', 'username': 'username', 'email': 'email', 'created_at': 'created_at'}
+
+USER_LIST_QUERY = '''
+    SELECT id, username, email, created_at
+    FROM users
+    {where}
+    ORDER BY {order}
+    LIMIT %s
+'''
+
+USER_COUNT_QUERY = "SELECT value FROM counters WHERE name = 'users'"
+
+CAMPAIGN_COUNTS_QUERY = '''
+    SELECT user_id, COUNT(DISTINCT platform, campaign_name) AS campaigns_count
+    FROM campaign_daily_rollup
+    WHERE user_id IN ({placeholders})
+    GROUP BY user_id
+'''
+
+def _like_prefix(text):
+    """LIKE pattern matching values that start with text"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
 
 class Database:
-    def __init__(self):
+    def __init__(self, pool_size=None, hasher=None):
         self.config = {
             'host': Config.MYSQL_HOST,
             'user': Config.MYSQL_USER,
@@ -30,7 +189,33 @@ class Database:
         }
         self.connection = None
         self.cursor = None
-        self.connect()
+        self.pool = None
+        # Serializes use of the shared connection when not pooled
+        self._lock = threading.Lock()
+        # A hasher passed in (the app's) is shared, so there is one bcrypt pool
+        self._owns_hasher = hasher is None
+        self.hasher = hasher or PasswordHasher(
+            rounds=Config.BCRYPT_ROUNDS or None,
+            target_ms=Config.BCRYPT_TARGET_MS,
+            workers=Config.PASSWORD_HASH_WORKERS,
+            max_pending=Config.PASSWORD_HASH_QUEUE,
+            timeout=Config.PASSWORD_HASH_TIMEOUT
+        )
+        self.read_cache = None
+        if Config.READ_CACHE_TTL > 0:
+            self.read_cache = create_read_cache(
+                Config.READ_CACHE_TTL, Config.READ_CACHE_SIZE, Config.READ_CACHE_REDIS_URL
+            )
+        
+        pool_size = Config.MYSQL_POOL_SIZE if pool_size is None else pool_size
+        if pool_size > 0:
+            self.pool = ConnectionPool(self._open_connection, max_size=pool_size,
+                                       timeout=Config.MYSQL_POOL_TIMEOUT)
+            # Open the first connection now so bad settings fail at startup
+            self.pool.release(self.pool.acquire())
+            print(f"✅ Connected to MySQL database (pool of up to {pool_size} connections)")
+        else:
+            self.connect()
 
     def connect(self):
         try:
@@ -43,21 +228,35 @@ class Database:
             self.create_database_if_not_exists()
             raise
 
+    def _open_connection(self):
+        """Open a new connection for the pool, creating the database on first use"""
+        try:
+            return mysql.connector.connect(**self.config)
+        except Error as e:
+            if e.errno != errorcode.ER_BAD_DB_ERROR:
+                print(f"❌ Error connecting to MySQL: {e}")
+                raise
+            self._create_database()
+            return mysql.connector.connect(**self.config)
+
+    def _create_database(self):
+        # Connect without specifying database
+        temp_config = self.config.copy()
+        temp_config.pop('database', None)
+        conn = mysql.connector.connect(**temp_config)
+        cursor = conn.cursor()
+        
+        # Create database if it doesn't exist
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {Config.MYSQL_DATABASE}")
+        print(f"✅ Database '{Config.MYSQL_DATABASE}' created or already exists")
+        
+        cursor.close()
+        conn.close()
+
     def create_database_if_not_exists(self):
         """Create database if it doesn't exist"""
         try:
-            # Connect without specifying database
-            temp_config = self.config.copy()
-            temp_config.pop('database', None)
-            conn = mysql.connector.connect(**temp_config)
-            cursor = conn.cursor()
-            
-            # Create database if it doesn't exist
-            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {Config.MYSQL_DATABASE}")
-            print(f"✅ Database '{Config.MYSQL_DATABASE}' created or already exists")
-            
-            cursor.close()
-            conn.close()
+            self._create_database()
             
             # Reconnect with database
             self.connection = mysql.connector.connect(**self.config)
@@ -68,34 +267,103 @@ class Database:
             print(f"❌ Error creating database: {e}")
             raise
 
+    @contextmanager
+    def _cursor(self):
+        """(connection, dictionary cursor) for one operation
+        
+        Pooled: a connection is checked out and a fresh cursor opened for the
+        call, so concurrent requests never share a result set. Unpooled: the
+        shared connection and cursor, one caller at a time.
+        """
+        if self.pool is None:
+            with self._lock:
+                yield self.connection, self.cursor
+            return
+        
+        with self.pool.connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                yield connection, cursor
+            finally:
+                cursor.close()
+
     def execute_query(self, query, params=None):
-        try:
-            self.cursor.execute(query, params or ())
-            self.connection.commit()
-            return self.cursor
-        except Error as e:
-            print(f"❌ Database error: {e}")
-            if self.connection:
-                self.connection.rollback()
-            raise
+        with self._cursor() as (connection, cursor):
+            try:
+                cursor.execute(query, params or ())
+                connection.commit()
+                return QueryResult(cursor.lastrowid, cursor.rowcount)
+            except Error as e:
+                print(f"❌ Database error: {e}")
+                try:
+                    connection.rollback()
+                except Error:
+                    pass
+                raise
+
+    @contextmanager
+    def transaction(self):
+        """Cursor whose statements are committed together at the end of the block"""
+        with self._cursor() as (connection, cursor):
+            try:
+                yield cursor
+                connection.commit()
+            except Exception:
+                try:
+                    connection.rollback()
+                except Error:
+                    pass
+                raise
 
     def fetch_one(self, query, params=None):
         try:
-            self.cursor.execute(query, params or ())
-            return self.cursor.fetchone()
+            with self._cursor() as (connection, cursor):
+                cursor.execute(query, params or ())
+                return cursor.fetchone()
         except Error as e:
             print(f"❌ Database fetch error: {e}")
             return None
 
     def fetch_all(self, query, params=None):
         try:
-            self.cursor.execute(query, params or ())
-            return self.cursor.fetchall()
+            with self._cursor() as (connection, cursor):
+                cursor.execute(query, params or ())
+                return cursor.fetchall()
         except Error as e:
             print(f"❌ Database fetch error: {e}")
             return []
 
+    def _cached(self, user_id, name, args, load):
+        """load() through the per-user read cache; None results are not cached"""
+        if self.read_cache is None:
+            return load()
+        hit, value = self.read_cache.get(user_id, name, args)
+        if hit:
+            return value
+        generation = self.read_cache.generation
+        value = load()
+        if value is not None:
+            self.read_cache.set(user_id, name, args, value, generation)
+        return value
+
+    def invalidate_user_cache(self, user_id):
+        """Forget cached reads for a user after writing their data"""
+        if self.read_cache is not None:
+            self.read_cache.invalidate_user(user_id)
+
+    def read_cache_stats(self):
+        return self.read_cache.stats() if self.read_cache else None
+
+    def pool_stats(self):
+        """Connection pool counters, or None when running on a single connection"""
+        return self.pool.stats() if self.pool else None
+
     def close(self):
+        if self._owns_hasher:
+            self.hasher.close()
+        if self.pool:
+            self.pool.close()
+            print("✅ Database connection pool closed")
         if self.connection and self.connection.is_connected():
             if self.cursor:
                 self.cursor.close()
@@ -105,48 +373,8 @@ class Database:
     def init_db(self):
         """Initialize database tables and sample data"""
         try:
-            # Create users table
-            self.execute_query('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    username VARCHAR(80) UNIQUE NOT NULL,
-                    email VARCHAR(120) UNIQUE NOT NULL,
-                    password_hash VARCHAR(255) NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            # Create campaign_metrics table
-            self.execute_query('''
-                CREATE TABLE IF NOT EXISTS campaign_metrics (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    user_id INT NOT NULL,
-                    date DATE NOT NULL,
-                    impressions INT NOT NULL,
-                    clicks INT NOT NULL,
-                    spend DECIMAL(10,2) NOT NULL,
-                    conversions INT NOT NULL,
-                    platform VARCHAR(50) NOT NULL,
-                    campaign_name VARCHAR(255) NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-                )
-            ''')
-
-            # Create recommendations table
-            self.execute_query('''
-                CREATE TABLE IF NOT EXISTS recommendations (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    user_id INT NOT NULL,
-                    campaign_name VARCHAR(255) NOT NULL,
-                    recommendation_text TEXT NOT NULL,
-                    confidence_score DECIMAL(5,4),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-                )
-            ''')
-
-            print("✅ Database tables created successfully")
+            run_migrations(self)
+            print("✅ Database schema is up to date")
             self.generate_sample_data()
             
         except Error as e:
@@ -161,97 +389,156 @@ class Database:
                 print("✅ Sample data already exists")
                 return
 
-            # Create sample users
-            sample_users = [
-                ('john_doe', 'john@example.com', self.hash_password('password123')),
-                ('jane_smith', 'jane@example.com', self.hash_password('password123')),
-                ('demo_user', 'demo@example.com', self.hash_password('demo123'))
-            ]
-
-            for username, email, password_hash in sample_users:
-                self.execute_query(
-                    "INSERT IGNORE INTO users (username, email, password_hash) VALUES (%s, %s, %s)",
-                    (username, email, password_hash)
-                )
-
-            # Get user IDs
-            users = self.fetch_all("SELECT id FROM users")
-            
-            # Platforms for sample data
-            platforms = ['Google Ads', 'Facebook Ads', 'Instagram Ads', 'LinkedIn Ads']
-            
-            # Generate campaign metrics for last 90 days
-            for user in users:
-                user_id = user['id']
-                for i in range(90):
-                    date = datetime.now() - timedelta(days=90 - i)
-                    
-                    for platform in platforms:
-                        # Generate realistic campaign data
-                        impressions = random.randint(1000, 50000)
-                        ctr = random.uniform(0.01, 0.08)  # 1-8% CTR
-                        clicks = int(impressions * ctr)
-                        cpc = random.uniform(5, 25)  # $5-25 CPC
-                        spend = clicks * cpc
-                        conversion_rate = random.uniform(0.02, 0.15)  # 2-15% conversion rate
-                        conversions = int(clicks * conversion_rate)
-                        
-                        campaign_name = f"{platform.replace(' ', '_')}_Campaign_{i+1}"
-                        
-                        self.execute_query('''
-                            INSERT INTO campaign_metrics 
-                            (user_id, date, impressions, clicks, spend, conversions, platform, campaign_name)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                        ''', (user_id, date, impressions, clicks, spend, conversions, platform, campaign_name))
-
-                # Generate sample recommendations
-                sample_recommendations = [
-                    ("Google Ads Campaign", "Increase budget by 15% for better performance", 0.85),
-                    ("Facebook Prospecting", "Test new ad creatives to improve CTR", 0.72),
-                    ("Instagram Story Ads", "Reallocate budget to top-performing segments", 0.91)
-                ]
-                
-                for campaign, recommendation, confidence in sample_recommendations:
-                    self.execute_query('''
-                        INSERT INTO recommendations (user_id, campaign_name, recommendation_text, confidence_score)
-                        VALUES (%s, %s, %s, %s)
-                    ''', (user_id, campaign, recommendation, confidence))
-
+            counts = seed_sample_data(self)
+            print(f"   {counts['users']} users, {counts['campaign_metrics']} campaign rows, "
+                  f"{counts['recommendations']} recommendations")
             print("✅ Sample data generated successfully")
 
         except Error as e:
             print(f"❌ Error generating sample data: {e}")
 
-    @staticmethod
-    def hash_password(password):
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    def hash_password(self, password):
+        """bcrypt hash, computed on the hashing pool (may raise HashingBusy)"""
+        return self.hasher.hash(password)
 
     def verify_password(self, password, password_hash):
         try:
-            return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
-        except Exception as e:
+            return self.hasher.verify(password, password_hash)
+        except (TypeError, AttributeError) as e:
             print(f"❌ Password verification error: {e}")
             return False
 
-    def create_user(self, username, email, password):
+    def authenticate(self, email, password, admin=False):
+        """The user row if the password matches, else None
+        
+        A hash made with a different bcrypt cost than the current one is
+        replaced after a successful check, so changing the cost upgrades
+        accounts as their owners log in. This schema has no admin accounts,
+        so an admin login always fails.
+        """
+        if admin:
+            return None
+        user = self.get_user_by_email(email)
+        if not user or not self.verify_password(password, user['password_hash']):
+            return None
+        if self.hasher.needs_rehash(user['password_hash']):
+            new_hash = self.hasher.rehash(password)
+            try:
+                # Only if nobody changed the hash since we read it
+                self.execute_query(
+                    "UPDATE users SET password_hash = %s WHERE id = %s AND password_hash = %s",
+                    (new_hash, user['id'], user['password_hash'])
+                )
+                user['password_hash'] = new_hash
+            except Error as e:
+                print(f"⚠️ Could not upgrade password hash for user {user['id']}: {e}")
+        return user
+
+    def create_user(self, username, email, password, role='user'):
         """Create a new user in the database"""
+        # The users table has no role column: only regular users can be stored
+        if role != 'user':
+            return None, f"Cannot create a user with role '{role}' in this database"
         try:
             # Check if user already exists
             existing_user = self.get_user_by_email(email)
             if existing_user:
                 return None, "User already exists with this email"
-            
+                
             password_hash = self.hash_password(password)
-            self.execute_query(
-                "INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)",
-                (username, email, password_hash)
-            )
-            user_id = self.cursor.lastrowid
+            with self.transaction() as cursor:
+                cursor.execute(
+                    "INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)",
+                    (username, email, password_hash)
+                )
+                user_id = cursor.lastrowid
+                cursor.execute(USER_COUNT_ADJUST, (1,))
             return user_id, None
         except Error as e:
             print(f"❌ Error creating user: {e}")
             return None, f"Database error: {str(e)}"
 
+    def delete_user(self, user_id):
+        """Delete a user (their metrics and history cascade); False if there was none"""
+        try:
+            with self.transaction() as cursor:
+                cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
+                deleted = cursor.rowcount > 0
+                if deleted:
+                    cursor.execute(USER_COUNT_ADJUST, (-1,))
+        except Error as e:
+            print(f"❌ Error deleting user: {e}")
+            return False
+        if deleted:
+            self.invalidate_user_cache(user_id)
+        return deleted
+
+    def list_users(self, query=None, role=None, sort='id', descending=False, after=None, limit=50):
+        """One page of users in (sort column, id) order, starting after the given (value, id)
+        
+        Returns (users, next_after); next_after is None on the last page.
+        Keyset pagination keeps every page an index range read however deep
+        the admin pages, and a query matches an email or username prefix.
+        """
+        # The users table has no role column: everyone in it is a regular user
+        if role not in (None, 'all', 'user'):
+            return [], None
+            
+        column = USER_SORT_COLUMNS[sort]
+        if after is not None:
+            after = check_user_cursor(after, sort)
+        conditions, params = [], []
+        if query:
+            conditions.append('(email LIKE %s OR username LIKE %s)')
+            params += [_like_prefix(query), _like_prefix(query)]
+        comparison = '<' if descending else '>'
+        if after is not None:
+            value, last_id = after
+            if column == 'id':
+                conditions.append(f'id {comparison} %s')
+                params.append(last_id)
+            else:
+                conditions.append(f'({column} {comparison} %s OR ({column} = %s AND id {comparison} %s))')
+                params += [value, value, last_id]
+                
+        direction = 'DESC' if descending else 'ASC'
+        order = f'id {direction}' if column == 'id' else f'{column} {direction}, id {direction}'
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        # One row past the page tells us whether there is a next one
+        rows = self.fetch_all(USER_LIST_QUERY.format(where=where, order=order), params + [limit + 1])
+        
+        page = rows[:limit]
+        for row in page:
+            row['role'] = 'user'
+        next_after = (page[-1][column], page[-1]['id']) if len(rows) > limit else None
+        return page, next_after
+
+    def count_users(self, query=None, role=None):
+        """Users matching a listing filter; the unfiltered total is the maintained counter"""
+        if role not in (None, 'all', 'user'):
+            return 0
+        if query:
+            result = self.fetch_one(
+                "SELECT COUNT(*) AS count FROM users WHERE email LIKE %s OR username LIKE %s",
+                (_like_prefix(query), _like_prefix(query))
+            )
+            return result['count'] if result else 0
+        result = self.fetch_one(USER_COUNT_QUERY)
+        return int(result['value']) if result else 0
+
+    def recount_users(self):
+        """Resynchronise the users counter with COUNT(*)"""
+        self.execute_query(USER_COUNT_RECOUNT)
+        return self.count_users()
+
+    def campaign_counts(self, user_ids):
+        """Distinct campaigns per user, for one page of the admin listing"""
+        if not user_ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        rows = self.fetch_all(CAMPAIGN_COUNTS_QUERY.format(placeholders=placeholders), tuple(user_ids))
+        return {row['user_id']: row['campaigns_count'] for row in rows}
+
     def get_user_by_email(self, email):
         """Get user by email address"""
         return self.fetch_one("SELECT * FROM users WHERE email = %s", (email,))
@@ -262,40 +549,14 @@ class Database:
 
     def get_user_metrics(self, user_id, days=30):
         """Get aggregated metrics for a user"""
+        return self._cached(user_id, 'user_metrics', (days,),
+                            lambda: self._query_user_metrics(user_id, days))
+
+    def _query_user_metrics(self, user_id, days):
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=days)
         
-        query = '''
-            SELECT 
-                SUM(impressions) as total_impressions,
-                SUM(clicks) as total_clicks,
-                SUM(spend) as total_spend,
-                SUM(conversions) as total_conversions,
-                CASE 
-                    WHEN SUM(impressions) > 0 THEN SUM(clicks) / SUM(impressions)
-                    ELSE 0 
-                END as ctr,
-                CASE 
-                    WHEN SUM(clicks) > 0 THEN SUM(spend) / SUM(clicks)
-                    ELSE 0 
-                END as cpc,
-                CASE 
-                    WHEN SUM(spend) > 0 THEN SUM(conversions) / SUM(spend)
-                    ELSE 0 
-                END as conversion_rate,
-                CASE 
-                    WHEN SUM(spend) > 0 THEN (SUM(conversions) * 100) / SUM(spend)  -- Assuming $100 value per conversion
-                    ELSE 0 
-                END as roas,
-                CASE 
-                    WHEN SUM(clicks) > 0 THEN SUM(conversions) / SUM(clicks)
-                    ELSE 0 
-                END as engagement_rate
-            FROM campaign_metrics 
-            WHERE user_id = %s AND date BETWEEN %s AND %s
-        '''
-        
-        result = self.fetch_one(query, (user_id, start_date, end_date))
+        result = self.fetch_one(USER_METRICS_QUERY, (user_id, start_date, end_date))
         
         # Format the result for the frontend
         if result:
@@ -316,50 +577,19 @@ class Database:
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=days)
         
-        query = '''
-            SELECT 
-                campaign_name,
-                platform,
-                SUM(impressions) as impressions,
-                SUM(clicks) as clicks,
-                SUM(spend) as spend,
-                SUM(conversions) as conversions,
-                CASE 
-                    WHEN SUM(impressions) > 0 THEN SUM(clicks) / SUM(impressions)
-                    ELSE 0 
-                END as ctr,
-                CASE 
-                    WHEN SUM(clicks) > 0 THEN SUM(spend) / SUM(clicks)
-                    ELSE 0 
-                END as cpc,
-                CASE 
-                    WHEN SUM(spend) > 0 THEN (SUM(conversions) * 100) / SUM(spend)
-                    ELSE 0 
-                END as roas
-            FROM campaign_metrics 
-            WHERE user_id = %s AND date BETWEEN %s AND %s
-        '''
-        
-        params = [user_id, start_date, end_date]
-        
         if platform and platform != 'all':
-            query += ' AND platform = %s'
-            params.append(platform)
-            
-        query += ' GROUP BY campaign_name, platform ORDER BY spend DESC'
+            rows = self.fetch_all(CAMPAIGN_METRICS_BY_PLATFORM_QUERY, (user_id, start_date, end_date, platform))
+        else:
+            rows = self.fetch_all(CAMPAIGN_METRICS_QUERY, (user_id, start_date, end_date))
         
-        return self.fetch_all(query, params)
+        # Sorted here rather than with ORDER BY: ordering by an aggregate
+        # always costs MySQL a filesort, and there is one row per campaign
+        return sorted(rows, key=lambda row: row['spend'] or 0, reverse=True)
 
     def get_user_recommendations(self, user_id, limit=10):
         """Get recommendations for a user"""
-        query = '''
-            SELECT campaign_name, recommendation_text, confidence_score, created_at
-            FROM recommendations 
-            WHERE user_id = %s 
-            ORDER BY created_at DESC 
-            LIMIT %s
-        '''
-        return self.fetch_all(query, (user_id, limit))
+        return self._cached(user_id, 'recommendations', (limit,),
+                            lambda: self.fetch_all(USER_RECOMMENDATIONS_QUERY, (user_id, limit)))
 
     def save_recommendation(self, user_id, campaign_name, recommendation_text, confidence_score):
         """Save a new recommendation for a user"""
@@ -368,6 +598,7 @@ class Database:
                 INSERT INTO recommendations (user_id, campaign_name, recommendation_text, confidence_score)
                 VALUES (%s, %s, %s, %s)
             ''', (user_id, campaign_name, recommendation_text, confidence_score))
+            self.invalidate_user_cache(user_id)
             return True
         except Error as e:
             print(f"❌ Error saving recommendation: {e}")
@@ -376,18 +607,6 @@ class Database:
     def save_prediction_result(self, user_id, input_data, prediction_result):
         """Save ML prediction results for a user"""
         try:
-            # Create a new table for prediction history if it doesn't exist
-            self.execute_query('''
-                CREATE TABLE IF NOT EXISTS prediction_history (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    user_id INT NOT NULL,
-                    input_data JSON NOT NULL,
-                    prediction_result JSON NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-                )
-            ''')
-            
             self.execute_query('''
                 INSERT INTO prediction_history (user_id, input_data, prediction_result)
                 VALUES (%s, %s, %s)
@@ -398,48 +617,71 @@ class Database:
             print(f"❌ Error saving prediction: {e}")
             return False
 
+    def save_history_batch(self, predictions, optimizations):
+        """Write queued history records with one multi-row INSERT per table
+        
+        Each record is (user_id, payload, result, created_at). Both tables are
+        written in one transaction, so a failed batch can be retried whole.
+        """
+        with self.transaction() as cursor:
+            if predictions:
+                cursor.executemany('''
+                    INSERT INTO prediction_history (user_id, input_data, prediction_result, created_at)
+                    VALUES (%s, %s, %s, %s)
+                ''', [
+                    (user_id, json.dumps(input_data), json.dumps(result), created_at)
+                    for user_id, input_data, result, created_at in predictions
+                ])
+            if optimizations:
+                cursor.executemany('''
+                    INSERT INTO optimization_history (user_id, settings, results, created_at)
+                    VALUES (%s, %s, %s, %s)
+                ''', [
+                    (user_id, json.dumps(settings), json.dumps(results), created_at)
+                    for user_id, settings, results, created_at in optimizations
+                ])
+
     def get_prediction_history(self, user_id, limit=5):
         """Get prediction history for a user"""
         try:
-            # Check if table exists
-            self.execute_query('''
-                CREATE TABLE IF NOT EXISTS prediction_history (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    user_id INT NOT NULL,
-                    input_data JSON NOT NULL,
-                    prediction_result JSON NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-                )
-            ''')
-            
-            query = '''
-                SELECT input_data, prediction_result, created_at
-                FROM prediction_history 
-                WHERE user_id = %s 
-                ORDER BY created_at DESC 
-                LIMIT %s
-            '''
-            return self.fetch_all(query, (user_id, limit))
+            return self.fetch_all(PREDICTION_HISTORY_QUERY, (user_id, limit))
         except Error as e:
             print(f"❌ Error getting prediction history: {e}")
             return []
 
+    def iter_prediction_history(self, user_id, page_size=1000):
+        """Yield a user's whole prediction history, oldest first, page by page"""
+        return self._iter_history('prediction_history', 'input_data, prediction_result', user_id, page_size)
+
+    def _iter_history(self, table, columns, user_id, page_size):
+        """Keyset pagination on (created_at, id) over one user's history rows
+        
+        Each page is a short indexed range read (see the (user_id, created_at)
+        indexes; InnoDB appends id to them), so memory is one page and the
+        connection goes back to the pool between pages instead of being held
+        while a slow client downloads.
+        """
+        query = f'''
+            SELECT id, {columns}, created_at
+            FROM {table}
+            WHERE user_id = %s AND (created_at > %s OR (created_at = %s AND id > %s))
+            ORDER BY created_at, id
+            LIMIT %s
+        '''
+        last_created_at, last_id = datetime.min, 0
+        while True:
+            with self._cursor() as (connection, cursor):
+                cursor.execute(query, (user_id, last_created_at, last_created_at, last_id, page_size))
+                rows = cursor.fetchall()
+            for row in rows:
+                yield row
+            if len(rows) < page_size:
+                return
+            last_created_at, last_id = rows[-1]['created_at'], rows[-1]['id']
+
     def save_optimization_settings(self, user_id, settings, results):
         """Save optimization settings and results"""
         try:
-            # Create a new table for optimization history if it doesn't exist
-            self.execute_query('''
-                CREATE TABLE IF NOT EXISTS optimization_history (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    user_id INT NOT NULL,
-                    settings JSON NOT NULL,
-                    results JSON NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-                )
-            ''')
-            
             self.execute_query('''
                 INSERT INTO optimization_history (user_id, settings, results)
                 VALUES (%s, %s, %s)
@@ -453,66 +695,151 @@ class Database:
     def get_optimization_history(self, user_id, limit=5):
         """Get optimization history for a user"""
         try:
-            # Check if table exists
-            self.execute_query('''
-                CREATE TABLE IF NOT EXISTS optimization_history (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    user_id INT NOT NULL,
-                    settings JSON NOT NULL,
-                    results JSON NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-                )
-            ''')
-            
-            query = '''
-                SELECT settings, results, created_at
-                FROM optimization_history 
-                WHERE user_id = %s 
-                ORDER BY created_at DESC 
-                LIMIT %s
-            '''
-            return self.fetch_all(query, (user_id, limit))
+            return self.fetch_all(OPTIMIZATION_HISTORY_QUERY, (user_id, limit))
         except Error as e:
             print(f"❌ Error getting optimization history: {e}")
             return []
 
+    def iter_optimization_history(self, user_id, page_size=1000):
+        """Yield a user's whole optimization history, oldest first, page by page"""
+        return self._iter_history('optimization_history', 'settings, results', user_id, page_size)
+
     def get_recent_campaigns(self, user_id, limit=5):
-        """Get recent campaigns for a user"""
-        query = '''
-            SELECT DISTINCT campaign_name, platform
-            FROM campaign_metrics 
-            WHERE user_id = %s 
-            ORDER BY date DESC 
-            LIMIT %s
-        '''
-        return self.fetch_all(query, (user_id, limit))
+        """Get recent campaigns for a user
+        
+        Reads the newest rollup rows for the user and keeps each
+        campaign's first appearance, widening the window until limit distinct
+        campaigns are found or the user's rows run out. (SELECT DISTINCT with
+        ORDER BY date is rejected under ONLY_FULL_GROUP_BY, and grouping with
+        ORDER BY MAX(date) would sort every campaign the user has.)
+        """
+        window = limit * 8
+        while True:
+            rows = self.fetch_all(RECENT_CAMPAIGN_ROWS_QUERY, (user_id, window))
+            campaigns = {}
+            for row in rows:
+                key = (row['campaign_name'], row['platform'])
+                if key not in campaigns:
+                    campaigns[key] = {'campaign_name': key[0], 'platform': key[1]}
+                    if len(campaigns) == limit:
+                        break
+            if len(campaigns) == limit or len(rows) < window:
+                return list(campaigns.values())
+            window *= 4
 
     def add_campaign_metrics(self, user_id, metrics_data):
         """Add new campaign metrics for a user"""
+        row = (
+            user_id,
+            metrics_data.get('date', datetime.now().date()),
+            metrics_data.get('impressions', 0),
+            metrics_data.get('clicks', 0),
+            metrics_data.get('spend', 0),
+            metrics_data.get('conversions', 0),
+            metrics_data.get('platform', 'Unknown'),
+            metrics_data.get('campaign_name', 'Unnamed Campaign')
+        )
         try:
-            self.execute_query('''
-                INSERT INTO campaign_metrics 
-                (user_id, date, impressions, clicks, spend, conversions, platform, campaign_name)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (
-                user_id,
-                metrics_data.get('date', datetime.now().date()),
-                metrics_data.get('impressions', 0),
-                metrics_data.get('clicks', 0),
-                metrics_data.get('spend', 0),
-                metrics_data.get('conversions', 0),
-                metrics_data.get('platform', 'Unknown'),
-                metrics_data.get('campaign_name', 'Unnamed Campaign')
-            ))
+            # The raw row and its rollup totals commit together
+            with self.transaction() as cursor:
+                cursor.execute('''
+                    INSERT INTO campaign_metrics 
+                    (user_id, date, impressions, clicks, spend, conversions, platform, campaign_name)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                ''', row)
+                cursor.execute(ROLLUP_UPSERT, rollup_rows([row])[0])
+            self.invalidate_user_cache(user_id)
             return True
-        except Error as e:
+        except (Error, ValueError, TypeError) as e:
             print(f"❌ Error adding campaign metrics: {e}")
             return False
 
-# Singleton instance for the application
-db_instance = Database()
-
-def get_db():
-    """Get database instance"""
-    return db_instance
\ No newline at end of file
+    def add_campaign_metrics_batch(self, user_id, rows):
+        """Insert many metrics rows for a user, and their rollup totals, in one transaction
+        
+        rows are (date, impressions, clicks, spend, conversions, platform,
+        campaign_name) tuples, as produced by ingest.validate_record.
+        """
+        rows = [(user_id,) + tuple(row) for row in rows]
+        with self.transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO campaign_metrics 
+                (user_id, date, impressions, clicks, spend, conversions, platform, campaign_name)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ''', rows)
+            cursor.executemany(ROLLUP_UPSERT, rollup_rows(rows))
+        self.invalidate_user_cache(user_id)
+        return len(rows)
+
+    def rebuild_rollup(self, user_id=None):
+        """Recompute campaign_daily_rollup from campaign_metrics (for one user, or all)"""
+        user_filter = 'WHERE user_id = %s' if user_id is not None else ''
+        params = (user_id,) if user_id is not None else ()
+        with self.transaction() as cursor:
+            cursor.execute(ROLLUP_DELETE.format(user_filter=user_filter), params)
+            cursor.execute(ROLLUP_REBUILD.format(user_filter=user_filter), params)
+            written = cursor.rowcount
+        if self.read_cache is not None:
+            if user_id is None:
+                self.read_cache.clear()
+            else:
+                self.read_cache.invalidate_user(user_id)
+        return written
+
+    def iter_campaign_metrics(self, chunk_size=10000):
+        """Stream daily per-campaign totals ordered by user and day
+        
+        The rows come from campaign_daily_rollup, which holds the same sums
+        as the raw campaign_metrics rows, one row per campaign and day. Uses
+        a dedicated connection with an unbuffered cursor, so rows are pulled
+        from the server chunk_size at a time instead of all at once.
+        """
+        connection = mysql.connector.connect(**self.config)
+        cursor = connection.cursor(buffered=False)
+        try:
+            cursor.execute(TRAINING_ROWS_QUERY)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            # Closing a cursor with rows still unread raises; the connection
+            # close below discards them either way
+            try:
+                cursor.close()
+            except Error:
+                pass
+            connection.close()
+
+# Singleton instance for the application, connected on first use
+db_instance = None
+_db_instance_lock = threading.Lock()
+
+def get_db(hasher=None):
+    """Get database instance; the first caller may pass the hasher it shares"""
+    global db_instance
+    with _db_instance_lock:
+        if db_instance is None:
+            db_instance = Database(hasher=hasher)
+    return db_instance
+
+if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Database maintenance")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    rebuild = subparsers.add_parser('rebuild-rollup', help="recompute campaign_daily_rollup from campaign_metrics")
+    rebuild.add_argument('--user-id', type=int, default=None, help="only this user (default: everyone)")
+    subparsers.add_parser('recount-users', help="resynchronise the users counter with COUNT(*)")
+    args = parser.parse_args()
+    db_instance = get_db()
+    
+    if args.command == 'rebuild-rollup':
+        run_migrations(db_instance)
+        written = db_instance.rebuild_rollup(args.user_id)
+        print(f"✅ Rebuilt campaign_daily_rollup: {written} rows")
+    elif args.command == 'recount-users':
+        run_migrations(db_instance)
+        print(f"✅ Users counter set to {db_instance.recount_users()}")
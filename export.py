@@ -0,0 +1,87 @@
+"""Serialize history rows as NDJSON or CSV, one line at a time.
+
+The functions here are generators over generators: rows come from the
+store's keyset-paginated iterators and lines go straight into a streamed
+Flask response, so an export never holds more than a page in memory.
+"""
+import csv
+import io
+import json
+
+PREDICTION_CSV_COLUMNS = [
+    'created_at',
+    'impressions', 'spend', 'current_CTR', 'current_CPC', 'engagement_rate',
+    'predicted_CTR', 'predicted_CPC', 'label', 'recommendation'
+]
+
+OPTIMIZATION_CSV_COLUMNS = ['created_at', 'settings', 'results']
+
+
+def _json_value(value):
+    """JSON columns arrive as text from MySQL and as objects from the in-memory store"""
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode('utf-8')
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+def _timestamp(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def prediction_records(rows):
+    for row in rows:
+        yield {
+            'created_at': _timestamp(row['created_at']),
+            'input_data': _json_value(row['input_data']),
+            'prediction_result': _json_value(row['prediction_result'])
+        }
+
+
+def optimization_records(rows):
+    for row in rows:
+        yield {
+            'created_at': _timestamp(row['created_at']),
+            'settings': _json_value(row['settings']),
+            'results': _json_value(row['results'])
+        }
+
+
+def ndjson_lines(records):
+    for record in records:
+        yield json.dumps(record, default=str) + '\n'
+
+
+def csv_lines(records, columns, flatten):
+    """A header line, then one CSV line per record as mapped by flatten(record)"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+
+    def take():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    writer.writeheader()
+    yield take()
+    for record in records:
+        writer.writerow(flatten(record))
+        yield take()
+
+
+def flatten_prediction(record):
+    return {
+        'created_at': record['created_at'],
+        **(record['input_data'] or {}),
+        **(record['prediction_result'] or {})
+    }
+
+
+def flatten_optimization(record):
+    return {
+        'created_at': record['created_at'],
+        'settings': json.dumps(record['settings'], default=str),
+        'results': json.dumps(record['results'], default=str)
+    }
@@ -0,0 +1,197 @@
+import json
+import os
+
+import numpy as np
+
+_ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+
+
+class CompiledForest:
+    """A fitted RandomForestRegressor flattened into contiguous NumPy arrays.
+
+    Every tree's nodes are stored back to back in shared feature, threshold,
+    children and value arrays, and prediction walks all trees at once with
+    array indexing. When a StandardScaler is given its transform is folded
+    into the thresholds, so raw (unscaled) features can be fed directly.
+
+    Results match sklearn bit for bit: each folded threshold is the largest
+    raw value that sklearn would still send to the left child after scaling
+    and its float32 cast, and leaf values are summed in tree order.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_trees = len(roots)
+
+    @classmethod
+    def from_sklearn(cls, forest, scaler=None):
+        """Compile a fitted forest, optionally folding a fitted StandardScaler"""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(offset, offset + n_nodes, dtype=np.intp)
+            is_leaf = tree.children_left < 0
+
+            # Leaves point back at themselves so every row can take exactly
+            # max_depth steps without branching on whether it has finished
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset).astype(np.intp))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset).astype(np.intp))
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            values.append(tree.value[:, 0, 0].astype(np.float64))
+            roots.append(offset)
+
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n_nodes
+
+        feature = np.concatenate(features)
+        threshold = np.concatenate(thresholds)
+        internal = np.isfinite(threshold)
+
+        if scaler is not None:
+            mean = getattr(scaler, 'mean_', None)
+            scale = getattr(scaler, 'scale_', None)
+            mean = np.zeros(forest.n_features_in_) if mean is None else mean
+            scale = np.ones(forest.n_features_in_) if scale is None else scale
+        else:
+            mean = np.zeros(forest.n_features_in_)
+            scale = np.ones(forest.n_features_in_)
+
+        threshold[internal] = _fold_thresholds(
+            threshold[internal], mean[feature[internal]], scale[feature[internal]]
+        )
+
+        return cls(
+            feature=feature,
+            threshold=threshold,
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            value=np.concatenate(values),
+            roots=np.array(roots, dtype=np.intp),
+            max_depth=max_depth,
+        )
+
+    def save(self, directory):
+        """Write the arrays as .npy files so other processes can memory-map them"""
+        os.makedirs(directory, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump({'max_depth': self.max_depth}, f)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """Load arrays written by save(); with mmap_mode they are shared read-only pages"""
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+            for name in _ARRAYS
+        }
+        return cls(max_depth=meta['max_depth'], **arrays)
+
+    def predict(self, X):
+        """Predict raw (unscaled) rows; X must be a finite 2-D float array"""
+        X = np.asarray(X, dtype=np.float64)
+        n_rows = X.shape[0]
+
+        node = np.broadcast_to(self.roots, (n_rows, self.n_trees)).copy()
+        row_ids = np.arange(n_rows)[:, None]
+
+        for _ in range(self.max_depth):
+            goes_left = X[row_ids, self.feature[node]] <= self.threshold[node]
+            node = np.where(goes_left, self.left[node], self.right[node])
+
+        leaf_values = self.value[node]
+
+        # Accumulate tree by tree, in the same order sklearn does
+        total = np.zeros(n_rows)
+        for t in range(self.n_trees):
+            total += leaf_values[:, t]
+        return total / self.n_trees
+
+
+def verify_compiled(compiled, forest, scaler=None, n_random=1000, seed=0):
+    """Raise ValueError unless compiled predicts exactly what forest does
+
+    Checks random rows around the training distribution, rows sitting on,
+    just below and just above sampled split thresholds, all-zero rows and
+    values far outside the training range. Returns the number of rows checked.
+    """
+    n_features = forest.n_features_in_
+    mean = getattr(scaler, 'mean_', None)
+    scale = getattr(scaler, 'scale_', None)
+    mean = np.zeros(n_features) if mean is None else mean
+    scale = np.ones(n_features) if scale is None else scale
+    rng = np.random.default_rng(seed)
+
+    rows = [mean + scale * rng.normal(0, 3, (n_random, n_features))]
+
+    internal = np.flatnonzero(np.isfinite(compiled.threshold))
+    if len(internal):
+        nodes = rng.choice(internal, min(len(internal), 256), replace=False)
+        for direction in (-np.inf, None, np.inf):
+            edge = mean + scale * rng.normal(0, 1, (len(nodes), n_features))
+            value = compiled.threshold[nodes]
+            if direction is not None:
+                value = np.nextafter(value, direction)
+            edge[np.arange(len(nodes)), compiled.feature[nodes]] = value
+            rows.append(edge)
+
+    # sklearn refuses anything beyond float32 range once scaled
+    rows.append(np.zeros((1, n_features)))
+    for extreme in (1e6, -1e6, 1e30, -1e30):
+        rows.append((mean + scale * extreme)[None, :])
+
+    X = np.vstack(rows)
+    expected = forest.predict(X if scaler is None else scaler.transform(X))
+    differs = np.flatnonzero(compiled.predict(X) != expected)
+    if len(differs):
+        raise ValueError(f"Compiled forest differs from sklearn on {len(differs)} of {len(X)} check rows")
+    return len(X)
+
+
+def _goes_left(raw, mean, scale, threshold):
+    """Replicate sklearn's split test on a raw value: scale, cast to float32, compare"""
+    scaled = ((raw - mean) / scale).astype(np.float32).astype(np.float64)
+    return scaled <= threshold
+
+
+def _fold_thresholds(threshold, mean, scale):
+    """Map thresholds on scaled features to equivalent thresholds on raw features.
+
+    The split test is monotone in the raw value, so for each node we bisect
+    for the largest float64 that still goes left.
+    """
+    guess = threshold * scale + mean
+    width = (np.abs(guess) + np.abs(mean)) * 2.0 ** -20 + 1e-300
+
+    # Widen the bracket until lo goes left and hi goes right for every node
+    for _ in range(2000):
+        lo = guess - width
+        hi = guess + width
+        bad = ~_goes_left(lo, mean, scale, threshold) | _goes_left(hi, mean, scale, threshold)
+        if not bad.any():
+            break
+        width = np.where(bad, width * 2, width)
+    else:
+        raise ValueError("Could not bracket folded tree thresholds")
+
+    while True:
+        mid = lo + (hi - lo) / 2
+        active = (mid > lo) & (mid < hi)
+        if not active.any():
+            return lo
+        left = _goes_left(mid, mean, scale, threshold)
+        lo = np.where(active & left, mid, lo)
+        hi = np.where(active & ~left, mid, hi)
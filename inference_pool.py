@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from forest_engine import CompiledForest
+
+# Per-worker state: the directory the current forest was mapped from, the
+# forest, and the barrier start-up tasks wait on
+_worker_forest = {'directory': None, 'forest': None, 'barrier': None}
+
+
+def _worker_init(barrier):
+    _worker_forest['barrier'] = barrier
+
+
+def _worker_score(directory, X):
+    """Score rows in a worker, (re)mapping the forest if a new one was published"""
+    if _worker_forest['directory'] != directory:
+        _worker_forest['forest'] = CompiledForest.load(directory, mmap_mode='r')
+        _worker_forest['directory'] = directory
+    return _worker_forest['forest'].predict(X)
+
+
+def _worker_ready():
+    """Report this worker's pid once every worker is up
+
+    Each start-up task waits at the barrier, so no worker can take two of
+    them: n tasks start n workers and return n distinct pids.
+    """
+    _worker_forest['barrier'].wait()
+    return os.getpid()
+
+
+class InferencePool:
+    """Score rows in N worker processes that share one memory-mapped forest.
+
+    The compiled forest is written once as .npy files and every worker maps
+    them read-only, so the node arrays live in the page cache once no matter
+    how many workers there are. Workers pick up a newly published forest
+    on their next task.
+
+    Workers are forked when the pool is created, so create it before the
+    process starts any threads: a fork copies only the forking thread, and
+    a lock another thread held at that moment stays locked in the child.
+
+    This saves memory, not time. Every request pays an IPC round trip, so
+    in benchmarks.py pool two workers serve fewer single-row requests per
+    second than scoring in the web process. The pool is off by default.
+    """
+
+    def __init__(self, n_workers, directory='models/pool'):
+        if threading.active_count() > 1:
+            print("⚠️ Inference pool forked after other threads started; create it earlier")
+        self.n_workers = n_workers
+        self.directory = directory
+        self._generation = 0
+        self._current = None
+        # Submits in flight per generation directory, and retired directories
+        # that are deleted once their last submit returns
+        self._in_flight = {}
+        self._retired = set()
+        self._lock = threading.Lock()
+        context = multiprocessing.get_context('fork')
+        self._executor = ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=context,
+            initializer=_worker_init,
+            initargs=(context.Barrier(n_workers),)
+        )
+        # Fork every worker now rather than from inside a request thread
+        futures = [self._executor.submit(_worker_ready) for _ in range(n_workers)]
+        self._pids = [future.result() for future in futures]
+
+    def publish(self, compiled):
+        """Write a new forest for the workers and retire the previous generation"""
+        with self._lock:
+            self._generation += 1
+            directory = os.path.join(self.directory, f'gen-{self._generation}')
+            compiled.save(directory)
+            previous, self._current = self._current, directory
+            if previous is None:
+                return
+            if self._in_flight.get(previous):
+                # A submit still carries the old path; the worker may not have mapped it yet
+                self._retired.add(previous)
+                return
+
+        # Workers that already hold the old mapping keep it valid after unlink
+        shutil.rmtree(previous, ignore_errors=True)
+
+    def score(self, X):
+        """Predict CTR for a matrix of raw feature rows in a worker process"""
+        with self._lock:
+            directory = self._current
+            if directory is None:
+                raise RuntimeError("No model has been published to the inference pool")
+            self._in_flight[directory] = self._in_flight.get(directory, 0) + 1
+        try:
+            return self._executor.submit(_worker_score, directory, X).result()
+        finally:
+            with self._lock:
+                self._in_flight[directory] -= 1
+                drained = not self._in_flight[directory]
+                if drained:
+                    del self._in_flight[directory]
+                remove = drained and directory in self._retired
+                if remove:
+                    self._retired.discard(directory)
+            if remove:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    def worker_pids(self):
+        """Process ids of the workers, as each reported at start-up"""
+        return list(self._pids)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        for directory in self._retired:
+            shutil.rmtree(directory, ignore_errors=True)
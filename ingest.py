@@ -0,0 +1,188 @@
+"""Streaming import of campaign metrics from CSV or NDJSON.
+
+The upload is read as a stream and parsed one record at a time; valid rows
+are handed to the store in batches of batch_size, so memory is bounded by
+one batch however large the file is.
+"""
+import csv
+import io
+import json
+import time
+from datetime import date
+
+FIELDS = ('date', 'impressions', 'clicks', 'spend', 'conversions', 'platform', 'campaign_name')
+
+# Column limits of campaign_metrics
+MAX_PLATFORM_LENGTH = 50
+MAX_CAMPAIGN_NAME_LENGTH = 255
+
+
+def detect_format(content_type, requested=None):
+    """'csv' or 'ndjson' from an explicit ?format= or the Content-Type, else None"""
+    if requested:
+        return requested.lower() if requested.lower() in ('csv', 'ndjson') else None
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in ('text/csv', 'application/csv'):
+        return 'csv'
+    if content_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        return 'ndjson'
+    return None
+
+
+def iter_records(stream, fmt):
+    """Yield (line_number, record dict or None, parse error or None) from a byte stream"""
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record, None
+        return
+
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f'invalid JSON: {e}'
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, 'each line must be a JSON object'
+            continue
+        yield line_number, record, None
+
+
+class IngestError(Exception):
+    """Writing a batch failed; report holds what was imported before that"""
+
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
+
+class UploadDecodeError(IngestError):
+    """The upload stopped parsing (bad UTF-8 or CSV) after some batches were written"""
+
+
+def _count(value, field):
+    """A non-negative integer from a JSON number or CSV string"""
+    try:
+        if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+            raise ValueError
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be a non-negative integer')
+    if number < 0:
+        raise ValueError(f'{field} must be a non-negative integer')
+    return number
+
+
+def validate_record(record):
+    """Turn one parsed record into a campaign_metrics value tuple (without user_id)
+
+    Raises ValueError with a message naming the problem.
+    """
+    missing = [field for field in FIELDS if record.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+
+    try:
+        day = date.fromisoformat(str(record['date']).strip())
+    except ValueError:
+        raise ValueError('date must be YYYY-MM-DD')
+
+    impressions = _count(record['impressions'], 'impressions')
+    clicks = _count(record['clicks'], 'clicks')
+    conversions = _count(record['conversions'], 'conversions')
+
+    try:
+        spend = round(float(record['spend']), 2)
+    except (TypeError, ValueError):
+        raise ValueError('spend must be a number')
+    if not 0 <= spend < float('inf'):
+        raise ValueError('spend must be a non-negative number')
+
+    if clicks > impressions:
+        raise ValueError('clicks cannot exceed impressions')
+    if conversions > clicks:
+        raise ValueError('conversions cannot exceed clicks')
+
+    platform = str(record['platform']).strip()
+    campaign_name = str(record['campaign_name']).strip()
+    if len(platform) > MAX_PLATFORM_LENGTH:
+        raise ValueError(f'platform longer than {MAX_PLATFORM_LENGTH} characters')
+    if len(campaign_name) > MAX_CAMPAIGN_NAME_LENGTH:
+        raise ValueError(f'campaign_name longer than {MAX_CAMPAIGN_NAME_LENGTH} characters')
+
+    return (day, impressions, clicks, spend, conversions, platform, campaign_name)
+
+
+def import_metrics(stream, fmt, write_batch, batch_size=5000, max_reported_errors=100):
+    """Parse, validate and write a metrics upload; return a summary report
+
+    write_batch(rows) is called with lists of validated value tuples, each of
+    which should be written in one transaction. Only the first
+    max_reported_errors rejected rows are described in the report.
+    """
+    start = time.perf_counter()
+    # Lines of the last record read and of the last row in a written batch
+    counts = {'accepted': 0, 'rejected': 0, 'last_line': 0, 'batch_line': 0, 'committed_line': None}
+    errors = []
+    batch = []
+
+    def report(failed_at_line=None):
+        seconds = time.perf_counter() - start
+        processed = counts['accepted'] + counts['rejected']
+        summary = {
+            'accepted': counts['accepted'],
+            'rejected': counts['rejected'],
+            'errors': errors,
+            # Every valid row up to this line is stored; none after it
+            'committed_through_line': counts['committed_line'],
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(processed / seconds) if seconds > 0 else None
+        }
+        if failed_at_line is not None:
+            summary['failed_at_line'] = failed_at_line
+        return summary
+
+    def reject(line_number, message):
+        counts['rejected'] += 1
+        if len(errors) < max_reported_errors:
+            errors.append({'line': line_number, 'error': message})
+
+    def flush():
+        try:
+            write_batch(batch)
+        except Exception as e:
+            raise IngestError(f'Failed to write rows: {e}', report())
+        counts['accepted'] += len(batch)
+        counts['committed_line'] = counts['batch_line']
+
+    try:
+        for line_number, record, parse_error in iter_records(stream, fmt):
+            counts['last_line'] = line_number
+            if parse_error:
+                reject(line_number, parse_error)
+                continue
+            try:
+                batch.append(validate_record(record))
+            except ValueError as e:
+                reject(line_number, str(e))
+                continue
+            counts['batch_line'] = line_number
+            if len(batch) >= batch_size:
+                flush()
+                batch = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        # The rows still in batch are not written: the report says exactly
+        # what was committed, and the client resends from the line after it.
+        # Text is decoded a block ahead, so the bad bytes are on the failed
+        # line or a little after it
+        raise UploadDecodeError(f'Could not parse upload: {e}', report(failed_at_line=counts['last_line'] + 1))
+
+    if batch:
+        flush()
+
+    return report()
+
@@ -0,0 +1,397 @@
+"""In-memory backend the app serves from when no database is configured.
+
+Users are kept in id and email dicts, so lookups, signups and deletes are
+O(1). Ids come from a counter and are never reused. The admin listing's
+sort orders are sorted (key, id) lists that are maintained lazily: new
+entries wait in a pending run that is merged on the next listing, and
+deleted users are skipped until enough of them pile up to compact.
+
+Users, campaign metrics and history each have their own lock, so a signup
+never waits behind a history write. Records handed out are either
+immutable in practice (only password_hash is ever replaced, by a rehash
+on login) or copies.
+
+With a PasswordHasher, passwords are bcrypt-hashed on its pool and never
+while holding the users lock; without one they are stored as given, which
+is only fit for benchmarks and local demos.
+"""
+import bisect
+import random
+import threading
+from datetime import datetime
+
+from prediction_history import PredictionHistory
+
+USER_SORTS = ('id', 'username', 'email', 'created_at')
+
+DEFAULT_ADMIN_PASSWORD = 'admin123'
+
+
+class UserRecord:
+    """One account; supports record['field'] like the dict rows db.py returns"""
+
+    __slots__ = ('id', 'username', 'email', 'password_hash', 'role', 'created_at')
+
+    def __init__(self, id, username, email, password_hash, role, created_at):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.password_hash = password_hash
+        self.role = role
+        self.created_at = created_at
+
+    def __getitem__(self, field):
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field)
+
+    def get(self, field, default=None):
+        return getattr(self, field, default)
+
+    def to_dict(self):
+        """Public fields only (no password hash)"""
+        return {
+            'id': self.id,
+            'username': self.username,
+            'email': self.email,
+            'role': self.role,
+            'created_at': self.created_at
+        }
+
+
+class SortedIndex:
+    """(key, id) pairs in sorted order, with cheap inserts and deletes
+
+    add() appends to a pending run and discard() only counts; entries()
+    merges the pending run (timsort merges two sorted runs in linear time)
+    and drops dead ids once they are a quarter of the list. Callers hold
+    the store's users lock.
+    """
+
+    def __init__(self):
+        self._entries = []
+        self._pending = []
+        self._dead = 0
+
+    def add(self, key, user_id):
+        self._pending.append((key, user_id))
+
+    def discard(self):
+        self._dead += 1
+
+    def entries(self, live):
+        if self._pending:
+            self._pending.sort()
+            if self._entries and self._pending[0] < self._entries[-1]:
+                self._entries.extend(self._pending)
+                self._entries.sort()
+            else:
+                # Ids and creation times arrive in order: a plain append
+                self._entries.extend(self._pending)
+            self._pending = []
+        if self._dead * 4 > len(self._entries):
+            self._entries = [entry for entry in self._entries if entry[1] in live]
+            self._dead = 0
+        return self._entries
+
+
+def check_user_cursor(after, sort):
+    """after as a (sort key, id) tuple, or ValueError if its shape or types don't fit the sort
+
+    Both stores compare the key with their own values, so a key of the
+    wrong type would otherwise fail mid-listing (a TypeError from bisect).
+    """
+    if not isinstance(after, (list, tuple)) or len(after) != 2:
+        raise ValueError('Invalid cursor')
+    value, user_id = after
+    if type(user_id) is not int:
+        raise ValueError('Invalid cursor')
+    if sort == 'id':
+        valid = type(value) is int
+    elif sort == 'created_at':
+        # ISO text from either store (datetime.isoformat or MySQL's str())
+        try:
+            valid = isinstance(value, str) and datetime.fromisoformat(value) is not None
+        except ValueError:
+            valid = False
+    else:
+        valid = isinstance(value, str)
+    if not valid:
+        raise ValueError('Invalid cursor')
+    return value, user_id
+
+
+def _sort_key(record, sort):
+    value = record[sort]
+    if sort in ('username', 'email'):
+        lowered = value.lower()
+        # Share the original string when it is already lowercase
+        return value if lowered == value else lowered
+    return value
+
+
+class MemoryStore:
+    def __init__(self, prediction_capacity=10000, prediction_spill_dir=None, hasher=None):
+        self.hasher = hasher
+        self.users = {}        # email -> UserRecord (regular users)
+        self.admin_users = {}  # email -> UserRecord
+        self.users_by_id = {}
+        self.metrics = {}
+        # Newest prediction_capacity predictions per user in memory; older
+        # ones spill to prediction_spill_dir if set, else they are dropped
+        self.predictions = PredictionHistory(prediction_capacity, prediction_spill_dir)
+        self.optimizations = {}
+        self.role_counts = {}
+        self.user_indexes = {sort: SortedIndex() for sort in USER_SORTS}
+        self._next_user_id = 1
+        self._users_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._history_lock = threading.Lock()
+
+    def init_db(self):
+        print("✅ Database initialized")
+        # Create default admin user; its password is hashed on its first
+        # login, so startup doesn't wait for bcrypt
+        with self._users_lock:
+            self.admin_users['admin@adoptimizer.ai'] = UserRecord(
+                'admin_1', 'admin', 'admin@adoptimizer.ai',
+                None, 'admin', datetime.now().isoformat()
+            )
+
+    def get_user_by_email(self, email):
+        with self._users_lock:
+            return self.users.get(email)
+
+    def get_user_by_id(self, user_id):
+        with self._users_lock:
+            return self.users_by_id.get(user_id)
+
+    def get_admin_by_email(self, email):
+        with self._users_lock:
+            return self.admin_users.get(email)
+
+    def _hash_default_admin(self, record):
+        password_hash = self._hash(DEFAULT_ADMIN_PASSWORD)
+        with self._users_lock:
+            if record.password_hash is None:
+                record.password_hash = password_hash
+
+    def _hash(self, password):
+        return self.hasher.hash(password) if self.hasher is not None else password
+
+    def verify_password(self, password, password_hash):
+        if self.hasher is None:
+            return password == password_hash
+        return self.hasher.verify(password, password_hash)
+
+    def authenticate(self, email, password, admin=False):
+        """The user (or admin) record if the password matches, else None
+
+        Hashes made with a different bcrypt cost are replaced on a
+        successful login.
+        """
+        record = self.get_admin_by_email(email) if admin else self.get_user_by_email(email)
+        if record is not None and record.password_hash is None:
+            self._hash_default_admin(record)
+        if record is None or not self.verify_password(password, record.password_hash):
+            return None
+        if self.hasher is not None and self.hasher.needs_rehash(record.password_hash):
+            old_hash = record.password_hash
+            new_hash = self.hasher.rehash(password)
+            with self._users_lock:
+                if record.password_hash == old_hash:
+                    record.password_hash = new_hash
+        return record
+
+    def create_user(self, username, email, password, role='user'):
+        # Cheap check first so a duplicate signup doesn't cost a hash
+        with self._users_lock:
+            if email in self.users or email in self.admin_users:
+                return None, "User already exists"
+        password_hash = self._hash(password)
+
+        with self._users_lock:
+            if email in self.users or email in self.admin_users:
+                return None, "User already exists"
+
+            user_id = self._next_user_id
+            self._next_user_id += 1
+            record = UserRecord(
+                user_id, username, email,
+                password_hash, role, datetime.now().isoformat()
+            )
+
+            if role == 'admin':
+                self.admin_users[email] = record
+            else:
+                self.users[email] = record
+                self.users_by_id[user_id] = record
+                self.role_counts[role] = self.role_counts.get(role, 0) + 1
+                for sort, index in self.user_indexes.items():
+                    index.add(_sort_key(record, sort), user_id)
+
+        return user_id, None
+
+    def delete_user(self, user_id):
+        """Delete a user by ID"""
+        with self._users_lock:
+            record = self.users_by_id.pop(user_id, None)
+            if record is None:
+                return False
+            del self.users[record.email]
+            self.role_counts[record.role] -= 1
+            for index in self.user_indexes.values():
+                index.discard()
+        # Drop what they own, as ON DELETE CASCADE does in MySQL
+        # (these are keyed by the JWT identity, a string)
+        with self._metrics_lock:
+            self.metrics.pop(str(user_id), None)
+        self.predictions.drop_user(str(user_id))
+        with self._history_lock:
+            self.optimizations.pop(str(user_id), None)
+        return True
+
+    def list_users(self, query=None, role=None, sort='id', descending=False, after=None, limit=50):
+        """One page of users in (sort key, id) order, starting after the given (key, id)
+
+        Returns (users, next_after); next_after is None on the last page.
+        A query matches an email or username prefix through the sorted indexes.
+        """
+        if after is not None:
+            after = check_user_cursor(after, sort)
+        with self._users_lock:
+            if query:
+                entries = sorted((_sort_key(self.users_by_id[user_id], sort), user_id)
+                                 for user_id in self._prefix_matches(query))
+            else:
+                entries = self.user_indexes[sort].entries(self.users_by_id)
+
+            if descending:
+                start = bisect.bisect_left(entries, tuple(after)) - 1 if after else len(entries) - 1
+                positions = range(start, -1, -1)
+            else:
+                start = bisect.bisect_right(entries, tuple(after)) if after else 0
+                positions = range(start, len(entries))
+
+            page = []
+            for position in positions:
+                record = self.users_by_id.get(entries[position][1])
+                if record is None or (role and role != 'all' and record.role != role):
+                    continue
+                if len(page) == limit:
+                    last = page[-1]
+                    return [user.to_dict() for user in page], (_sort_key(last, sort), last.id)
+                page.append(record)
+            return [user.to_dict() for user in page], None
+
+    def _prefix_matches(self, query):
+        """Ids of users whose email or username starts with query (caller holds the users lock)"""
+        prefix = query.lower()
+        ids = set()
+        for sort in ('email', 'username'):
+            entries = self.user_indexes[sort].entries(self.users_by_id)
+            position = bisect.bisect_left(entries, (prefix,))
+            while position < len(entries) and entries[position][0].startswith(prefix):
+                if entries[position][1] in self.users_by_id:
+                    ids.add(entries[position][1])
+                position += 1
+        return ids
+
+    def count_users(self, query=None, role=None):
+        with self._users_lock:
+            if query:
+                return sum(1 for user_id in self._prefix_matches(query)
+                           if not role or role == 'all' or self.users_by_id[user_id].role == role)
+            if role and role != 'all':
+                return self.role_counts.get(role, 0)
+            return len(self.users_by_id)
+
+    def campaign_counts(self, user_ids):
+        """Distinct (platform, campaign) pairs per user, for one page of users"""
+        counts = {}
+        with self._metrics_lock:
+            for user_id in user_ids:
+                keys = self.metrics.get(str(user_id), {})
+                counts[user_id] = len({(platform, campaign) for _, platform, campaign in keys})
+        return counts
+
+    def get_user_metrics(self, user_id):
+        # Return mock metrics
+        return {
+            'ctr': round(random.uniform(0.02, 0.06), 4),
+            'cpc': round(random.uniform(12, 25), 2),
+            'conversions': random.randint(800, 1500),
+            'roas': round(random.uniform(2.5, 5.5), 2),
+            'spend': random.randint(8000, 15000),
+            'engagement': round(random.uniform(0.03, 0.08), 4),
+            'impressions': random.randint(50000, 200000)
+        }
+
+    def save_prediction_result(self, user_id, input_data, prediction_result):
+        self.predictions.append(user_id, input_data, prediction_result)
+
+    def get_prediction_history(self, user_id, limit=5):
+        return self.predictions.recent(user_id, limit)
+
+    def save_history_batch(self, predictions, optimizations):
+        self.predictions.extend(predictions)
+        with self._history_lock:
+            for user_id, settings, results, created_at in optimizations:
+                self.optimizations.setdefault(user_id, []).append({
+                    'settings': settings,
+                    'results': results,
+                    'timestamp': created_at.isoformat()
+                })
+
+    def iter_prediction_history(self, user_id, page_size=1000):
+        return self.predictions.iter_records(user_id, page_size)
+
+    def iter_optimization_history(self, user_id, page_size=1000):
+        # Walk by position so entries appended mid-export are picked up, not
+        # skipped; history lists are only ever appended to
+        with self._history_lock:
+            entries = self.optimizations.get(user_id, [])
+        position = 0
+        while position < len(entries):
+            entry = entries[position]
+            position += 1
+            yield {'settings': entry['settings'], 'results': entry['results'], 'created_at': entry['timestamp']}
+
+    def add_campaign_metrics_batch(self, user_id, rows):
+        # Keep per-day campaign totals rather than every raw row
+        with self._metrics_lock:
+            totals = self.metrics.setdefault(user_id, {})
+            for day, impressions, clicks, spend, conversions, platform, campaign_name in rows:
+                key = (day.isoformat(), platform, campaign_name)
+                entry = totals.setdefault(key, {'impressions': 0, 'clicks': 0, 'spend': 0.0, 'conversions': 0})
+                entry['impressions'] += impressions
+                entry['clicks'] += clicks
+                entry['spend'] += spend
+                entry['conversions'] += conversions
+        return len(rows)
+
+    def get_user_recommendations(self, user_id):
+        # Return mock recommendations
+        return [
+            {
+                'campaign': 'Google Ads Q4',
+                'predicted_ctr': round(random.uniform(0.03, 0.07), 4),
+                'best_channel': 'Google Ads',
+                'recommended_budget_pct': random.randint(10, 25)
+            },
+            {
+                'campaign': 'Facebook Prospecting',
+                'predicted_ctr': round(random.uniform(0.04, 0.08), 4),
+                'best_channel': 'Facebook Ads',
+                'recommended_budget_pct': random.randint(5, 20)
+            }
+        ]
+
+    def save_optimization_settings(self, user_id, settings, results):
+        with self._history_lock:
+            self.optimizations.setdefault(user_id, []).append({
+                'settings': settings,
+                'results': results,
+                'timestamp': datetime.now().isoformat()
+            })
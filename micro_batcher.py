@@ -0,0 +1,119 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-row predictions into batched model calls.
+
+    Callers on any thread submit one input row and block on their own
+    Future. A single dispatcher thread takes the first waiting row, keeps
+    collecting rows for up to max_wait_ms (or until max_batch_size rows are
+    queued), runs them through predict_batch in one call and hands each
+    caller its own result.
+    """
+
+    def __init__(self, predict_batch, max_wait_ms=2.0, max_batch_size=64):
+        self.predict_batch = predict_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        # Guards _closed so no row can be queued behind the stop marker
+        self._closed_lock = threading.Lock()
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._max_batch_seen = 0
+        self._total_queue_delay = 0.0
+        self._max_queue_delay = 0.0
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        """Queue one input row and return a Future for its prediction
+
+        Raises RuntimeError once the batcher is closed, since no thread
+        would ever resolve the Future.
+        """
+        future = Future()
+        with self._closed_lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._queue.put((row, future, time.monotonic()))
+        return future
+
+    def predict(self, row, timeout=None):
+        """Submit a row and wait for its prediction result"""
+        return self.submit(row).result(timeout)
+
+    def close(self):
+        """Stop the dispatcher once the rows already queued have been served"""
+        with self._closed_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self):
+        """Batch size and queue delay metrics"""
+        with self._stats_lock:
+            return {
+                'batches': self._batches,
+                'requests': self._requests,
+                'avg_batch_size': round(self._requests / self._batches, 2) if self._batches else 0.0,
+                'max_batch_size': self._max_batch_seen,
+                'avg_queue_delay_ms': round(self._total_queue_delay / self._requests * 1000, 3) if self._requests else 0.0,
+                'max_queue_delay_ms': round(self._max_queue_delay * 1000, 3),
+                'queued': self._queue.qsize(),
+                'max_wait_ms': self.max_wait * 1000,
+                'batch_limit': self.max_batch_size
+            }
+
+    def _collect(self, first):
+        """Gather rows that arrive within the batching window"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # Serve what we already have, then let the loop see the stop marker
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+
+            batch = self._collect(first)
+            dispatched_at = time.monotonic()
+            rows = [row for row, _, _ in batch]
+
+            try:
+                results = self.predict_batch(rows)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future, _), result in zip(batch, results):
+                    future.set_result(result)
+
+            delays = [dispatched_at - enqueued_at for _, _, enqueued_at in batch]
+            with self._stats_lock:
+                self._batches += 1
+                self._requests += len(batch)
+                self._max_batch_seen = max(self._max_batch_seen, len(batch))
+                self._total_queue_delay += sum(delays)
+                self._max_queue_delay = max(self._max_queue_delay, max(delays))
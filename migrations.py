@@ -0,0 +1,210 @@
+"""Versioned schema migrations.
+
+Each migration is applied once, in order, and recorded in schema_version.
+Database.init_db runs them at startup, so request handlers never issue DDL.
+Add new schema changes as a new entry at the end of MIGRATIONS; never edit
+one that has shipped.
+
+Usage:
+    python migrations.py          apply pending migrations
+    python migrations.py status   list applied and pending migrations
+"""
+import sys
+
+from mysql.connector import Error, errorcode
+
+from rollup import ROLLUP_REBUILD
+
+MIGRATIONS = [
+    (1, 'Create users, campaign_metrics and recommendations', [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(80) UNIQUE NOT NULL,
+            email VARCHAR(120) UNIQUE NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS campaign_metrics (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            date DATE NOT NULL,
+            impressions INT NOT NULL,
+            clicks INT NOT NULL,
+            spend DECIMAL(10,2) NOT NULL,
+            conversions INT NOT NULL,
+            platform VARCHAR(50) NOT NULL,
+            campaign_name VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS recommendations (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            campaign_name VARCHAR(255) NOT NULL,
+            recommendation_text TEXT NOT NULL,
+            confidence_score DECIMAL(5,4),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        '''
+    ]),
+    (2, 'Create prediction_history and optimization_history', [
+        '''
+        CREATE TABLE IF NOT EXISTS prediction_history (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            input_data JSON NOT NULL,
+            prediction_result JSON NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS optimization_history (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            settings JSON NOT NULL,
+            results JSON NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        '''
+    ]),
+    (3, 'Add indexes for the dashboard and history queries', [
+        # Covers get_user_metrics and get_campaign_metrics (range on user_id,
+        # date; every summed column is in the index) and get_recent_campaigns
+        # (walked backwards along user_id, date)
+        '''
+        CREATE INDEX idx_campaign_metrics_user_date ON campaign_metrics
+            (user_id, date, platform, campaign_name, impressions, clicks, spend, conversions)
+        ''',
+        'CREATE INDEX idx_recommendations_user_created ON recommendations (user_id, created_at)',
+        'CREATE INDEX idx_prediction_history_user_created ON prediction_history (user_id, created_at)',
+        'CREATE INDEX idx_optimization_history_user_created ON optimization_history (user_id, created_at)'
+    ]),
+    (4, 'Add campaign_daily_rollup and backfill it', [
+        '''
+        CREATE TABLE IF NOT EXISTS campaign_daily_rollup (
+            user_id INT NOT NULL,
+            day DATE NOT NULL,
+            platform VARCHAR(50) NOT NULL,
+            campaign_name VARCHAR(255) NOT NULL,
+            impressions BIGINT NOT NULL,
+            clicks BIGINT NOT NULL,
+            spend DECIMAL(14,2) NOT NULL,
+            conversions BIGINT NOT NULL,
+            PRIMARY KEY (user_id, day, platform, campaign_name),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        ''',
+        'DELETE FROM campaign_daily_rollup',
+        ROLLUP_REBUILD.format(user_filter='')
+    ]),
+    (5, 'Add maintained row counters and the users created_at index', [
+        '''
+        CREATE TABLE IF NOT EXISTS counters (
+            name VARCHAR(64) PRIMARY KEY,
+            value BIGINT NOT NULL
+        )
+        ''',
+        '''
+        INSERT INTO counters (name, value)
+        SELECT 'users', COUNT(*) FROM users
+        ON DUPLICATE KEY UPDATE value = VALUES(value)
+        ''',
+        'CREATE INDEX idx_users_created_at ON users (created_at)'
+    ]),
+    (6, 'Narrow the campaign_metrics index now that reads use the rollup', [
+        # Dashboard reads and training both read campaign_daily_rollup, so the
+        # wide covering index only costs every ingest write. (user_id, date)
+        # still backs the foreign key and a per-user rollup rebuild; it is
+        # created first because MySQL won't drop the foreign key's only index
+        'CREATE INDEX idx_campaign_metrics_user_day ON campaign_metrics (user_id, date)',
+        'DROP INDEX idx_campaign_metrics_user_date ON campaign_metrics'
+    ]),
+]
+
+# Writers to users apply this in the same transaction as their INSERT/DELETE,
+# so the admin panel's total is a one-row read instead of a COUNT(*) scan
+USER_COUNT_ADJUST = "UPDATE counters SET value = value + %s WHERE name = 'users'"
+USER_COUNT_RECOUNT = "UPDATE counters SET value = (SELECT COUNT(*) FROM users) WHERE name = 'users'"
+
+# Held while migrating so app processes starting together don't race
+LOCK_NAME = 'ad_optimizer_schema_migrations'
+LOCK_TIMEOUT_SECONDS = 60
+
+
+def _applied_versions(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute("SELECT version FROM schema_version")
+    return {row['version'] for row in cursor.fetchall()}
+
+
+def run_migrations(db):
+    """Apply every migration not yet recorded in schema_version; return the versions applied"""
+    applied_now = []
+    with db.transaction() as cursor:
+        cursor.execute("SELECT GET_LOCK(%s, %s) AS acquired", (LOCK_NAME, LOCK_TIMEOUT_SECONDS))
+        if not cursor.fetchone()['acquired']:
+            raise RuntimeError("Timed out waiting for another process to finish migrating")
+        try:
+            applied = _applied_versions(cursor)
+            for version, description, statements in MIGRATIONS:
+                if version in applied:
+                    continue
+                # MySQL commits DDL implicitly, so a migration is not atomic;
+                # write statements that are safe to re-run if one fails midway
+                for statement in statements:
+                    try:
+                        cursor.execute(statement)
+                    except Error as e:
+                        # CREATE/DROP INDEX have no IF [NOT] EXISTS; an index
+                        # an earlier, interrupted run created or dropped is fine
+                        if e.errno not in (errorcode.ER_DUP_KEYNAME, errorcode.ER_CANT_DROP_FIELD_OR_KEY):
+                            raise
+                        print(f"⚠️ Migration {version}: {e.msg}, skipping")
+                cursor.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                    (version, description)
+                )
+                applied_now.append(version)
+                print(f"✅ Applied migration {version}: {description}")
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s) AS released", (LOCK_NAME,))
+            cursor.fetchone()
+    return applied_now
+
+
+def migration_status(db):
+    """(version, description, applied) for every known migration"""
+    with db.transaction() as cursor:
+        applied = _applied_versions(cursor)
+    return [(version, description, version in applied) for version, description, _ in MIGRATIONS]
+
+
+def main():
+    from db import get_db
+    db = get_db()
+    if len(sys.argv) > 1 and sys.argv[1] == 'status':
+        for version, description, applied in migration_status(db):
+            print(f"{'✅' if applied else '⏳'} {version:>4}  {description}")
+        return 0
+    applied = run_migrations(db)
+    if not applied:
+        print("✅ Schema is up to date")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
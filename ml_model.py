@@ -1,28 +1,170 @@
-import pandas as pd
+# pandas, sklearn and joblib are imported inside the methods that need them.
+# Serving runs on the compiled forest alone, so a process that only loads a
+# registry version and predicts never pays for those imports.
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import mean_absolute_error, r2_score
-import joblib
 import os
 from datetime import datetime
 import random
+import threading
+import time
+from forest_engine import CompiledForest, verify_compiled
+from prediction_cache import PredictionCache
+from training_data import (
+    ReservoirSample, StageProfiler, campaign_windows, generate_training_arrays, plan_training_memory
+)
+
+FEATURES = ['impressions', 'spend', 'current_CTR', 'current_CPC', 'engagement_rate']
+
+
+def _build_recommendation_table():
+    """Precompute every recommendation string predict_batch can produce"""
+    budget_options = [
+        "Increase budget by 15-20% for maximum ROI",
+        "Consider a 5-10% budget increase",
+        "Pause campaign and test new creatives",
+    ]
+    cpc_options = [
+        "Great CPC efficiency - scale this approach",
+        "High CPC detected - optimize targeting",
+        None,
+    ]
+    table = []
+    for budget in budget_options:
+        for cpc in cpc_options:
+            for low_engagement in (False, True):
+                recommendations = [budget]
+                if cpc:
+                    recommendations.append(cpc)
+                if low_engagement:
+                    recommendations.append("Low engagement - improve ad relevance")
+                table.append(" | ".join(recommendations))
+    return table
+
+
+RECOMMENDATION_TABLE = _build_recommendation_table()
+
+# The compiled forest walks every tree to max_depth for every row, while
+# sklearn pays ~13 ms per call and then stops each row at its leaf. So the
+# compiled forest is scored for up to this many rows x trees x depth node
+# steps: benchmarks.py inference measures the crossover at ~900 rows for 100
+# trees of depth 10 and ~1800 for depth 6. A forest of shallow trees, like
+# the one trained on synthetic data, takes the compiled path at every size.
+COMPILED_MAX_NODE_STEPS = 800000
+
+# A fitted model is only ever published together with the scaler it was
+# trained with and its compiled form, in a single attribute assignment
+class ModelBundle:
+    """The compiled forest being served, plus its sklearn model and scaler.
+
+    The sklearn pair is only needed for batches beyond compiled_max_rows
+    and for non-finite inputs, so when a bundle is loaded from the registry
+    it is unpickled on first use via loader.
+    """
+
+    def __init__(self, compiled, version=None, model=None, scaler=None, loader=None):
+        self.compiled = compiled
+        self.compiled_max_rows = COMPILED_MAX_NODE_STEPS // max(1, compiled.n_trees * compiled.max_depth)
+        self.version = version
+        self._model = model
+        self._scaler = scaler
+        self._loader = loader
+        self._lock = threading.Lock()
+
+    def sklearn_pair(self):
+        """Return (model, scaler), loading them on first call if needed"""
+        if self._model is None and self._loader is not None:
+            with self._lock:
+                if self._model is None:
+                    self._model, self._scaler = self._loader()
+        return self._model, self._scaler
+
+# Model/scaler pickles written before the registry existed, checked in order
+LEGACY_ARTIFACTS = [
+    ('models/model.pkl', 'models/scaler.pkl'),
+    ('model.pkl', 'scaler.pkl'),
+]
+
+# When training reports progress, trees are fitted in chunks of at least
+# this many (and at least one per worker, so every core gets a tree)
+TRAINING_CHUNK_TREES = 10
+
+
+def _fit_forest(X, y, n_jobs=None, progress=None, fit_progress=(0.0, 1.0), n_estimators=100):
+    """Fit the serving forest, in chunks only if progress is reported
+
+    warm_start grows the same forest a chunk at a time, giving exactly the
+    trees a single fit would. Each chunk is a fit() with its own worker
+    pool, so a chunk has a tree for every worker; without a progress
+    callback the forest is built in one fit.
+    """
+    from joblib import effective_n_jobs
+    from sklearn.ensemble import RandomForestRegressor
+
+    chunk = max(TRAINING_CHUNK_TREES, effective_n_jobs(n_jobs)) if progress else n_estimators
+    first, last = fit_progress
+    model = RandomForestRegressor(n_estimators=min(chunk, n_estimators), random_state=42, max_depth=10,
+                                  warm_start=True, n_jobs=n_jobs)
+    n_trees = 0
+    while n_trees < n_estimators:
+        n_trees = min(n_trees + chunk, n_estimators)
+        model.set_params(n_estimators=n_trees)
+        model.fit(X, y)
+        if progress:
+            progress(first + (last - first) * n_trees / n_estimators, f'Fitted {n_trees}/{n_estimators} trees')
+    # Serving scores small batches; don't spin up a thread pool for each
+    model.set_params(warm_start=False, n_jobs=None)
+    return model
 
 class AdOptimizerModel:
-    def __init__(self):
-        self.model = None
-        self.scaler = StandardScaler()
+    def __init__(self, cache_size=0, cache_quantization=None, registry=None):
+        self._bundle = None
+        self._publish_lock = threading.Lock()
         self.model_path = 'models/model.pkl'
         self.scaler_path = 'models/scaler.pkl'
         self.is_trained = False
         
+        # Optional LRU cache of recent predictions (disabled when cache_size is 0)
+        self.cache = PredictionCache(cache_size, cache_quantization) if cache_size > 0 else None
+        
+        # Optional process pool that scores rows outside this process
+        self.pool = None
+        
+        # Optional ModelRegistry; without one the flat model_path/scaler_path are used
+        self.registry = registry
+        
         # Create models directory if it doesn't exist
         os.makedirs('models', exist_ok=True)
+
+    @property
+    def model(self):
+        bundle = self._bundle
+        return bundle.sklearn_pair()[0] if bundle else None
+
+    @property
+    def scaler(self):
+        bundle = self._bundle
+        return bundle.sklearn_pair()[1] if bundle else None
+
+    @property
+    def compiled(self):
+        bundle = self._bundle
+        return bundle.compiled if bundle else None
+
+    @property
+    def compiled_max_rows(self):
+        """Largest batch the compiled forest scores; bigger ones go to sklearn"""
+        bundle = self._bundle
+        return bundle.compiled_max_rows if bundle else None
+
+    @property
+    def version(self):
+        bundle = self._bundle
+        return bundle.version if bundle else None
         
     def generate_training_data(self, n_samples=1000):
         """Generate realistic training data for ad campaign optimization"""
+        import pandas as pd
+        
         np.random.seed(42)
         
         data = {
@@ -54,10 +196,16 @@ class AdOptimizerModel:
         
         return df
 
-    def train_model(self):
-        """Train the ML model on generated data"""
+    def train_model(self, progress=None):
+        """Train the ML model on generated data
+        
+        progress, if given, is called as progress(fraction, stage) while training runs.
+        The new model only replaces the serving one once it is fully fitted and saved.
+        """
+        report = progress or (lambda fraction, stage: None)
         try:
             print("🔄 Generating training data...")
+            report(0.0, 'Generating training data')
             df = self.generate_training_data(500)
             
             # Features for prediction
@@ -68,61 +216,277 @@ class AdOptimizerModel:
             y_ctr = df['predicted_CTR']
             y_cpc = df['predicted_CPC']
             
-            # Split data
-            X_train, X_test, y_ctr_train, y_ctr_test = train_test_split(
-                X, y_ctr, test_size=0.2, random_state=42
-            )
+            return self._fit_and_store(X, y_ctr, features, progress, fit_progress=(0.1, 0.9))
             
-            # Scale features
-            X_train_scaled = self.scaler.fit_transform(X_train)
-            X_test_scaled = self.scaler.transform(X_test)
+        except Exception as e:
+            print(f"❌ Error training model: {e}")
+            return {'status': 'error', 'message': str(e)}
+
+    def train_from_database(self, db, window_days=7, chunk_size=10000, max_samples=200000,
+                            min_samples=50, n_jobs=-1, progress=None):
+        """Train on real campaign_metrics history streamed from the database
+        
+        Rows are read chunk_size at a time and folded into per-campaign windows
+        of window_days; each window's features are paired with the next
+        window's CTR. At most max_samples windows are kept (a uniform reservoir
+        sample), so memory stays flat as the table grows.
+        """
+        report = progress or (lambda fraction, stage: None)
+        try:
+            print("🔄 Streaming campaign_metrics for training...")
+            report(0.0, 'Streaming campaign_metrics')
+            
+            sample = ReservoirSample(max_samples, len(FEATURES))
+            windows = campaign_windows(db.iter_campaign_metrics(chunk_size), window_days)
+            for features, target in windows:
+                sample.add(features, target)
+                if sample.seen % 100000 == 0:
+                    report(0.05, f'Read {sample.seen} campaign windows')
+            
+            X, y = sample.arrays()
+            if len(X) < min_samples:
+                message = f'Not enough campaign history to train: {len(X)} windows (need {min_samples})'
+                print(f"⚠️ {message}")
+                return {'status': 'error', 'message': message}
+            
+            print(f"   {sample.seen} campaign windows read, training on {len(X)}")
+            data_info = {'source': 'campaign_metrics', 'windows_seen': sample.seen, 'samples': len(X)}
+            return self._fit_and_store(X, y, FEATURES, progress, fit_progress=(0.4, 0.9),
+                                       data_info=data_info, n_jobs=n_jobs)
+            
+        except Exception as e:
+            print(f"❌ Error training model from database: {e}")
+            return {'status': 'error', 'message': str(e)}
+
+    def train_large(self, n_samples=1000000, n_jobs=-1, memory_limit_mb=None, progress=None):
+        """Train on a large synthetic dataset with all cores and float32 features
+        
+        Features are generated straight into one float32 matrix (no DataFrame),
+        split by slicing (rows are i.i.d., so no shuffle copy is needed) and
+        scaled in place. Trees are built in parallel with n_jobs workers. With
+        memory_limit_mb set, workers and then rows are reduced to fit it.
+        Wall time and peak RSS are reported for every stage.
+        """
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.metrics import mean_absolute_error, r2_score
+        
+        report = progress or (lambda fraction, stage: None)
+        profiler = StageProfiler()
+        try:
+            planned_samples, n_jobs = plan_training_memory(n_samples, n_jobs, memory_limit_mb)
+            if planned_samples < n_samples:
+                print(f"⚠️ Memory limit {memory_limit_mb} MB: training on {planned_samples} of {n_samples} rows")
+            n_samples = planned_samples
+            print(f"🔄 Training on {n_samples} synthetic rows with {n_jobs} workers...")
+            
+            report(0.0, 'Generating training data')
+            with profiler.stage('generate'):
+                X, y = generate_training_arrays(n_samples)
+            
+            report(0.1, 'Scaling features')
+            with profiler.stage('scale'):
+                split = int(n_samples * 0.8)
+                scaler = StandardScaler(copy=False)
+                scaler.fit(X[:split])
+                scaler.transform(X, copy=False)
+                X_train, X_test = X[:split], X[split:]
+                y_train, y_test = y[:split], y[split:]
+            
+            with profiler.stage('fit'):
+                model = _fit_forest(X_train, y_train, n_jobs, progress, fit_progress=(0.15, 0.9))
+            training_time = profiler.stages[-1]['seconds']
+            
+            with profiler.stage('evaluate'):
+                y_pred = model.predict(X_test)
+                mae_ctr = mean_absolute_error(y_test, y_pred)
+                r2_ctr = r2_score(y_test, y_pred)
             
-            # Train model for CTR prediction
-            self.model = RandomForestRegressor(n_estimators=100, random_state=42, max_depth=10)
-            self.model.fit(X_train_scaled, y_ctr_train)
+            metrics = {
+                'ctr_mae': mae_ctr,
+                'ctr_r2': r2_ctr,
+                'source': 'synthetic',
+                'samples': n_samples,
+                'n_jobs': n_jobs
+            }
             
-            # Calculate performance metrics
-            y_ctr_pred = self.model.predict(X_test_scaled)
-            mae_ctr = mean_absolute_error(y_ctr_test, y_ctr_pred)
-            r2_ctr = r2_score(y_ctr_test, y_ctr_pred)
+            report(0.95, 'Saving model')
+            with profiler.stage('store'):
+                version = self._store_trained(model, scaler, metrics, FEATURES, training_time)
+            metrics['stages'] = profiler.report()
+            report(1.0, 'Completed')
             
             print(f"✅ Model trained successfully")
             print(f"   CTR Prediction - MAE: {mae_ctr:.4f}, R²: {r2_ctr:.4f}")
-            
-            # Save model and scaler
-            joblib.dump(self.model, self.model_path)
-            joblib.dump(self.scaler, self.scaler_path)
-            self.is_trained = True
+            for stage in metrics['stages']:
+                print(f"   {stage['stage']:<9} {stage['seconds']:>8.3f}s  peak RSS {stage['peak_rss_mb']} MB")
             
             return {
                 'status': 'success',
                 'message': 'Model trained successfully',
-                'metrics': {
-                    'ctr_mae': mae_ctr,
-                    'ctr_r2': r2_ctr
-                }
+                'version': version,
+                'metrics': metrics
             }
             
         except Exception as e:
             print(f"❌ Error training model: {e}")
-            return {'status': 'error', 'message': str(e)}
+            return {'status': 'error', 'message': str(e), 'stages': profiler.report()}
+
+    def _fit_and_store(self, X, y, features, progress, fit_progress, data_info=None, n_jobs=None):
+        """Fit scaler and forest on (X, y), evaluate on a hold-out split, then store and serve"""
+        from sklearn.model_selection import train_test_split
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.metrics import mean_absolute_error, r2_score
+        
+        # Split data
+        X_train, X_test, y_ctr_train, y_ctr_test = train_test_split(
+            X, y, test_size=0.2, random_state=42
+        )
+        
+        # Scale features
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
+        X_test_scaled = scaler.transform(X_test)
+        
+        report = progress or (lambda fraction, stage: None)
+        fit_start = time.perf_counter()
+        
+        # Train model for CTR prediction
+        model = _fit_forest(X_train_scaled, y_ctr_train, n_jobs, progress, fit_progress)
+        training_time = round(time.perf_counter() - fit_start, 3)
+        
+        # Calculate performance metrics
+        y_ctr_pred = model.predict(X_test_scaled)
+        mae_ctr = mean_absolute_error(y_ctr_test, y_ctr_pred)
+        r2_ctr = r2_score(y_ctr_test, y_ctr_pred)
+        
+        print(f"✅ Model trained successfully")
+        print(f"   CTR Prediction - MAE: {mae_ctr:.4f}, R²: {r2_ctr:.4f}")
+        
+        metrics = {
+            'ctr_mae': mae_ctr,
+            'ctr_r2': r2_ctr
+        }
+        if data_info:
+            metrics.update(data_info)
+        
+        # Save model and scaler, then switch serving over to them
+        report(0.95, 'Saving model')
+        version = self._store_trained(model, scaler, metrics, features, training_time)
+        report(1.0, 'Completed')
+        
+        return {
+            'status': 'success',
+            'message': 'Model trained successfully',
+            'version': version,
+            'metrics': metrics
+        }
 
     def load_model(self):
         """Load pre-trained model and scaler"""
+        if self.registry is not None:
+            return self._load_from_registry()
         try:
             if os.path.exists(self.model_path) and os.path.exists(self.scaler_path):
-                self.model = joblib.load(self.model_path)
-                self.scaler = joblib.load(self.scaler_path)
-                self.is_trained = True
+                import joblib
+                model = joblib.load(self.model_path)
+                scaler = joblib.load(self.scaler_path)
+                self._publish(model, scaler)
                 print("✅ Model loaded successfully")
                 return True
             else:
                 print("⚠️ No pre-trained model found. Training new model...")
-                return self.train_model() is not None
+                return self.train_model()['status'] == 'success'
         except Exception as e:
             print(f"❌ Error loading model: {e}")
             return False
 
+    def reload_if_changed(self, version=None):
+        """Load the registry's active version if it differs from the one being served"""
+        if self.registry is None:
+            return False
+        version = version or self.registry.active_version()
+        if version is None or version == self.version:
+            return False
+        return self._load_from_registry(version)
+
+    def _load_from_registry(self, version=None):
+        """Serve a registry version (the active one by default), importing or training if empty"""
+        try:
+            version = version or self.registry.active_version()
+            
+            if version is None:
+                version = self._import_legacy_artifacts()
+            
+            if version is None:
+                print("⚠️ Model registry is empty. Training new model...")
+                return self.train_model()['status'] == 'success'
+            
+            compiled, metadata = self.registry.load(version)
+            loader = lambda: self.registry.load_sklearn(version)
+            self._publish_bundle(ModelBundle(compiled, version, loader=loader))
+            print(f"✅ Model {version} loaded from registry")
+            return True
+        except Exception as e:
+            print(f"❌ Error loading model from registry: {e}")
+            return False
+
+    def _import_legacy_artifacts(self):
+        """Register pickles from before the registry existed, if any load cleanly"""
+        for model_path, scaler_path in LEGACY_ARTIFACTS:
+            if os.path.exists(model_path) and os.path.exists(scaler_path):
+                try:
+                    version = self.registry.import_files(model_path, scaler_path, features=FEATURES)
+                    print(f"✅ Imported {model_path} into model registry as {version}")
+                    return version
+                except Exception as e:
+                    print(f"⚠️ Could not import {model_path}: {e}")
+        return None
+
+    def _store_trained(self, model, scaler, metrics, features, training_time):
+        """Persist a freshly trained model and serve it if it is now the active one"""
+        compiled = CompiledForest.from_sklearn(model, scaler)
+        # Never store or serve a compiled forest that disagrees with sklearn
+        verify_compiled(compiled, model, scaler)
+        
+        if self.registry is None:
+            self._save_artifacts(model, scaler)
+            self._publish(model, scaler, compiled)
+            return None
+        
+        version = self.registry.register(
+            model, scaler, compiled,
+            metrics=metrics,
+            features=features,
+            training_time_seconds=training_time
+        )
+        active = self.registry.active_version()
+        if active == version:
+            self._publish(model, scaler, compiled, version)
+        else:
+            print(f"⚠️ Registered {version} but registry is pinned to {active}; not serving it")
+        return version
+
+    def _save_artifacts(self, model, scaler):
+        """Write model and scaler via temp files so readers never see a partial file"""
+        import joblib
+        
+        for obj, path in ((model, self.model_path), (scaler, self.scaler_path)):
+            tmp_path = f"{path}.tmp"
+            joblib.dump(obj, tmp_path)
+            os.replace(tmp_path, path)
+
+    def _publish(self, model, scaler, compiled=None, version=None):
+        """Atomically make a fitted model and its scaler the serving pair"""
+        compiled = compiled or CompiledForest.from_sklearn(model, scaler)
+        self._publish_bundle(ModelBundle(compiled, version, model=model, scaler=scaler))
+
+    def _publish_bundle(self, bundle):
+        """Swap in a new bundle with a single assignment"""
+        with self._publish_lock:
+            self._bundle = bundle
+            self.is_trained = True
+            self._on_model_replaced()
+
     def predict(self, input_data):
         """Make predictions for given input data"""
         if not self.is_trained:
@@ -130,22 +494,29 @@ class AdOptimizerModel:
                 return {'status': 'error', 'message': 'Model not trained'}
         
         try:
+            if self.cache is not None:
+                cache_generation = self.cache.generation
+                cache_key = self.cache.make_key(input_data)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            
+            # Read the bundle once so a concurrent swap can't mix model and scaler
+            bundle = self._bundle
+            
             # Prepare features
             features = ['impressions', 'spend', 'current_CTR', 'current_CPC', 'engagement_rate']
-            X = np.array([[input_data[feature] for feature in features]])
-            
-            # Scale features
-            X_scaled = self.scaler.transform(X)
+            X = np.array([[input_data[feature] for feature in features]], dtype=np.float64)
             
             # Make predictions
-            predicted_ctr = self.model.predict(X_scaled)[0]
+            predicted_ctr = self._score(X, bundle)[0]
             predicted_cpc = self._predict_cpc(input_data, predicted_ctr)
             
             # Generate label and recommendation
             label = self._generate_label(predicted_ctr, input_data['current_CTR'])
             recommendation = self._generate_recommendation(predicted_ctr, predicted_cpc, input_data)
             
-            return {
+            result = {
                 'status': 'success',
                 'predicted_CTR': round(predicted_ctr, 4),
                 'predicted_CPC': round(predicted_cpc, 2),
@@ -153,10 +524,152 @@ class AdOptimizerModel:
                 'recommendation': recommendation
             }
             
+            if self.cache is not None:
+                self.cache.put(cache_key, result, cache_generation)
+            
+            return result
+            
         except Exception as e:
             print(f"❌ Prediction error: {e}")
             return {'status': 'error', 'message': str(e)}
 
+    def predict_batch(self, rows):
+        """Make predictions for a list of inputs using one vectorized model call"""
+        if not self.is_trained:
+            if not self.load_model():
+                return [{'status': 'error', 'message': 'Model not trained'} for _ in rows]
+
+        bundle = self._bundle
+        cache_generation = self.cache.generation if self.cache is not None else None
+        results = [None] * len(rows)
+        valid_index = []
+        valid_values = []
+        cache_keys = []
+
+        # Validate rows up front so one bad row doesn't fail the whole batch
+        for i, row in enumerate(rows):
+            error = self._validate_row(row)
+            if error:
+                results[i] = {'status': 'error', 'message': error}
+                continue
+
+            if self.cache is not None:
+                cache_key = self.cache.make_key(row)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    results[i] = cached
+                    continue
+                cache_keys.append(cache_key)
+
+            valid_index.append(i)
+            valid_values.append([row[feature] for feature in FEATURES])
+
+        if not valid_index:
+            return results
+
+        X = np.array(valid_values, dtype=np.float64)
+
+        # One forest call for the whole batch
+        predicted_ctr = self._score(X, bundle)
+
+        current_ctr = X[:, FEATURES.index('current_CTR')]
+        current_cpc = X[:, FEATURES.index('current_CPC')]
+        engagement_rate = X[:, FEATURES.index('engagement_rate')]
+
+        predicted_cpc = self._predict_cpc_array(predicted_ctr, current_ctr, current_cpc)
+        labels = self._generate_labels(predicted_ctr, current_ctr)
+        recommendations = self._generate_recommendations(
+            predicted_ctr, predicted_cpc, current_ctr, current_cpc, engagement_rate
+        )
+
+        rounded_ctr = np.round(predicted_ctr, 4).tolist()
+        rounded_cpc = np.round(predicted_cpc, 2).tolist()
+
+        for j, i in enumerate(valid_index):
+            results[i] = {
+                'status': 'success',
+                'predicted_CTR': rounded_ctr[j],
+                'predicted_CPC': rounded_cpc[j],
+                'label': labels[j],
+                'recommendation': recommendations[j]
+            }
+            if self.cache is not None:
+                self.cache.put(cache_keys[j], results[i], cache_generation)
+
+        return results
+
+    def cache_stats(self):
+        """Prediction cache counters, or None when caching is disabled"""
+        return self.cache.stats() if self.cache is not None else None
+
+    def attach_pool(self, pool):
+        """Send scoring to an InferencePool instead of running it in this process"""
+        if self.compiled is not None:
+            pool.publish(self.compiled)
+        self.pool = pool
+
+    def _on_model_replaced(self):
+        """Forget cached predictions and republish to the pool after a model swap"""
+        if self.cache is not None:
+            self.cache.clear()
+        if self.pool is not None:
+            self.pool.publish(self.compiled)
+
+    def _score(self, X, bundle):
+        """Predict CTR for a matrix of raw (unscaled) feature rows"""
+        finite = np.isfinite(X).all()
+        if self.pool is not None and finite:
+            return self.pool.score(X)
+        if len(X) <= bundle.compiled_max_rows and finite:
+            return bundle.compiled.predict(X)
+        model, scaler = bundle.sklearn_pair()
+        return model.predict(scaler.transform(X))
+
+    def _validate_row(self, row):
+        """Return an error message for an unusable input row, or None"""
+        if not isinstance(row, dict):
+            return 'Row must be an object'
+
+        missing = [feature for feature in FEATURES if feature not in row]
+        if missing:
+            return f'Missing required fields: {", ".join(missing)}'
+
+        invalid = [feature for feature in FEATURES
+                   if not isinstance(row[feature], (int, float)) or not np.isfinite(row[feature])]
+        if invalid:
+            return f'Invalid data types for: {", ".join(invalid)}'
+
+        if row['current_CTR'] == 0:
+            return 'current_CTR must be non-zero'
+
+        return None
+
+    def _predict_cpc_array(self, predicted_ctr, current_ctr, current_cpc):
+        """Vectorized version of _predict_cpc"""
+        ctr_improvement = predicted_ctr - current_ctr
+        cpc_adjustment = np.where(ctr_improvement > 0, -ctr_improvement * 100, ctr_improvement * 50)
+        return np.maximum(1, current_cpc + cpc_adjustment)
+
+    def _generate_labels(self, predicted_ctr, current_ctr):
+        """Vectorized version of _generate_label"""
+        improvement = (predicted_ctr - current_ctr) / current_ctr
+        labels = np.select([improvement > 0.1, improvement > 0], ['High', 'Medium'], default='Low')
+        return labels.tolist()
+
+    def _generate_recommendations(self, predicted_ctr, predicted_cpc, current_ctr, current_cpc, engagement_rate):
+        """Vectorized version of _generate_recommendation"""
+        ctr_improvement = predicted_ctr - current_ctr
+        cpc_change = predicted_cpc - current_cpc
+
+        # Each row falls into one of 3 x 3 x 2 combinations, so build the
+        # strings once per combination instead of once per row
+        budget = np.select([ctr_improvement > 0.02, ctr_improvement > 0], [0, 1], default=2)
+        cpc = np.select([cpc_change < -2, cpc_change > 3], [0, 1], default=2)
+        engagement = (engagement_rate < 0.05).astype(np.int64)
+        codes = budget * 6 + cpc * 2 + engagement
+
+        return [RECOMMENDATION_TABLE[code] for code in codes.tolist()]
+
     def _predict_cpc(self, input_data, predicted_ctr):
         """Simple CPC prediction based on CTR and spend efficiency"""
         # Business logic: Better CTR often leads to better CPC due to platform favor
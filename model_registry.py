@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+
+from forest_engine import CompiledForest
+
+MODEL_FILE = 'model.pkl'
+SCALER_FILE = 'scaler.pkl'
+COMPILED_DIR = 'compiled'
+METADATA_FILE = 'metadata.json'
+PIN_FILE = 'PINNED'
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    """Versioned model artifacts on disk.
+
+    Each version lives in its own directory (v0001, v0002, ...) holding the
+    pickled model and scaler, the compiled forest arrays and a metadata.json
+    with metrics, feature list, training time and SHA-256 checksums. A
+    version directory is written under a temporary name and renamed into
+    place, so readers never see a half-written version.
+
+    The active version is the pinned one if a pin is set, otherwise the
+    latest. Pin state is a file in the registry root, so every process
+    serving from the same registry agrees on it.
+    """
+
+    def __init__(self, root='models/registry'):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._watcher = None
+
+    # ----- versions -----
+
+    def versions(self):
+        """Metadata of every registered version, oldest first"""
+        result = []
+        for name in sorted(os.listdir(self.root)):
+            metadata_path = os.path.join(self.root, name, METADATA_FILE)
+            if name.startswith('v') and os.path.exists(metadata_path):
+                with open(metadata_path) as f:
+                    result.append(json.load(f))
+        return result
+
+    def version_names(self):
+        return [
+            name for name in sorted(os.listdir(self.root))
+            if name.startswith('v') and os.path.exists(os.path.join(self.root, name, METADATA_FILE))
+        ]
+
+    def latest_version(self):
+        names = self.version_names()
+        return names[-1] if names else None
+
+    def pinned_version(self):
+        pin_path = os.path.join(self.root, PIN_FILE)
+        if not os.path.exists(pin_path):
+            return None
+        with open(pin_path) as f:
+            return json.load(f).get('version')
+
+    def active_version(self):
+        """The version that should be served: the pin if set, else the latest"""
+        return self.pinned_version() or self.latest_version()
+
+    def metadata(self, version):
+        with open(os.path.join(self.root, version, METADATA_FILE)) as f:
+            return json.load(f)
+
+    # ----- writing -----
+
+    def register(self, model, scaler, compiled=None, metrics=None, features=None,
+                 training_time_seconds=None, source='training'):
+        """Store a fitted model and scaler as a new version and return its name"""
+        import joblib
+        
+        tmp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=self.root)
+        try:
+            joblib.dump(model, os.path.join(tmp_dir, MODEL_FILE))
+            joblib.dump(scaler, os.path.join(tmp_dir, SCALER_FILE))
+            compiled = compiled or CompiledForest.from_sklearn(model, scaler)
+            compiled.save(os.path.join(tmp_dir, COMPILED_DIR))
+
+            metadata = {
+                'created_at': datetime.now().isoformat(),
+                'source': source,
+                'metrics': metrics,
+                'features': features,
+                'training_time_seconds': training_time_seconds,
+                'checksums': self._checksums(tmp_dir)
+            }
+            return self._commit_version(tmp_dir, metadata)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    def import_files(self, model_path, scaler_path, features=None):
+        """Register existing model/scaler pickles (e.g. from before the registry existed)"""
+        import joblib
+        
+        model = joblib.load(model_path)
+        scaler = joblib.load(scaler_path)
+        return self.register(model, scaler, features=features, source=f'import:{model_path}')
+
+    def pin(self, version):
+        """Serve this version until unpinned, even if newer versions are registered"""
+        if version not in self.version_names():
+            raise ValueError(f"Unknown model version: {version}")
+        _write_json_atomic(os.path.join(self.root, PIN_FILE), {
+            'version': version,
+            'pinned_at': datetime.now().isoformat()
+        })
+
+    def unpin(self):
+        """Go back to serving the latest version"""
+        pin_path = os.path.join(self.root, PIN_FILE)
+        if os.path.exists(pin_path):
+            os.remove(pin_path)
+
+    def rollback(self):
+        """Pin the version registered just before the active one and return it"""
+        names = self.version_names()
+        active = self.active_version()
+        if active not in names or names.index(active) == 0:
+            raise ValueError("No earlier model version to roll back to")
+        previous = names[names.index(active) - 1]
+        self.pin(previous)
+        return previous
+
+    # ----- reading -----
+
+    def load(self, version):
+        """Load (compiled, metadata) for a version, verifying checksums
+
+        Only the compiled forest is read here; it is all serving needs and it
+        doesn't require importing sklearn. Use load_sklearn for the pickles.
+        """
+        version_dir = os.path.join(self.root, version)
+        metadata = self.metadata(version)
+
+        if self._checksums(version_dir) != metadata['checksums']:
+            raise ValueError(f"Checksum mismatch for model version {version}")
+
+        compiled = CompiledForest.load(os.path.join(version_dir, COMPILED_DIR), mmap_mode=None)
+        return compiled, metadata
+
+    def load_sklearn(self, version):
+        """Unpickle (model, scaler) for a version"""
+        import joblib
+
+        version_dir = os.path.join(self.root, version)
+        model = joblib.load(os.path.join(version_dir, MODEL_FILE))
+        scaler = joblib.load(os.path.join(version_dir, SCALER_FILE))
+        return model, scaler
+
+    def watch(self, callback, interval=10.0):
+        """Call callback(version) from a daemon thread whenever the active version changes"""
+        if self._watcher is not None:
+            return
+
+        def run():
+            last_seen = self.active_version()
+            stop = self._watcher_stop
+            while not stop.wait(interval):
+                try:
+                    current = self.active_version()
+                    if current != last_seen:
+                        last_seen = current
+                        callback(current)
+                except Exception as e:
+                    print(f"❌ Model registry watch error: {e}")
+
+        self._watcher_stop = threading.Event()
+        self._watcher = threading.Thread(target=run, name='model-registry-watch', daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher_stop.set()
+            self._watcher.join()
+            self._watcher = None
+
+    # ----- internals -----
+
+    def _checksums(self, version_dir):
+        checksums = {}
+        for dirpath, _, filenames in os.walk(version_dir):
+            for filename in filenames:
+                if filename == METADATA_FILE:
+                    continue
+                path = os.path.join(dirpath, filename)
+                checksums[os.path.relpath(path, version_dir)] = _sha256(path)
+        return dict(sorted(checksums.items()))
+
+    def _commit_version(self, tmp_dir, metadata):
+        """Rename a fully written temp dir to the next free version name"""
+        while True:
+            latest = self.latest_version()
+            number = int(latest[1:]) + 1 if latest else 1
+            version = f'v{number:04d}'
+            metadata['version'] = version
+            _write_json_atomic(os.path.join(tmp_dir, METADATA_FILE), metadata)
+            try:
+                os.rename(tmp_dir, os.path.join(self.root, version))
+                return version
+            except OSError:
+                # Another process registered this number first; take the next one
+                if not os.path.exists(os.path.join(self.root, version)):
+                    raise
@@ -0,0 +1,181 @@
+"""bcrypt hashing off the request threads, with a bounded queue.
+
+bcrypt is deliberately slow, and it releases the GIL while it works, so
+hashes run on a small thread pool of their own: at most `workers` hashes
+run at once and at most `max_pending` more wait. The pool bounds how many
+hashes run, not how long a caller waits: the request thread still blocks
+until its hash is done. A request that can't get a place within `timeout`
+seconds gets HashingBusy (the app answers 503), so a burst of logins holds
+request threads for at most that long.
+
+The cost factor is either configured or calibrated on first use to the
+largest cost whose hash takes no more than target_ms on this machine (never
+below MIN_ROUNDS). With a calibration path the result is kept in that file
+and later processes read it instead of timing bcrypt again. Hashes made
+with another cost still verify, and needs_rehash() tells the caller to
+store a fresh one after a good login.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+# OWASP's floor for bcrypt; calibration never goes below it
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+
+
+class HashingBusy(Exception):
+    """The hashing pool stayed full for longer than the queue timeout"""
+
+
+def calibrate_rounds(target_ms=250.0, min_rounds=MIN_ROUNDS, max_rounds=MAX_ROUNDS):
+    """Largest bcrypt cost whose hash takes at most target_ms here (at least min_rounds)
+
+    Each extra round doubles the work, so one timing at min_rounds predicts
+    the rest; the prediction is checked with one hash at the chosen cost.
+    """
+    def hash_ms(rounds):
+        start = time.perf_counter()
+        bcrypt.hashpw(b'calibration', bcrypt.gensalt(rounds))
+        return (time.perf_counter() - start) * 1000
+
+    rounds = min_rounds
+    elapsed = hash_ms(rounds)
+    while rounds < max_rounds and elapsed * 2 <= target_ms:
+        rounds += 1
+        elapsed *= 2
+    if rounds > min_rounds and hash_ms(rounds) > target_ms * 1.5:
+        rounds -= 1
+    return rounds
+
+
+def hash_rounds(password_hash):
+    """Cost factor of a bcrypt hash ('$2b$12$...' -> 12), or None if it isn't one"""
+    parts = password_hash.split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+class PasswordHasher:
+    def __init__(self, rounds=None, target_ms=250.0, workers=2, max_pending=32, timeout=5.0,
+                 calibration_path=None):
+        self._rounds = rounds
+        self.target_ms = target_ms
+        self.calibration_path = calibration_path
+        self._calibration_lock = threading.Lock()
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._lock = threading.Lock()
+        self.workers = workers
+        self.max_pending = max_pending
+        self.hashes = 0
+        self.verifications = 0
+        self.rejected = 0
+        self.rehashes = 0
+        self.completed = 0
+        self.busy_ms = 0.0
+        self.wait_ms = 0.0
+
+    @property
+    def rounds(self):
+        """The bcrypt cost, calibrated the first time it is needed"""
+        if self._rounds is None:
+            with self._calibration_lock:
+                if self._rounds is None:
+                    self._rounds = self._calibrate()
+        return self._rounds
+
+    def _calibrate(self):
+        """Calibrated cost from the calibration file, else measured (and saved there)"""
+        if self.calibration_path:
+            try:
+                with open(self.calibration_path) as f:
+                    saved = json.load(f)
+                if saved['target_ms'] == self.target_ms:
+                    return int(saved['rounds'])
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+
+        rounds = calibrate_rounds(self.target_ms)
+        print(f"🔐 bcrypt cost calibrated to {rounds}")
+        if self.calibration_path:
+            try:
+                temp_path = f'{self.calibration_path}.tmp'
+                with open(temp_path, 'w') as f:
+                    json.dump({'target_ms': self.target_ms, 'rounds': rounds}, f)
+                os.replace(temp_path, self.calibration_path)
+            except OSError as e:
+                print(f"⚠️ Could not save bcrypt calibration: {e}")
+        return rounds
+
+    def _run(self, fn, *args):
+        """Run fn on the pool; raise HashingBusy if no slot frees up within the timeout"""
+        queued = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.rejected += 1
+            raise HashingBusy("Password hashing is overloaded, try again shortly")
+
+        def timed():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self.completed += 1
+                    self.wait_ms += (started - queued) * 1000
+                    self.busy_ms += (finished - started) * 1000
+                self._slots.release()
+
+        # Holding a slot means at most workers + max_pending jobs are ahead
+        return self._executor.submit(timed).result()
+
+    def hash(self, password):
+        with self._lock:
+            self.hashes += 1
+        hashed = self._run(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(self.rounds))
+        return hashed.decode('utf-8')
+
+    def verify(self, password, password_hash):
+        with self._lock:
+            self.verifications += 1
+        try:
+            return self._run(bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+        except ValueError:
+            # Not a bcrypt hash
+            return False
+
+    def needs_rehash(self, password_hash):
+        return hash_rounds(password_hash) != self.rounds
+
+    def rehash(self, password):
+        """hash(), counted as an upgrade of an existing hash"""
+        with self._lock:
+            self.rehashes += 1
+        return self.hash(password)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def stats(self):
+        with self._lock:
+            completed = self.completed
+            return {
+                # None until the first hash calibrates it
+                'rounds': self._rounds,
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'hashes': self.hashes,
+                'verifications': self.verifications,
+                'rehashes': self.rehashes,
+                'rejected': self.rejected,
+                'avg_hash_ms': round(self.busy_ms / completed, 2) if completed else 0.0,
+                'avg_wait_ms': round(self.wait_ms / completed, 2) if completed else 0.0
+            }
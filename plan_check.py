@@ -0,0 +1,114 @@
+"""Query-plan regression check for the dashboard queries.
+
+Seeds the configured database if campaign_metrics is small, then runs
+EXPLAIN on every hot query in db.py and fails if any of them scans a whole
+table or index, or needs a filesort. Run it against a disposable database
+after schema or query changes:
+
+    python plan_check.py [--min-rows N] [--users N] [--days N] [--campaigns N]
+"""
+import argparse
+from datetime import datetime, timedelta
+
+import db as database_module
+from migrations import run_migrations
+from seeding import seed_sample_data
+
+# (name, query, table, params builder taking (user_id, start_date, end_date))
+HOT_QUERIES = [
+    ('get_user_metrics', database_module.USER_METRICS_QUERY, 'campaign_daily_rollup',
+     lambda user_id, start, end: (user_id, start, end)),
+    ('get_campaign_metrics', database_module.CAMPAIGN_METRICS_QUERY, 'campaign_daily_rollup',
+     lambda user_id, start, end: (user_id, start, end)),
+    ('get_campaign_metrics(platform)', database_module.CAMPAIGN_METRICS_BY_PLATFORM_QUERY, 'campaign_daily_rollup',
+     lambda user_id, start, end: (user_id, start, end, 'Google Ads')),
+    ('get_recent_campaigns', database_module.RECENT_CAMPAIGN_ROWS_QUERY, 'campaign_daily_rollup',
+     lambda user_id, start, end: (user_id, 40)),
+    ('get_user_recommendations', database_module.USER_RECOMMENDATIONS_QUERY, 'recommendations',
+     lambda user_id, start, end: (user_id, 10)),
+    ('get_prediction_history', database_module.PREDICTION_HISTORY_QUERY, 'prediction_history',
+     lambda user_id, start, end: (user_id, 5)),
+    ('get_optimization_history', database_module.OPTIMIZATION_HISTORY_QUERY, 'optimization_history',
+     lambda user_id, start, end: (user_id, 5)),
+    # A page past the first one: keyset pagination should stay a range read
+    ('list_users(created_at)', database_module.USER_LIST_QUERY.format(
+        where='WHERE (created_at > %s OR (created_at = %s AND id > %s))', order='created_at ASC, id ASC'
+     ), 'users',
+     lambda user_id, start, end: (start, start, 0, 51)),
+]
+
+# Below this many rows the optimizer may rightly prefer a scan; don't judge those plans
+MIN_TABLE_ROWS = 1000
+
+
+def plan_problems(plan_rows):
+    """Why a plan is unacceptable, as a list of strings (empty if it's fine)"""
+    problems = []
+    for row in plan_rows:
+        table = row.get('table')
+        access = row.get('type')
+        extra = row.get('Extra') or ''
+        if access == 'ALL':
+            problems.append(f"full table scan of {table}")
+        elif access == 'index':
+            problems.append(f"full index scan of {table}")
+        if 'Using filesort' in extra:
+            problems.append(f"filesort on {table}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN the hot dashboard queries")
+    parser.add_argument('--min-rows', type=int, default=100000,
+                        help="seed until campaign_metrics has at least this many rows")
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--campaigns', type=int, default=3)
+    args = parser.parse_args()
+
+    db = database_module.get_db()
+    run_migrations(db)
+
+    count = db.fetch_one("SELECT COUNT(*) AS count FROM campaign_metrics")['count']
+    if count < args.min_rows:
+        print(f"🔄 campaign_metrics has {count} rows; seeding...")
+        seed_sample_data(db, users=args.users, days=args.days, campaigns=args.campaigns)
+
+    tables = sorted({table for _, _, table, _ in HOT_QUERIES})
+    for table in tables:
+        db.fetch_all(f"ANALYZE TABLE {table}")
+    sizes = {
+        table: db.fetch_one(f"SELECT COUNT(*) AS count FROM {table}")['count']
+        for table in tables
+    }
+
+    user_id = db.fetch_one("SELECT id FROM users ORDER BY id LIMIT 1")['id']
+    end_date = datetime.now().date()
+    start_date = end_date - timedelta(days=30)
+
+    failures = 0
+    for name, query, table, params in HOT_QUERIES:
+        if sizes[table] < MIN_TABLE_ROWS:
+            print(f"⚠️ {name}: skipped, {table} has only {sizes[table]} rows")
+            continue
+
+        plan = db.fetch_all("EXPLAIN " + query, params(user_id, start_date, end_date))
+        problems = plan_problems(plan) if plan else ["EXPLAIN failed"]
+        for row in plan:
+            print(f"   {name:<32} {row.get('table')!s:<22} {row.get('type')!s:<7} "
+                  f"{row.get('key')!s:<40} rows={row.get('rows')} {row.get('Extra') or ''}")
+        if problems:
+            failures += 1
+            print(f"❌ {name}: {', '.join(problems)}")
+        else:
+            print(f"✅ {name}")
+
+    if failures:
+        print(f"❌ {failures} of {len(HOT_QUERIES)} queries have regressed plans")
+        return 1
+    print("✅ All checked query plans use indexes without filesort")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
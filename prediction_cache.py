@@ -0,0 +1,86 @@
+import threading
+from collections import OrderedDict
+
+# Default quantization step per feature. Inputs that fall into the same
+# bucket on every feature share one cached prediction.
+DEFAULT_QUANTIZATION = {
+    'impressions': 1,
+    'spend': 0.01,
+    'current_CTR': 0.00001,
+    'current_CPC': 0.01,
+    'engagement_rate': 0.00001,
+}
+
+
+class PredictionCache:
+    """Bounded, thread-safe LRU cache of prediction results keyed by quantized features"""
+
+    def __init__(self, max_size=10000, quantization=None):
+        self.max_size = max_size
+        self.quantization = dict(DEFAULT_QUANTIZATION)
+        if quantization:
+            self.quantization.update(quantization)
+        self._features = list(self.quantization)
+        self._steps = [self.quantization[feature] for feature in self._features]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped by clear(); results computed before a clear are not stored
+        self.generation = 0
+
+    def make_key(self, input_data):
+        """Quantize the input features into a hashable cache key"""
+        return tuple(
+            round(input_data[feature] / step)
+            for feature, step in zip(self._features, self._steps)
+        )
+
+    def get(self, key):
+        """Return a copy of the cached result, or None on a miss"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return dict(result)
+
+    def put(self, key, result, generation=None):
+        """Store a result, evicting the least recently used entry when full
+
+        Pass the generation read before computing the result; if the cache
+        was cleared in the meantime the stale result is dropped.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = dict(result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry, e.g. after the underlying model is replaced"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+            self.generation += 1
+
+    def stats(self):
+        """Counters for monitoring the hit rate"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,260 @@
+"""Compact per-user prediction history for the in-memory backend.
+
+Each user's predictions live in a ring buffer of fixed-width numpy
+records with typed fields (timestamp, the five model features, predicted
+CTR/CPC and codes for the label and recommendation strings): 60 bytes a
+record instead of a dict of dicts. A field across records is a column
+view, and a page of history is one slice. Buffers start small and double
+up to the capacity.
+
+When a ring is full the oldest records are either dropped or, with a
+spill directory, appended to that user's on-disk segment, which is read
+back through np.memmap. Records are numbered in arrival order, so reads
+are slices of the segment and the ring. Segments live only as long as the
+process (the strings table they refer to is in memory); the durable
+history is MySQL's.
+"""
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from ml_model import FEATURES
+
+RECORD_DTYPE = np.dtype(
+    [('created_at', 'f8')]
+    + [(feature, 'f8') for feature in FEATURES]
+    + [('predicted_CTR', 'f4'), ('predicted_CPC', 'f4'), ('label', 'u2'), ('recommendation', 'u2')]
+)
+
+# Decimals the model rounds its outputs to; float32 storage is undone by this
+OUTPUT_DECIMALS = {'predicted_CTR': 4, 'predicted_CPC': 2}
+
+_INITIAL_ROWS = 64
+
+
+class _Ring:
+    """One user's records: a spilled prefix on disk, then a ring in memory"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buffer = np.zeros(min(capacity, _INITIAL_ROWS), dtype=RECORD_DTYPE)
+        self.start = 0      # slot of the oldest record in the ring
+        self.size = 0       # records in the ring
+        self.total = 0      # records ever appended (the next sequence number)
+        self.spilled = 0    # records in the on-disk segment
+        self.segment_path = None
+        self._segment = None
+
+    def _grow(self):
+        rows = min(self.capacity, len(self.buffer) * 2)
+        grown = np.zeros(rows, dtype=RECORD_DTYPE)
+        grown[:self.size] = self.ordered(0, self.size)
+        self.buffer = grown
+        self.start = 0
+
+    def ordered(self, first, last):
+        """Ring records first..last-1 (0 = oldest in the ring) as one array"""
+        rows = len(self.buffer)
+        begin = (self.start + first) % rows
+        end = begin + (last - first)
+        if end <= rows:
+            return self.buffer[begin:end]
+        return np.concatenate([self.buffer[begin:], self.buffer[:end - rows]])
+
+    def evict(self, count):
+        """Remove and return the oldest count records"""
+        evicted = self.ordered(0, count).copy()
+        self.start = (self.start + count) % len(self.buffer)
+        self.size -= count
+        return evicted
+
+    def append(self, record):
+        if self.size == len(self.buffer):
+            self._grow()
+        self.buffer[(self.start + self.size) % len(self.buffer)] = record
+        self.size += 1
+        self.total += 1
+
+    def segment(self):
+        """Memory map of the spilled records, reopened only when it has grown"""
+        if self._segment is None or len(self._segment) != self.spilled:
+            self._segment = np.memmap(self.segment_path, dtype=RECORD_DTYPE, mode='r', shape=(self.spilled,))
+        return self._segment
+
+
+class PredictionHistory:
+    """Per-user ring buffers of predictions, optionally spilling to disk
+
+    capacity is the number of records kept in memory per user. With a
+    spill_dir, the oldest spill_batch records of a full ring are written to
+    disk together; without one they are dropped.
+    """
+
+    def __init__(self, capacity=10000, spill_dir=None, spill_batch=None):
+        self.capacity = max(1, capacity)
+        self.spill_batch = max(1, min(spill_batch or self.capacity // 4, self.capacity))
+        self.spill_dir = tempfile.mkdtemp(prefix='prediction-history-', dir=spill_dir) if spill_dir else None
+        self._rings = {}
+        self._strings = []
+        self._string_codes = {}
+        self._lock = threading.Lock()
+        self._segments = 0
+        self.recorded = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def _code(self, text):
+        """Small integer for a label or recommendation string (caller holds the lock)"""
+        code = self._string_codes.get(text)
+        if code is None:
+            code = len(self._strings)
+            if code > np.iinfo(RECORD_DTYPE['label']).max:
+                raise ValueError("Too many distinct label/recommendation strings")
+            self._strings.append(text)
+            self._string_codes[text] = code
+        return code
+
+    def _record(self, input_data, prediction_result, created_at):
+        return (
+            (created_at or datetime.now()).timestamp(),
+            *(float(input_data[feature]) for feature in FEATURES),
+            prediction_result['predicted_CTR'],
+            prediction_result['predicted_CPC'],
+            self._code(prediction_result.get('label', '')),
+            self._code(prediction_result.get('recommendation', ''))
+        )
+
+    def append(self, user_id, input_data, prediction_result, created_at=None):
+        self.extend([(user_id, input_data, prediction_result, created_at)])
+
+    def extend(self, records):
+        """Add (user_id, input_data, prediction_result, created_at) tuples"""
+        with self._lock:
+            for user_id, input_data, prediction_result, created_at in records:
+                try:
+                    record = self._record(input_data, prediction_result, created_at)
+                except (KeyError, TypeError, ValueError) as e:
+                    # One malformed record must not fail (and re-send) a whole batch
+                    self.rejected += 1
+                    print(f"⚠️ Skipping prediction history record: {e}")
+                    continue
+                ring = self._rings.get(user_id)
+                if ring is None:
+                    ring = self._rings[user_id] = _Ring(self.capacity)
+                if ring.size == ring.capacity:
+                    self._make_room(ring)
+                ring.append(record)
+                self.recorded += 1
+
+    def _make_room(self, ring):
+        evicted = ring.evict(self.spill_batch)
+        if self.spill_dir is None:
+            self.dropped += len(evicted)
+            return
+        if ring.segment_path is None:
+            self._segments += 1
+            ring.segment_path = os.path.join(self.spill_dir, f'{self._segments}.bin')
+        with open(ring.segment_path, 'ab') as f:
+            f.write(evicted.tobytes())
+        ring.spilled += len(evicted)
+
+    def records(self, user_id, limit=None):
+        """The newest limit records (default: all in memory) as a structured array, oldest first"""
+        with self._lock:
+            ring = self._rings.get(user_id)
+            if ring is None:
+                return np.zeros(0, dtype=RECORD_DTYPE)
+            count = ring.size if limit is None else min(limit, ring.size)
+            return ring.ordered(ring.size - count, ring.size).copy()
+
+    def iter_records(self, user_id, page_size=1000):
+        """Every stored record of a user, oldest first, as dicts; pages are array slices
+
+        Records appended while iterating are included; records dropped from
+        a full ring before they are reached are skipped.
+        """
+        position = 0
+        while True:
+            with self._lock:
+                ring = self._rings.get(user_id)
+                if ring is None:
+                    return
+                first_in_ring = ring.total - ring.size
+                if position < ring.spilled:
+                    page = np.array(ring.segment()[position:min(position + page_size, ring.spilled)])
+                else:
+                    position = max(position, first_in_ring)
+                    first = position - first_in_ring
+                    page = ring.ordered(first, min(first + page_size, ring.size)).copy()
+                strings = self._strings
+            if not len(page):
+                return
+            position += len(page)
+            yield from self._to_dicts(page, strings)
+
+    def recent(self, user_id, limit=5):
+        """The newest limit records as dicts, newest first"""
+        return list(reversed(list(self._to_dicts(self.records(user_id, limit), self._strings))))
+
+    @staticmethod
+    def _to_dicts(page, strings):
+        created_at = page['created_at'].tolist()
+        features = {feature: page[feature].tolist() for feature in FEATURES}
+        outputs = {name: np.round(page[name].astype(np.float64), decimals).tolist()
+                   for name, decimals in OUTPUT_DECIMALS.items()}
+        labels = page['label'].tolist()
+        recommendations = page['recommendation'].tolist()
+        for i in range(len(page)):
+            yield {
+                'input_data': {feature: features[feature][i] for feature in FEATURES},
+                'prediction_result': {
+                    'status': 'success',
+                    'predicted_CTR': outputs['predicted_CTR'][i],
+                    'predicted_CPC': outputs['predicted_CPC'][i],
+                    'label': strings[labels[i]],
+                    'recommendation': strings[recommendations[i]]
+                },
+                'created_at': datetime.fromtimestamp(created_at[i]).isoformat()
+            }
+
+    def drop_user(self, user_id):
+        with self._lock:
+            ring = self._rings.pop(user_id, None)
+        if ring is not None and ring.segment_path is not None:
+            ring._segment = None
+            try:
+                os.remove(ring.segment_path)
+            except OSError:
+                pass
+
+    def count(self, user_id):
+        """Records available for a user (in memory plus spilled)"""
+        with self._lock:
+            ring = self._rings.get(user_id)
+            return ring.spilled + ring.size if ring is not None else 0
+
+    def close(self):
+        """Remove the spill segments"""
+        if self.spill_dir is not None:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            in_memory = sum(ring.size for ring in self._rings.values())
+            allocated = sum(len(ring.buffer) for ring in self._rings.values())
+            return {
+                'users': len(self._rings),
+                'recorded': self.recorded,
+                'in_memory': in_memory,
+                'spilled': sum(ring.spilled for ring in self._rings.values()),
+                'dropped': self.dropped,
+                'rejected': self.rejected,
+                'capacity_per_user': self.capacity,
+                'bytes_per_record': RECORD_DTYPE.itemsize,
+                'memory_bytes': allocated * RECORD_DTYPE.itemsize,
+                'distinct_strings': len(self._strings)
+            }
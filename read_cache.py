@@ -0,0 +1,243 @@
+"""Per-user read-through cache for dashboard queries.
+
+Entries are keyed by (user_id, name, args) and expire after a TTL. Writes
+for a user drop every entry of that user. User ids are keyed as strings,
+so 7 and '7' (a JWT identity) share entries. Two backends share one
+interface:
+
+- TTLCache: in-process, bounded LRU. Each worker process has its own, so
+  another worker's write is only seen there after the TTL.
+- RedisCache: one cache shared by every worker (needs the redis package).
+  Each user's entries live in one Redis hash, so invalidation is one DEL.
+  Values are stored as JSON, never pickled: whoever can write to Redis
+  must not be able to run code in the app.
+"""
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+
+class TTLCache:
+    """Bounded, thread-safe in-memory cache with per-entry expiry"""
+
+    def __init__(self, ttl=30.0, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # (str(user_id), name, args) -> (expires_at, value)
+        self._by_user = {}             # str(user_id) -> set of keys
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        # Bumped by every invalidation; values read before one are not stored
+        self.generation = 0
+
+    def get(self, user_id, name, args=()):
+        """(True, value) on a hit, (False, None) on a miss or expired entry"""
+        key = (str(user_id), name, args)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = entry[1]
+        # Callers get their own copy, as they would from a shared backend
+        return True, copy.deepcopy(value)
+
+    def set(self, user_id, name, args, value, generation=None):
+        """Store a value; pass the generation read before querying it"""
+        key = (str(user_id), name, args)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            self._by_user.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, user_id):
+        """Drop every cached entry for a user"""
+        with self._lock:
+            for key in self._by_user.pop(str(user_id), ()):
+                self._entries.pop(key, None)
+            self.invalidations += 1
+            self.generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+            self.invalidations += 1
+            self.generation += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'memory',
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def _remove(self, key):
+        """Drop one entry (caller holds the lock)"""
+        del self._entries[key]
+        keys = self._by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[key[0]]
+
+
+# Query results hold dates and Decimals, which JSON has no type for; they
+# are tagged so a hit returns the same types as the query did
+_JSON_TYPES = {'__datetime__': datetime.fromisoformat, '__date__': date.fromisoformat, '__decimal__': Decimal}
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'__decimal__': str(value)}
+    raise TypeError(f"Can't cache a {type(value).__name__}")
+
+
+def _decode_value(obj):
+    if len(obj) == 1:
+        tag, text = next(iter(obj.items()))
+        if tag in _JSON_TYPES:
+            return _JSON_TYPES[tag](text)
+    return obj
+
+
+class RedisCache:
+    """The same cache kept in Redis, shared by every worker process
+
+    Each user's entries are fields of one hash whose expiry is pushed out
+    on every write; each field also carries its own deadline. Size is
+    bounded by Redis itself (maxmemory with an eviction policy). If Redis is
+    unreachable, lookups count as misses and the database is queried.
+    """
+
+    def __init__(self, url, ttl=30.0, prefix='adopt:read-cache'):
+        import redis
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.invalidations = 0
+        # Writes from other workers can't be tracked locally; the TTL bounds staleness
+        self.generation = None
+
+    def get(self, user_id, name, args=()):
+        try:
+            raw = self._redis.hget(self._user_key(user_id), repr((name, args)))
+        except Exception as e:
+            self._count('errors')
+            self._count('misses')
+            print(f"⚠️ Read cache unavailable: {e}")
+            return False, None
+        if raw is not None:
+            try:
+                expires_at, value = json.loads(raw, object_hook=_decode_value)
+                fresh = expires_at > time.time()
+            except (ValueError, TypeError, KeyError, ArithmeticError) as e:
+                # Corrupt or written by something else: a miss, and gone for the next reader
+                print(f"⚠️ Dropping unreadable read cache entry {name}: {e}")
+                self._count('errors')
+                self._drop_field(user_id, name, args)
+                fresh = False
+            if fresh:
+                self._count('hits')
+                return True, value
+        self._count('misses')
+        return False, None
+
+    def set(self, user_id, name, args, value, generation=None):
+        user_key = self._user_key(user_id)
+        try:
+            pipeline = self._redis.pipeline()
+            pipeline.hset(user_key, repr((name, args)), json.dumps([time.time() + self.ttl, value], default=_encode_value))
+            pipeline.expire(user_key, max(1, int(self.ttl)))
+            pipeline.execute()
+        except Exception as e:
+            self._count('errors')
+            print(f"⚠️ Read cache unavailable: {e}")
+
+    def invalidate_user(self, user_id):
+        try:
+            self._redis.delete(self._user_key(user_id))
+            self._count('invalidations')
+        except Exception as e:
+            self._count('errors')
+            print(f"⚠️ Could not invalidate read cache for user {user_id}: {e}")
+
+    def clear(self):
+        try:
+            for key in self._redis.scan_iter(match=f'{self.prefix}:*'):
+                self._redis.delete(key)
+            self._count('invalidations')
+        except Exception as e:
+            self._count('errors')
+            print(f"⚠️ Could not clear read cache: {e}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'redis',
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'errors': self.errors,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def _drop_field(self, user_id, name, args):
+        try:
+            self._redis.hdel(self._user_key(user_id), repr((name, args)))
+        except Exception as e:
+            self._count('errors')
+            print(f"⚠️ Read cache unavailable: {e}")
+
+    def _user_key(self, user_id):
+        return f'{self.prefix}:user:{user_id}'
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+def create_read_cache(ttl, max_size=10000, redis_url=None):
+    """The configured cache backend: Redis if a URL is given, else in-memory"""
+    if redis_url:
+        return RedisCache(redis_url, ttl=ttl)
+    return TTLCache(ttl=ttl, max_size=max_size)
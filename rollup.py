@@ -0,0 +1,53 @@
+"""Daily rollup of campaign_metrics.
+
+campaign_daily_rollup holds one row per (user, day, platform, campaign) with
+the summed counters, keyed so a user's date range is one primary-key range.
+Writers to campaign_metrics upsert the same totals here in the same
+transaction; dashboard aggregates read only the rollup. Weekly and monthly
+views group these daily rows, which is already O(days x campaigns).
+"""
+
+ROLLUP_UPSERT = '''
+    INSERT INTO campaign_daily_rollup
+    (user_id, day, platform, campaign_name, impressions, clicks, spend, conversions)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        impressions = impressions + VALUES(impressions),
+        clicks = clicks + VALUES(clicks),
+        spend = spend + VALUES(spend),
+        conversions = conversions + VALUES(conversions)
+'''
+
+# Recompute from the raw rows; user_filter is '' or 'WHERE user_id = %s'
+ROLLUP_DELETE = 'DELETE FROM campaign_daily_rollup {user_filter}'
+ROLLUP_REBUILD = '''
+    INSERT INTO campaign_daily_rollup
+    (user_id, day, platform, campaign_name, impressions, clicks, spend, conversions)
+    SELECT user_id, date, platform, campaign_name,
+           SUM(impressions), SUM(clicks), SUM(spend), SUM(conversions)
+    FROM campaign_metrics
+    {user_filter}
+    GROUP BY user_id, date, platform, campaign_name
+'''
+
+
+def rollup_rows(rows):
+    """Collapse campaign_metrics rows into ROLLUP_UPSERT parameter tuples
+
+    rows are (user_id, date, impressions, clicks, spend, conversions,
+    platform, campaign_name), the column order campaign_metrics is inserted in.
+    """
+    totals = {}
+    for user_id, day, impressions, clicks, spend, conversions, platform, campaign_name in rows:
+        key = (user_id, day, platform, campaign_name)
+        values = (int(impressions), int(clicks), float(spend), int(conversions))
+        entry = totals.get(key)
+        if entry is None:
+            totals[key] = list(values)
+        else:
+            for i, value in enumerate(values):
+                entry[i] += value
+    return [
+        key + (impressions, clicks, round(spend, 2), conversions)
+        for key, (impressions, clicks, spend, conversions) in totals.items()
+    ]
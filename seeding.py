@@ -0,0 +1,214 @@
+"""Bulk sample data for development and load-test databases.
+
+Rows are generated with numpy a user at a time and written with multi-row
+INSERTs inside a single transaction, so seeding millions of campaign_metrics
+rows costs a few round trips per batch instead of one commit per row. The
+daily rollup is upserted alongside, in the same transaction.
+
+Usage:
+    python seeding.py [--users N] [--days N] [--platforms N] [--campaigns N] [--force]
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from migrations import USER_COUNT_ADJUST
+from rollup import ROLLUP_UPSERT, rollup_rows
+
+PLATFORMS = ['Google Ads', 'Facebook Ads', 'Instagram Ads', 'LinkedIn Ads']
+
+SAMPLE_USERS = [
+    ('john_doe', 'john@example.com', 'password123'),
+    ('jane_smith', 'jane@example.com', 'password123'),
+    ('demo_user', 'demo@example.com', 'demo123')
+]
+
+SAMPLE_RECOMMENDATIONS = [
+    ("Google Ads Campaign", "Increase budget by 15% for better performance", 0.85),
+    ("Facebook Prospecting", "Test new ad creatives to improve CTR", 0.72),
+    ("Instagram Story Ads", "Reallocate budget to top-performing segments", 0.91)
+]
+
+INSERT_METRICS = '''
+    INSERT INTO campaign_metrics
+    (user_id, date, impressions, clicks, spend, conversions, platform, campaign_name)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+'''
+
+INSERT_RECOMMENDATION = '''
+    INSERT INTO recommendations (user_id, campaign_name, recommendation_text, confidence_score)
+    VALUES (%s, %s, %s, %s)
+'''
+
+
+def _sample_accounts(n_users):
+    """(username, email, password) for the demo users plus generated load-test users"""
+    accounts = list(SAMPLE_USERS)
+    accounts += [
+        (f'load_user_{n}', f'load_user_{n}@example.com', 'password123')
+        for n in range(len(accounts) + 1, n_users + 1)
+    ]
+    return accounts[:n_users]
+
+
+def _hash_accounts(accounts, hash_password):
+    """(username, email, password_hash) rows; bcrypt is deliberately slow, so equal passwords share a hash"""
+    hashes = {}
+    rows = []
+    for username, email, password in accounts:
+        if password not in hashes:
+            hashes[password] = hash_password(password)
+        rows.append((username, email, hashes[password]))
+    return rows
+
+
+def generate_campaign_rows(user_id, days, platforms, campaigns, rng, today=None):
+    """campaign_metrics rows for one user, generated as arrays
+
+    With campaigns=None each platform gets one campaign per day (the
+    original sample layout); otherwise each platform runs that many
+    campaigns every day.
+    """
+    today = today or date.today()
+    per_day = len(platforms) * (campaigns or 1)
+    n = days * per_day
+
+    day_index = np.repeat(np.arange(days), per_day)
+    platform_index = np.tile(np.repeat(np.arange(len(platforms)), campaigns or 1), days)
+    if campaigns:
+        campaign_number = np.tile(np.arange(campaigns), days * len(platforms)) + 1
+    else:
+        campaign_number = day_index + 1
+
+    impressions = rng.integers(1000, 50001, n)
+    clicks = (impressions * rng.uniform(0.01, 0.08, n)).astype(np.int64)   # 1-8% CTR
+    spend = np.round(clicks * rng.uniform(5, 25, n), 2)                    # $5-25 CPC
+    conversions = (clicks * rng.uniform(0.02, 0.15, n)).astype(np.int64)  # 2-15% conversion rate
+
+    dates = [today - timedelta(days=days - i) for i in range(days)]
+    platform_names = [platform.replace(' ', '_') for platform in platforms]
+
+    return list(zip(
+        [user_id] * n,
+        [dates[i] for i in day_index.tolist()],
+        impressions.tolist(),
+        clicks.tolist(),
+        spend.tolist(),
+        conversions.tolist(),
+        [platforms[i] for i in platform_index.tolist()],
+        [f"{platform_names[p]}_Campaign_{c}" for p, c in zip(platform_index.tolist(), campaign_number.tolist())]
+    ))
+
+
+def seed_sample_data(db, users=3, days=90, platforms=None, campaigns=None, batch_size=5000, seed=None):
+    """Insert sample users, campaign metrics and recommendations in one transaction
+
+    Only sample accounts that don't exist yet are created and given
+    campaign data, so other users are never touched and running it again
+    adds nothing twice. Returns counts of what was written; sample
+    accounts that already existed are counted as skipped.
+    """
+    platforms = platforms or PLATFORMS
+    rng = np.random.default_rng(seed)
+    counts = {'users': 0, 'users_skipped': 0, 'campaign_metrics': 0, 'recommendations': 0}
+
+    accounts = _sample_accounts(users)
+    existing = set()
+    for start in range(0, len(accounts), batch_size):
+        emails = [email for _, email, _ in accounts[start:start + batch_size]]
+        rows = db.fetch_all(
+            f"SELECT email FROM users WHERE email IN ({', '.join(['%s'] * len(emails))})", tuple(emails)
+        )
+        existing.update(row['email'] for row in rows)
+    accounts = [account for account in accounts if account[1] not in existing]
+    # Hash before the transaction opens, so bcrypt never runs while it holds locks
+    user_rows = _hash_accounts(accounts, db.hash_password)
+    counts['users_skipped'] = len(existing)
+
+    with db.transaction() as cursor:
+        if user_rows:
+            cursor.executemany(
+                "INSERT IGNORE INTO users (username, email, password_hash) VALUES (%s, %s, %s)",
+                user_rows
+            )
+            # IGNORE skips accounts another process created meanwhile
+            counts['users'] = cursor.rowcount
+            counts['users_skipped'] += len(user_rows) - cursor.rowcount
+            cursor.execute(USER_COUNT_ADJUST, (cursor.rowcount,))
+
+        # bcrypt salts every hash, so the hashes made above mark exactly the
+        # rows this run inserted: an account another process created in the
+        # meantime (skipped by IGNORE) has a hash of its own and gets no data
+        run_hashes = sorted({password_hash for _, _, password_hash in user_rows})
+        user_ids = []
+        for start in range(0, len(user_rows), batch_size):
+            emails = [email for _, email, _ in user_rows[start:start + batch_size]]
+            cursor.execute(
+                f"SELECT id FROM users WHERE email IN ({', '.join(['%s'] * len(emails))}) "
+                f"AND password_hash IN ({', '.join(['%s'] * len(run_hashes))}) ORDER BY id",
+                emails + run_hashes
+            )
+            user_ids += [row['id'] for row in cursor.fetchall()]
+
+        pending = []
+        for position, user_id in enumerate(user_ids):
+            pending += generate_campaign_rows(user_id, days, platforms, campaigns, rng)
+            if len(pending) >= batch_size or position == len(user_ids) - 1:
+                # executemany turns each slice into one multi-row INSERT
+                rollup = rollup_rows(pending)
+                for start in range(0, len(pending), batch_size):
+                    cursor.executemany(INSERT_METRICS, pending[start:start + batch_size])
+                for start in range(0, len(rollup), batch_size):
+                    cursor.executemany(ROLLUP_UPSERT, rollup[start:start + batch_size])
+                counts['campaign_metrics'] += len(pending)
+                pending = []
+
+        recommendations = [
+            (user_id, campaign, recommendation, confidence)
+            for user_id in user_ids
+            for campaign, recommendation, confidence in SAMPLE_RECOMMENDATIONS
+        ]
+        for start in range(0, len(recommendations), batch_size):
+            cursor.executemany(INSERT_RECOMMENDATION, recommendations[start:start + batch_size])
+        counts['recommendations'] = len(recommendations)
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the database with sample campaign data")
+    parser.add_argument('--users', type=int, default=3)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--platforms', type=int, default=len(PLATFORMS),
+                        help=f"how many of {', '.join(PLATFORMS)} to use")
+    parser.add_argument('--campaigns', type=int, default=None,
+                        help="campaigns per platform running every day (default: one per day)")
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help="seed the sample accounts even if other users exist")
+    args = parser.parse_args()
+
+    from db import get_db
+    db = get_db()
+    existing = db.fetch_one("SELECT COUNT(*) as count FROM users")
+    if existing and existing['count'] > 0 and not args.force:
+        print("⚠️ Database already has users; pass --force to add the sample accounts anyway")
+        return 1
+
+    start = time.perf_counter()
+    counts = seed_sample_data(
+        db, users=args.users, days=args.days, platforms=PLATFORMS[:args.platforms],
+        campaigns=args.campaigns, batch_size=args.batch_size, seed=args.seed
+    )
+    elapsed = time.perf_counter() - start
+    print(f"✅ Seeded {counts['users']} users ({counts['users_skipped']} already existed), "
+          f"{counts['campaign_metrics']} campaign rows and "
+          f"{counts['recommendations']} recommendations in {elapsed:.1f}s "
+          f"({counts['campaign_metrics'] / elapsed:.0f} rows/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
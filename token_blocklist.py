@@ -0,0 +1,226 @@
+"""Revoked JWTs, checked on every @jwt_required() request.
+
+Logging out puts the token's jti here until the token would have expired
+anyway, so the set only ever holds tokens that are still live. The check
+is one dict lookup in this process, with no database round trip.
+
+With a snapshot path, each revocation is also appended to a small binary
+file (a UUID jti takes 21 bytes) that is read back on startup, so a token
+revoked before a restart stays revoked after it. The file is rewritten
+without its expired entries once they make up more than half of it, and
+on load if it has any.
+
+Several worker processes (gunicorn -w N) can share one snapshot path.
+Appends and rewrites take an exclusive flock on a `.lock` file next to it,
+and a rewrite first reads back what the other workers appended, so none
+of their revocations are lost. Each check also stats the file and reads
+any records appended since, so a logout handled by one worker is seen by
+all of them. That costs one stat() per check and relies on fcntl: where it
+is missing (Windows), run a single worker per snapshot path.
+"""
+import heapq
+import os
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; one process per snapshot path there
+    fcntl = None
+
+# expires_at (unix seconds), jti length (0 = a UUID stored as 16 bytes)
+_RECORD_HEADER = struct.Struct('<IB')
+
+
+def _encode_jti(jti):
+    # A canonical UUID (what flask_jwt_extended issues) packs into 16 bytes
+    if len(jti) == 36 and jti[8] == jti[13] == jti[18] == jti[23] == '-':
+        try:
+            raw = bytes.fromhex(jti.replace('-', ''))
+        except ValueError:
+            raw = None
+        if raw is not None and _decode_uuid(raw) == jti:
+            return 0, raw
+    data = jti.encode('utf-8')
+    if not 0 < len(data) <= 255:
+        raise ValueError("jti must be 1-255 bytes")
+    return len(data), data
+
+
+def _decode_uuid(raw):
+    """str(uuid.UUID(bytes=raw)), without building the UUID"""
+    h = raw.hex()
+    return f'{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}'
+
+
+class TokenBlocklist:
+    """Revoked token ids with their expiry times
+
+    default_ttl (seconds) is used for tokens without an exp claim, and it
+    should match JWT_ACCESS_TOKEN_EXPIRES.
+    """
+
+    def __init__(self, default_ttl, snapshot_path=None):
+        self.default_ttl = default_ttl
+        self.snapshot_path = snapshot_path
+        self._expiry = {}   # jti -> expires_at
+        self._heap = []     # (expires_at, jti), soonest first
+        self._lock = threading.Lock()
+        # Records in the file, and how far into which file (device, inode) we have read
+        self._file_records = 0
+        self._file_id = None
+        self._file_offset = 0
+        self._lock_file = None
+        self.revoked = 0
+        self.expired = 0
+        if snapshot_path:
+            if fcntl is not None:
+                self._lock_file = open(f'{snapshot_path}.lock', 'a')
+            self._load()
+
+    def is_revoked(self, jti):
+        if self.snapshot_path and self._file_changed():
+            with self._lock, self._file_lock(exclusive=False):
+                self._read_file()
+        expires_at = self._expiry.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def revoke(self, jti, expires_at=None):
+        """Block jti until expires_at (unix seconds; default now + default_ttl)"""
+        now = time.time()
+        expires_at = int(expires_at or now + self.default_ttl)
+        if expires_at <= now:
+            return False
+        record = self._record(jti, expires_at)
+        with self._lock:
+            if jti in self._expiry:
+                return False
+            self._add(jti, expires_at)
+            self.revoked += 1
+            if self.snapshot_path:
+                with self._file_lock(exclusive=True):
+                    with open(self.snapshot_path, 'ab') as f:
+                        f.write(record)
+                    # Our own record comes back here and is skipped as known
+                    self._read_file()
+            self._purge(now)
+        return True
+
+    def _add(self, jti, expires_at):
+        """Track a revocation (caller holds the lock)"""
+        self._expiry[jti] = expires_at
+        heapq.heappush(self._heap, (expires_at, jti))
+
+    def _purge(self, now):
+        """Forget expired entries (caller holds the lock)"""
+        while self._heap and self._heap[0][0] <= now:
+            _, jti = heapq.heappop(self._heap)
+            del self._expiry[jti]
+            self.expired += 1
+        if self.snapshot_path and self._file_records > 2 * max(len(self._expiry), 512):
+            with self._file_lock(exclusive=True):
+                # Other workers may have appended since we last looked
+                self._read_file()
+                self._write_snapshot()
+
+    @staticmethod
+    def _record(jti, expires_at):
+        length, data = _encode_jti(jti)
+        return _RECORD_HEADER.pack(expires_at, length) + data
+
+    def _file_lock(self, exclusive):
+        """flock on the lock file next to the snapshot (a no-op without fcntl)"""
+        return _FileLock(self._lock_file, exclusive)
+
+    def _file_changed(self):
+        try:
+            st = os.stat(self.snapshot_path)
+        except FileNotFoundError:
+            return False
+        return (st.st_dev, st.st_ino) != self._file_id or st.st_size != self._file_offset
+
+    def _read_file(self):
+        """Take in records appended since the last read, or the whole file if
+        another process rewrote it; returns False if it ends in a partial record
+
+        Caller holds the lock and a file lock.
+        """
+        try:
+            f = open(self.snapshot_path, 'rb')
+        except FileNotFoundError:
+            return True
+        with f:
+            st = os.fstat(f.fileno())
+            file_id = (st.st_dev, st.st_ino)
+            if file_id != self._file_id or st.st_size < self._file_offset:
+                self._file_id, self._file_offset, self._file_records = file_id, 0, 0
+            f.seek(self._file_offset)
+            data = f.read()
+
+        now = time.time()
+        offset = 0
+        complete = True
+        while offset + _RECORD_HEADER.size <= len(data):
+            expires_at, length = _RECORD_HEADER.unpack_from(data, offset)
+            size = _RECORD_HEADER.size + (length or 16)
+            raw = data[offset + _RECORD_HEADER.size:offset + size]
+            if len(raw) != (length or 16):
+                break
+            offset += size
+            self._file_records += 1
+            jti = _decode_uuid(raw) if length == 0 else raw.decode('utf-8')
+            if expires_at > now and jti not in self._expiry:
+                self._add(jti, expires_at)
+        if offset != len(data):
+            # Writers hold the file lock, so this is a torn write from a crash
+            complete = False
+        self._file_offset += offset
+        return complete
+
+    def _load(self):
+        with self._lock, self._file_lock(exclusive=True):
+            if not self._read_file():
+                print("⚠️ Token blocklist snapshot ends in a partial record")
+            if self._file_id is None:
+                return
+            if self._file_records != len(self._expiry) or self._file_offset != os.path.getsize(self.snapshot_path):
+                self._write_snapshot()
+        print(f"✅ Token blocklist loaded: {len(self._expiry)} revoked tokens")
+
+    def _write_snapshot(self):
+        """Rewrite the file with only the live entries (caller holds the lock and
+        an exclusive file lock, and has read the file first)"""
+        temp_path = f'{self.snapshot_path}.tmp'
+        data = b''.join(self._record(jti, expires_at) for jti, expires_at in self._expiry.items())
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, self.snapshot_path)
+        st = os.stat(self.snapshot_path)
+        self._file_id = (st.st_dev, st.st_ino)
+        self._file_offset = len(data)
+        self._file_records = len(self._expiry)
+
+    def stats(self):
+        with self._lock:
+            self._purge(time.time())
+            return {
+                'active': len(self._expiry),
+                'revoked': self.revoked,
+                'expired': self.expired,
+                'snapshot_records': self._file_records if self.snapshot_path else None
+            }
+
+
+class _FileLock:
+    def __init__(self, lock_file, exclusive):
+        self.lock_file = lock_file
+        self.exclusive = exclusive
+
+    def __enter__(self):
+        if self.lock_file is not None:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+
+    def __exit__(self, *exc):
+        if self.lock_file is not None:
+            fcntl.flock(self.lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,234 @@
+"""Turn daily campaign totals into model training samples.
+
+Everything here works on iterators and fixed-size arrays so that training
+on the full metrics history uses bounded memory however long it grows.
+"""
+import os
+import time
+from datetime import date
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_EPOCH = date(1970, 1, 1)
+
+
+def _window_features(totals):
+    """The five model features for one aggregated campaign window, or None"""
+    impressions, clicks, spend, conversions = totals
+    if impressions <= 0 or clicks <= 0:
+        return None
+    return (
+        impressions,
+        spend,
+        clicks / impressions,   # current_CTR
+        spend / clicks,         # current_CPC
+        conversions / clicks    # engagement_rate, as in Database.get_user_metrics
+    )
+
+
+def campaign_windows(rows, window_days=7):
+    """Yield (features, next_window_ctr) for consecutive windows of each campaign
+
+    rows are (user_id, campaign_name, platform, day, impressions, clicks,
+    spend, conversions) ordered by user_id and then day, as produced by
+    Database.iter_campaign_metrics; a user's campaigns interleave. Days are
+    grouped into fixed windows of window_days; each window's features are
+    paired with the CTR observed in the window right after it. Only the
+    current user's campaigns are held in memory.
+    """
+    current_user = None
+    campaigns = {}  # (campaign_name, platform) -> [window, totals, (window, features) of the last closed one]
+
+    def close_window(state):
+        window, totals, previous = state
+        sample = None
+        features = _window_features(totals)
+        if previous is not None and features is not None and previous[0] == window - 1:
+            sample = (previous[1], features[2])
+        state[2] = (window, features) if features is not None else None
+        return sample
+
+    for row in rows:
+        user_id, campaign_name, platform, day, impressions, clicks, spend, conversions = row
+        if user_id != current_user:
+            for state in campaigns.values():
+                sample = close_window(state)
+                if sample is not None:
+                    yield sample
+            campaigns = {}
+            current_user = user_id
+
+        window = (day - _EPOCH).days // window_days
+        state = campaigns.get((campaign_name, platform))
+        if state is None:
+            state = campaigns[(campaign_name, platform)] = [window, [0, 0, 0.0, 0], None]
+        elif state[0] != window:
+            sample = close_window(state)
+            if sample is not None:
+                yield sample
+            state[0] = window
+            state[1] = [0, 0, 0.0, 0]
+
+        totals = state[1]
+        totals[0] += impressions
+        totals[1] += clicks
+        totals[2] += float(spend)
+        totals[3] += conversions
+
+    for state in campaigns.values():
+        sample = close_window(state)
+        if sample is not None:
+            yield sample
+
+
+class ReservoirSample:
+    """Uniform random sample of at most capacity (features, target) pairs
+
+    Memory is fixed at capacity rows no matter how many samples are offered
+    (Vitter's algorithm R).
+    """
+
+    def __init__(self, capacity, n_features, seed=42):
+        self.capacity = capacity
+        self.X = np.empty((capacity, n_features), dtype=np.float64)
+        self.y = np.empty(capacity, dtype=np.float64)
+        self.seen = 0
+        self._rng = np.random.default_rng(seed)
+
+    def add(self, features, target):
+        if self.seen < self.capacity:
+            slot = self.seen
+        else:
+            slot = self._rng.integers(0, self.seen + 1)
+            if slot >= self.capacity:
+                self.seen += 1
+                return
+        self.X[slot] = features
+        self.y[slot] = target
+        self.seen += 1
+
+    def arrays(self):
+        """(X, y) views of the filled part of the sample"""
+        n = min(self.seen, self.capacity)
+        return self.X[:n], self.y[:n]
+
+
+def generate_training_arrays(n_samples, dtype=np.float32, seed=42, chunk_size=1000000):
+    """Synthetic training data written straight into a preallocated feature matrix
+
+    Same distributions and CTR target as AdOptimizerModel.generate_training_data,
+    but built chunk by chunk into one (n_samples, 5) array of dtype, with no
+    DataFrame and no full-size float64 temporaries.
+    """
+    rng = np.random.default_rng(seed)
+    X = np.empty((n_samples, 5), dtype=dtype)
+    y = np.empty(n_samples, dtype=np.float64)
+
+    for start in range(0, n_samples, chunk_size):
+        n = min(chunk_size, n_samples - start)
+        impressions = rng.integers(1000, 100000, n)
+        spend = rng.uniform(100, 10000, n)
+        ctr = rng.uniform(0.01, 0.1, n)
+        cpc = rng.uniform(2, 30, n)
+        engagement = rng.uniform(0.02, 0.2, n)
+
+        block = X[start:start + n]
+        block[:, 0] = impressions
+        block[:, 1] = spend
+        block[:, 2] = ctr
+        block[:, 3] = cpc
+        block[:, 4] = engagement
+
+        y[start:start + n] = (
+            ctr * 0.6 +
+            engagement * 0.3 +
+            (spend / impressions) * 10000 * 0.1 +
+            rng.normal(0, 0.005, n)
+        ).clip(0.005, 0.15)
+
+    return X, y
+
+
+def _read_status_kb(field):
+    """A memory field (e.g. VmRSS, VmHWM) from /proc/self/status in KiB, or None"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class StageProfiler:
+    """Record wall time and peak RSS of each training stage
+
+    On Linux the peak-RSS counter is reset at the start of every stage
+    (via /proc/self/clear_refs), so each stage reports its own high-water
+    mark. Elsewhere the process-lifetime peak is reported instead.
+    """
+
+    def __init__(self):
+        self.stages = []
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def report(self):
+        return list(self.stages)
+
+
+class _Stage:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        try:
+            with open('/proc/self/clear_refs', 'w') as f:
+                f.write('5')
+        except OSError:
+            pass
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        peak_kb = _read_status_kb('VmHWM')
+        if peak_kb is None and resource is not None:
+            peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rss_kb = _read_status_kb('VmRSS')
+        self.profiler.stages.append({
+            'stage': self.name,
+            'seconds': round(time.perf_counter() - self.start, 3),
+            'peak_rss_mb': round(peak_kb / 1024, 1) if peak_kb else None,
+            'rss_mb': round(rss_kb / 1024, 1) if rss_kb else None
+        })
+        return False
+
+
+def plan_training_memory(n_samples, n_jobs, memory_limit_mb, n_features=5, itemsize=4):
+    """Fit (n_samples, n_jobs) under a memory ceiling
+
+    Rough model: the feature matrix and targets, plus for every tree being
+    built concurrently its bootstrap sample counts/weights (about 24 bytes
+    per row). Workers are shed first, then rows.
+    """
+    n_jobs = n_jobs if n_jobs and n_jobs > 0 else (os.cpu_count() or 1)
+    if not memory_limit_mb:
+        return n_samples, n_jobs
+
+    budget = memory_limit_mb * 1024 * 1024
+    data_bytes_per_row = n_features * itemsize + 8
+    tree_bytes_per_row = 24
+
+    while n_jobs > 1 and n_samples * (data_bytes_per_row + n_jobs * tree_bytes_per_row) > budget:
+        n_jobs -= 1
+
+    max_rows = int(budget // (data_bytes_per_row + n_jobs * tree_bytes_per_row))
+    return min(n_samples, max_rows), n_jobs
@@ -0,0 +1,102 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+class TrainingJobManager:
+    """Run model training in a background thread and track each run as a job.
+
+    Only one training job runs at a time; submitting while one is queued or
+    running returns that job instead of starting another. Finished jobs are
+    kept (up to max_history) so clients can poll for their results.
+    """
+
+    def __init__(self, train_fn, max_history=50):
+        self.train_fn = train_fn
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='training')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._active_id = None
+
+    def submit(self):
+        """Start a training job, or return the one already in progress
+
+        Returns (job, created) where created is False if an existing job was returned.
+        """
+        with self._lock:
+            if self._active_id is not None:
+                return dict(self._jobs[self._active_id]), False
+
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'job_id': job_id,
+                'status': 'queued',
+                'progress': 0.0,
+                'stage': 'Queued',
+                'submitted_at': datetime.now().isoformat(),
+                'started_at': None,
+                'finished_at': None,
+                'training_time_seconds': None,
+                'metrics': None,
+                'message': None
+            }
+            self._active_id = job_id
+            self._trim_history()
+            job = dict(self._jobs[job_id])
+
+        self._executor.submit(self._run, job_id)
+        return job, True
+
+    def get(self, job_id):
+        """Snapshot of a job, or None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def all_jobs(self):
+        """Snapshots of all tracked jobs, newest first"""
+        with self._lock:
+            return [dict(job) for job in reversed(self._jobs.values())]
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _run(self, job_id):
+        self._update(job_id, status='running', stage='Starting', started_at=datetime.now().isoformat())
+        start = time.perf_counter()
+
+        def progress(fraction, stage):
+            self._update(job_id, progress=round(fraction, 3), stage=stage)
+
+        try:
+            result = self.train_fn(progress=progress)
+        except Exception as e:
+            result = {'status': 'error', 'message': str(e)}
+
+        elapsed = round(time.perf_counter() - start, 3)
+        succeeded = result.get('status') == 'success'
+
+        with self._lock:
+            self._jobs[job_id].update(
+                status='succeeded' if succeeded else 'failed',
+                progress=1.0 if succeeded else self._jobs[job_id]['progress'],
+                stage='Completed' if succeeded else 'Failed',
+                finished_at=datetime.now().isoformat(),
+                training_time_seconds=elapsed,
+                metrics=result.get('metrics'),
+                message=result.get('message')
+            )
+            self._active_id = None
+
+    def _trim_history(self):
+        """Forget the oldest finished jobs beyond max_history (caller holds the lock)"""
+        while len(self._jobs) > self.max_history:
+            oldest_id = next(iter(self._jobs))
+            if oldest_id == self._active_id:
+                break
+            del self._jobs[oldest_id]
@@ -0,0 +1,192 @@
+import queue
+import threading
+import time
+from datetime import datetime
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Buffer records in memory and write them in batches from a background thread.
+
+    A batch is flushed once it holds max_batch records or its oldest record
+    has waited flush_interval seconds. The buffer holds at most max_pending
+    records; put() blocks for up to put_timeout seconds when it is full
+    (backpressure) and drops the record only if no space frees up. A failed
+    flush is retried with backoff before the batch is dropped. Records
+    accepted before close() are all written before the thread stops.
+    """
+
+    def __init__(self, flush, max_batch=500, flush_interval=1.0, max_pending=10000,
+                 put_timeout=5.0, retries=3, name='write-behind'):
+        self.flush = flush
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.retries = retries
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        # Held across the _closed check and the enqueue, so no record can be
+        # queued behind the stop marker
+        self._closed_lock = threading.Lock()
+        self._closed = False
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+        self.blocked_puts = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def put(self, record):
+        """Queue a record for writing; returns False if it had to be dropped"""
+        # Waiting for the lock (another put blocked on a full buffer) counts
+        # against the same put_timeout
+        deadline = time.monotonic() + self.put_timeout
+        if not self._closed_lock.acquire(timeout=self.put_timeout):
+            self._count('blocked_puts')
+            self._count('dropped')
+            print("⚠️ Write-behind buffer full, dropping record")
+            return False
+        try:
+            if self._closed:
+                self._count('dropped')
+                return False
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                self._count('blocked_puts')
+                try:
+                    self._queue.put(record, timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Full:
+                    self._count('dropped')
+                    print("⚠️ Write-behind buffer full, dropping record")
+                    return False
+            self._count('enqueued')
+            return True
+        finally:
+            self._closed_lock.release()
+
+    def close(self, timeout=30.0):
+        """Stop accepting records and write everything already queued"""
+        with self._closed_lock:
+            if self._closed:
+                return
+            self._closed = True
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                # The writer is stuck on a flush; it stops by itself once
+                # it has emptied the buffer
+                print("⚠️ Write-behind buffer still full at close")
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': self._queue.qsize(),
+                'max_pending': self._queue.maxsize,
+                'enqueued': self.enqueued,
+                'written': self.written,
+                'batches': self.batches,
+                'avg_batch_size': round(self.written / self.batches, 2) if self.batches else 0.0,
+                'blocked_puts': self.blocked_puts,
+                'dropped': self.dropped,
+                'failed_flushes': self.failed_flushes
+            }
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                # Closed without room for the stop marker, and nothing left
+                if self._closed:
+                    break
+                continue
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    record = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+            self._write(batch)
+        self._drain()
+
+    def _drain(self):
+        """Write whatever is still queued once the stop marker is reached"""
+        batch = []
+        while True:
+            try:
+                record = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is _STOP:
+                continue
+            batch.append(record)
+            if len(batch) >= self.max_batch:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch):
+        for attempt in range(self.retries + 1):
+            try:
+                self.flush(batch)
+                with self._lock:
+                    self.written += len(batch)
+                    self.batches += 1
+                return
+            except Exception as e:
+                self._count('failed_flushes')
+                print(f"❌ Write-behind flush of {len(batch)} records failed (attempt {attempt + 1}): {e}")
+                if attempt < self.retries:
+                    time.sleep(0.1 * 2 ** attempt)
+        self._count('dropped', len(batch))
+
+
+class HistoryWriter:
+    """Write-behind front for prediction and optimization history.
+
+    Requests only enqueue a record; the store's save_history_batch receives
+    (user_id, payload, result, created_at) tuples for both kinds, a batch at
+    a time, and can write each kind with one multi-row insert.
+    """
+
+    def __init__(self, store, **options):
+        self.store = store
+        self.queue = WriteBehindQueue(self._flush, name='history-writer', **options)
+
+    def save_prediction(self, user_id, input_data, prediction_result):
+        return self.queue.put(('prediction', user_id, input_data, prediction_result, datetime.now()))
+
+    def save_optimization(self, user_id, settings, results):
+        return self.queue.put(('optimization', user_id, settings, results, datetime.now()))
+
+    def close(self, timeout=30.0):
+        self.queue.close(timeout)
+
+    def stats(self):
+        return self.queue.stats()
+
+    def _flush(self, records):
+        predictions = [record[1:] for record in records if record[0] == 'prediction']
+        optimizations = [record[1:] for record in records if record[0] == 'optimization']
+        self.store.save_history_batch(predictions, optimizations)